@@ -365,16 +365,27 @@ class MemorySpine:
         from usc.cogdedup.codec import cogdedup_decode
         data = cogdedup_decode(blob, self.cogstore, predictor=self._predictor)
 
-        if expected_hash:
+        if expected_hash and not self._integrity_verifier.verify(
+                data, bytes.fromhex(expected_hash)):
             actual = self._integrity_verifier.compute_hash(data).hex()
-            if actual != expected_hash:
-                raise ValueError(
-                    f"Integrity check failed: expected {expected_hash[:16]}..., "
-                    f"got {actual[:16]}..."
-                )
+            raise ValueError(
+                f"Integrity check failed: expected {expected_hash[:16]}..., "
+                f"got {actual[:16]}..."
+            )
 
         return data
 
+    def train_compression_dict(self) -> int | None:
+        """Train a shared zstd dictionary from frequent chunks for vault stores.
+
+        Returns the dictionary ID, or None if there is not enough chunk
+        history to train on yet.
+        """
+        dict_bytes = self.cogstore.train_shared_dict()
+        if dict_bytes is None:
+            return None
+        return self.vault.set_shared_dict(dict_bytes)
+
     def stream_compressor(self, data_id: str = ""):
         """Create a streaming cogdedup encoder for real-time session compression.
 
@@ -8,7 +8,7 @@ from pathlib import Path
 from typing import Any
 
 from c3ae.exceptions import VaultError
-from c3ae.utils import content_hash, json_dumps, json_loads, utcnow, iso_str
+from c3ae.utils import content_hash, json_dumps_bytes, json_loads, utcnow, iso_str
 
 
 class Vault:
@@ -34,7 +34,7 @@ class Vault:
             "stored_at": iso_str(utcnow()),
             **(metadata or {}),
         }
-        dest.with_suffix(dest.suffix + ".meta.json").write_text(json_dumps(meta))
+        dest.with_suffix(dest.suffix + ".meta.json").write_bytes(json_dumps_bytes(meta))
         return h
 
     def get_document(self, content_hash_prefix: str) -> tuple[bytes, dict[str, Any]]:
@@ -49,7 +49,7 @@ class Vault:
             raise VaultError(f"Ambiguous hash prefix {content_hash_prefix}: {len(matches)} matches")
         doc_path = matches[0]
         meta_path = doc_path.with_suffix(doc_path.suffix + ".meta.json")
-        meta = json_loads(meta_path.read_text()) if meta_path.exists() else {}
+        meta = json_loads(meta_path.read_bytes()) if meta_path.exists() else {}
         return doc_path.read_bytes(), meta
 
     def store_evidence(self, data: bytes, evidence_id: str) -> Path:
@@ -75,7 +75,7 @@ class Vault:
         docs_dir = self.root / "documents"
         results = []
         for meta_file in docs_dir.glob("*.meta.json"):
-            results.append(json_loads(meta_file.read_text()))
+            results.append(json_loads(meta_file.read_bytes()))
         return results
 
     def delete_document(self, content_hash_prefix: str) -> bool:
@@ -12,19 +12,32 @@ Upgrades over v1:
 - Tiered chunks: Hot (in-memory), Warm (LSH indexed), Cold (compressed archive)
 - Co-occurrence tracking for predictive pre-compression
 - Memory-to-chunks mapping for compression-aware retrieval
+- Optional write-behind: a single writer thread batches chunk and
+  co-occurrence writes into one transaction per burst
 """
 from __future__ import annotations
 
+import queue
 import sqlite3
 import sys
+import threading
 import time
 import zlib
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
 
 # USC cogdedup is a sibling package in the Nova-v1 monorepo
 
-from usc.cogdedup.hasher import sha256_hash, simhash64, hamming_distance, SIMILARITY_THRESHOLD
+from usc.cogdedup.hasher import (
+    _CDC_VERSION, sha256_hash, simhash64, hamming_distance, SIMILARITY_THRESHOLD,
+)
 from usc.cogdedup.lsh import LSHIndex, N_BANDS, _extract_bands
 from usc.cogdedup.store import CogStore, ChunkEntry
 
@@ -49,6 +62,41 @@ HOT_MAX_CHUNKS = 10000      # Cap hot tier to 10k chunks
 COLD_AGE_DAYS = 30          # Chunks untouched for 30 days can be archived
 COLD_MIN_AGE_SECONDS = COLD_AGE_DAYS * 86400
 
+# Cap on cached per-memory chunk-id arrays used for Jaccard scoring
+CHUNK_SET_CACHE_MAX = 4096
+
+# Shared zstd dictionary trained from the most-referenced chunks
+SHARED_DICT_KEY = "shared_zstd_dict"
+SHARED_DICT_SIZE = 16384
+SHARED_DICT_MIN_SAMPLES = 8
+
+# CDC boundary version the stored chunks were cut under (see
+# hasher._CDC_VERSION); stores created before it was recorded hold version 1
+CDC_VERSION_KEY = "cdc_version"
+
+# Write-behind tuning (see C3CogStore(write_behind=True))
+WRITE_QUEUE_MAX = 10_000         # Pending ops before store() blocks
+WRITE_BATCH_MAX = 1000           # Ops drained into one transaction
+WAL_AUTOCHECKPOINT_PAGES = 4000  # Checkpoint less often than sqlite's 1000
+
+
+_INSERT_CHUNK_SQL = (
+    "INSERT INTO cogdedup_chunks "
+    "(chunk_id, sha256, simhash, data, size_bytes, last_access, tier) "
+    "VALUES (?, ?, ?, ?, ?, ?, 'warm')"
+)
+_INSERT_BAND_SQL = (
+    "INSERT OR IGNORE INTO cogdedup_lsh_bands (band_id, band_value, chunk_id) VALUES (?, ?, ?)"
+)
+_BUMP_REF_SQL = (
+    "UPDATE cogdedup_chunks SET ref_count = ref_count + 1, last_access = ? WHERE sha256 = ?"
+)
+_COOCCUR_SQL = (
+    "INSERT INTO cogdedup_cooccurrence (chunk_a, chunk_b, count) "
+    "VALUES (?, ?, 1) "
+    "ON CONFLICT(chunk_a, chunk_b) DO UPDATE SET count = count + 1"
+)
+
 
 _C3_COGDEDUP_SCHEMA = """
 CREATE TABLE IF NOT EXISTS cogdedup_chunks (
@@ -99,9 +147,40 @@ CREATE TABLE IF NOT EXISTS cogdedup_cold_archive (
     compressed_data BLOB NOT NULL,
     original_size INTEGER NOT NULL
 );
+
+-- Store-level metadata (e.g. the shared zstd dictionary)
+CREATE TABLE IF NOT EXISTS cogdedup_meta (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
 """
 
 
+class HotTier:
+    """Hot-tier chunk cache keyed by sha256 and by chunk_id.
+
+    ``by_sha`` and ``by_id`` map straight to the cached ChunkEntry objects,
+    so a hit bumps the entry's counters and returns it with no conversion.
+    An entry whose ``data`` is ``None`` has not had its blob loaded yet.
+    """
+
+    def __init__(self) -> None:
+        self.by_sha: Dict[str, ChunkEntry] = {}
+        self.by_id: Dict[int, ChunkEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __contains__(self, chunk_id: int) -> bool:
+        return chunk_id in self.by_id
+
+    def add(self, entry: ChunkEntry) -> None:
+        """Cache an entry by reference under both keys."""
+        self.by_sha[entry.sha256] = entry
+        self.by_id[entry.chunk_id] = entry
+
+
 class C3CogStore(CogStore):
     """CogStore backed by C3's SQLite database with LSH index and tiered storage.
 
@@ -113,24 +192,132 @@ class C3CogStore(CogStore):
     Persists chunk data across sessions so future encoding can
     reference previously seen chunks (REF) or use similar chunks
     as compression dictionaries (DELTA).
+
+    With ``write_behind=True``, store() and record_cooccurrence() hand
+    their writes to a background writer thread and return immediately;
+    new chunk ids come from an in-process counter, so only one process
+    may write to the database in this mode. Unflushed chunks are served
+    from memory; flush() waits for the queue to drain.
     """
 
-    def __init__(self, db_path: str | Path) -> None:
+    def __init__(self, db_path: str | Path, write_behind: bool = False) -> None:
         self._db_path = str(db_path)
         self._conn = sqlite3.connect(self._db_path)
         self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA wal_autocheckpoint={WAL_AUTOCHECKPOINT_PAGES}")
         self._conn.executescript(_C3_COGDEDUP_SCHEMA)
         self._conn.commit()
+        # Chunks keep the boundaries they were cut with; older ones still
+        # resolve, but new data cut under another version rarely REFs them
+        self.cdc_version = self._load_cdc_version()
+
+        # Write-behind state: queued (sql, rows) ops, and chunks inserted
+        # but not yet committed by the writer thread
+        self._wq: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        self._write_error: Optional[BaseException] = None
+        self._pending_lock = threading.Lock()
+        self._pending_sha: Dict[str, ChunkEntry] = {}
+        self._pending_id: Dict[int, ChunkEntry] = {}
+        if write_behind:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(chunk_id), 0) FROM cogdedup_chunks"
+            ).fetchone()
+            self._next_id = row[0] + 1
+            self._wq = queue.Queue(WRITE_QUEUE_MAX)
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="c3-cogstore-writer", daemon=True,
+            )
+            self._writer.start()
 
         # Hot tier: in-memory cache for frequent chunks
-        self._hot_exact: Dict[str, ChunkEntry] = {}  # sha256 -> entry
-        self._hot_by_id: Dict[int, ChunkEntry] = {}   # chunk_id -> entry
+        self._hot = HotTier()
+
+        # memory_id -> sorted int64 chunk ids (compact sets for Jaccard)
+        self._chunk_sets: Dict[str, np.ndarray] = {}
 
         # In-memory LSH index (rebuilt from SQLite on startup)
         self._lsh = LSHIndex()
         self._rebuild_lsh_index()
         self._load_hot_tier()
 
+    # --- Write path ---
+
+    def _check_writer(self) -> None:
+        """Raise if the write-behind thread failed to commit a batch."""
+        if self._write_error is not None:
+            raise RuntimeError("cogstore writer thread failed") from self._write_error
+
+    def _write(self, sql: str, rows: List[tuple]) -> None:
+        """Run (or, in write-behind mode, enqueue) one statement over rows."""
+        if self._wq is None:
+            self._conn.executemany(sql, rows)
+        else:
+            self._check_writer()
+            self._wq.put((sql, rows))
+
+    def _commit(self) -> None:
+        if self._wq is None:
+            self._conn.commit()
+
+    def _writer_loop(self) -> None:
+        """Drain queued ops and apply each burst in one transaction.
+
+        Consecutive ops with the same SQL are merged into one executemany;
+        ordering across statements is preserved.
+        """
+        conn = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)
+        conn.execute(f"PRAGMA wal_autocheckpoint={WAL_AUTOCHECKPOINT_PAGES}")
+        stop = False
+        while not stop:
+            batch = [self._wq.get()]
+            while len(batch) < WRITE_BATCH_MAX:
+                try:
+                    batch.append(self._wq.get_nowait())
+                except queue.Empty:
+                    break
+            groups: List[Tuple[str, List[tuple]]] = []
+            for op in batch:
+                if op is None:
+                    stop = True
+                elif groups and groups[-1][0] == op[0]:
+                    groups[-1][1].extend(op[1])
+                else:
+                    groups.append((op[0], list(op[1])))
+            committed = False
+            try:
+                if groups and self._write_error is None:
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        for sql, rows in groups:
+                            conn.executemany(sql, rows)
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                    committed = True
+            except BaseException as e:
+                self._write_error = e
+            # Committed chunks are now answered by SQLite; after a rollback
+            # they stay pending, since earlier packets may reference them
+            if committed:
+                with self._pending_lock:
+                    for sql, rows in groups:
+                        if sql is _INSERT_CHUNK_SQL:
+                            for row in rows:
+                                self._pending_id.pop(row[0], None)
+                                self._pending_sha.pop(row[1], None)
+            for _ in batch:
+                self._wq.task_done()
+        conn.close()
+
+    def flush(self) -> None:
+        """Block until all queued writes are committed (write-behind mode)."""
+        if self._wq is None:
+            return
+        self._wq.join()
+        self._check_writer()
+
     def _rebuild_lsh_index(self) -> None:
         """Rebuild in-memory LSH index from SQLite on startup."""
         rows = self._conn.execute(
@@ -140,35 +327,55 @@ class C3CogStore(CogStore):
         self._lsh.rebuild(entries)
 
     def _load_hot_tier(self) -> None:
-        """Load high-frequency chunks into memory."""
+        """Load high-frequency chunk metadata into memory.
+
+        Data blobs are not read at startup; each hot entry pulls its blob
+        from SQLite on first access (see _hot_hit). Tier flags are set in
+        one statement, skipping rows already marked hot.
+        """
         rows = self._conn.execute(
-            "SELECT chunk_id, sha256, simhash, data, ref_count, last_access "
+            "SELECT chunk_id, sha256, simhash, ref_count, last_access "
             "FROM cogdedup_chunks WHERE ref_count >= ? "
             "ORDER BY ref_count DESC LIMIT ?",
             (HOT_MIN_REF_COUNT, HOT_MAX_CHUNKS),
         ).fetchall()
         for row in rows:
-            entry = ChunkEntry(
-                chunk_id=row[0], sha256=row[1],
-                simhash=_to_unsigned64(row[2]), data=row[3],
-                ref_count=row[4], last_access=row[5],
-            )
-            self._hot_exact[entry.sha256] = entry
-            self._hot_by_id[entry.chunk_id] = entry
-            # Update tier in DB
-            self._conn.execute(
-                "UPDATE cogdedup_chunks SET tier = 'hot' WHERE chunk_id = ?",
+            self._hot.add(ChunkEntry(
+                chunk_id=row[0], sha256=row[1], simhash=_to_unsigned64(row[2]),
+                data=None, ref_count=row[3], last_access=row[4],
+            ))
+        if rows:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE cogdedup_chunks SET tier = 'hot' "
+                    "WHERE chunk_id = ? AND tier != 'hot'",
+                    [(row[0],) for row in rows],
+                )
+
+    def _hot_hit(self, entry: ChunkEntry) -> ChunkEntry:
+        """Return a hot entry, loading its data blob on first access."""
+        if entry.data is None:
+            row = self._conn.execute(
+                "SELECT data FROM cogdedup_chunks WHERE chunk_id = ?",
                 (entry.chunk_id,),
-            )
-        self._conn.commit()
+            ).fetchone()
+            entry.data = row[0] if row is not None else b""
+        return entry
 
     def lookup_exact(self, sha256: str) -> Optional[ChunkEntry]:
+        self._check_writer()
         # Hot tier first (zero-latency)
-        hot = self._hot_exact.get(sha256)
+        hot = self._hot.by_sha.get(sha256)
         if hot is not None:
             hot.ref_count += 1
             hot.last_access = time.time()
-            return hot
+            return self._hot_hit(hot)
+
+        if self._pending_sha:
+            with self._pending_lock:
+                pending = self._pending_sha.get(sha256)
+            if pending is not None:
+                return pending
 
         # Warm tier (SQLite indexed lookup)
         row = self._conn.execute(
@@ -224,19 +431,32 @@ class C3CogStore(CogStore):
         return best_entry
 
     def store(self, data: bytes) -> ChunkEntry:
-        sha = sha256_hash(data)
+        return self.store_with_hash(data, sha256_hash(data))
+
+    def store_with_hash(self, data: bytes, sha256: str,
+                        simhash: Optional[int] = None) -> ChunkEntry:
+        self._check_writer()
+        sha = sha256
 
         # Check hot cache first
-        existing = self._hot_exact.get(sha)
+        existing = self._hot.by_sha.get(sha)
         if existing is not None:
             existing.ref_count += 1
             existing.last_access = time.time()
-            self._conn.execute(
-                "UPDATE cogdedup_chunks SET ref_count = ref_count + 1, last_access = ? WHERE sha256 = ?",
-                (time.time(), sha),
-            )
-            self._conn.commit()
-            return existing
+            self._write(_BUMP_REF_SQL, [(existing.last_access, sha)])
+            self._commit()
+            return self._hot_hit(existing)
+
+        # Written but not yet committed (write-behind)
+        if self._pending_sha:
+            with self._pending_lock:
+                pending = self._pending_sha.get(sha)
+            if pending is not None:
+                pending.ref_count += 1
+                pending.last_access = time.time()
+                self._write(_BUMP_REF_SQL, [(pending.last_access, sha)])
+                self._maybe_promote_hot(pending)
+                return pending
 
         # Check SQLite
         row = self._conn.execute(
@@ -244,11 +464,8 @@ class C3CogStore(CogStore):
             (sha,),
         ).fetchone()
         if row is not None:
-            self._conn.execute(
-                "UPDATE cogdedup_chunks SET ref_count = ref_count + 1, last_access = ? WHERE sha256 = ?",
-                (time.time(), sha),
-            )
-            self._conn.commit()
+            self._write(_BUMP_REF_SQL, [(time.time(), sha)])
+            self._commit()
             entry = ChunkEntry(chunk_id=row[0], sha256=row[1],
                                simhash=_to_unsigned64(row[2]), data=row[3],
                                ref_count=row[4] + 1)
@@ -256,35 +473,47 @@ class C3CogStore(CogStore):
             return entry
 
         # New chunk — insert
-        sh = simhash64(data)
+        sh = simhash64(data) if simhash is None else simhash
         now = time.time()
-        cursor = self._conn.execute(
-            "INSERT INTO cogdedup_chunks (sha256, simhash, data, size_bytes, last_access, tier) "
-            "VALUES (?, ?, ?, ?, ?, 'warm')",
-            (sha, _to_signed64(sh), data, len(data), now),
-        )
-        cid = cursor.lastrowid
+        if self._wq is None:
+            cursor = self._conn.execute(
+                _INSERT_CHUNK_SQL, (None, sha, _to_signed64(sh), data, len(data), now),
+            )
+            cid = cursor.lastrowid
+        else:
+            cid = self._next_id
+            self._next_id += 1
+        entry = ChunkEntry(chunk_id=cid, sha256=sha, simhash=sh, data=data,
+                           ref_count=1, last_access=now)
+        if self._wq is not None:
+            with self._pending_lock:
+                self._pending_sha[sha] = entry
+                self._pending_id[cid] = entry
+            self._write(_INSERT_CHUNK_SQL, [(cid, sha, _to_signed64(sh), data, len(data), now)])
 
         # Insert LSH band entries
         bands = _extract_bands(sh)
-        for band_id, band_val in enumerate(bands):
-            self._conn.execute(
-                "INSERT OR IGNORE INTO cogdedup_lsh_bands (band_id, band_value, chunk_id) VALUES (?, ?, ?)",
-                (band_id, band_val, cid),
-            )
-        self._conn.commit()
+        self._write(_INSERT_BAND_SQL, [(band_id, band_val, cid)
+                                       for band_id, band_val in enumerate(bands)])
+        self._commit()
 
         # Update in-memory LSH index
         self._lsh.insert(cid, sh)
 
-        return ChunkEntry(chunk_id=cid, sha256=sha, simhash=sh, data=data,
-                          ref_count=1, last_access=now)
+        return entry
 
     def get(self, chunk_id: int) -> Optional[ChunkEntry]:
+        self._check_writer()
         # Hot cache first
-        hot = self._hot_by_id.get(chunk_id)
+        hot = self._hot.by_id.get(chunk_id)
         if hot is not None:
-            return hot
+            return self._hot_hit(hot)
+
+        if self._pending_id:
+            with self._pending_lock:
+                pending = self._pending_id.get(chunk_id)
+            if pending is not None:
+                return pending
 
         row = self._conn.execute(
             "SELECT chunk_id, sha256, simhash, data, ref_count, last_access "
@@ -307,13 +536,12 @@ class C3CogStore(CogStore):
 
     def _maybe_promote_hot(self, entry: ChunkEntry) -> None:
         """Promote a warm chunk to hot tier if it's frequently accessed."""
-        if entry.ref_count >= HOT_MIN_REF_COUNT and entry.chunk_id not in self._hot_by_id:
-            if len(self._hot_by_id) < HOT_MAX_CHUNKS:
-                self._hot_exact[entry.sha256] = entry
-                self._hot_by_id[entry.chunk_id] = entry
-                self._conn.execute(
+        if entry.ref_count >= HOT_MIN_REF_COUNT and entry.chunk_id not in self._hot:
+            if len(self._hot) < HOT_MAX_CHUNKS:
+                self._hot.add(entry)
+                self._write(
                     "UPDATE cogdedup_chunks SET tier = 'hot' WHERE chunk_id = ?",
-                    (entry.chunk_id,),
+                    [(entry.chunk_id,)],
                 )
 
     def archive_cold_chunks(self) -> int:
@@ -321,6 +549,7 @@ class C3CogStore(CogStore):
 
         Returns number of chunks archived.
         """
+        self.flush()
         cutoff = time.time() - COLD_MIN_AGE_SECONDS
         rows = self._conn.execute(
             "SELECT chunk_id, data, size_bytes FROM cogdedup_chunks "
@@ -344,8 +573,8 @@ class C3CogStore(CogStore):
                 "UPDATE cogdedup_chunks SET data = X'', tier = 'cold' WHERE chunk_id = ?",
                 (cid,),
             )
-            # Remove from LSH index (cold chunks aren't similarity-searched)
-            self._lsh.remove(cid)
+            # Tombstone in LSH index (cold chunks aren't similarity-searched)
+            self._lsh.discard(cid)
             archived += 1
 
         if archived:
@@ -366,16 +595,15 @@ class C3CogStore(CogStore):
 
     def record_cooccurrence(self, chunk_ids: List[int]) -> None:
         """Record which chunks appeared together in an encode operation."""
-        for i, a in enumerate(chunk_ids):
-            for j, b in enumerate(chunk_ids):
-                if i != j:
-                    self._conn.execute(
-                        "INSERT INTO cogdedup_cooccurrence (chunk_a, chunk_b, count) "
-                        "VALUES (?, ?, 1) "
-                        "ON CONFLICT(chunk_a, chunk_b) DO UPDATE SET count = count + 1",
-                        (a, b),
-                    )
-        self._conn.commit()
+        pairs = [
+            (a, b)
+            for i, a in enumerate(chunk_ids)
+            for j, b in enumerate(chunk_ids)
+            if i != j
+        ]
+        if pairs:
+            self._write(_COOCCUR_SQL, pairs)
+        self._commit()
 
     def get_predicted_chunks(self, chunk_id: int, top_k: int = 5) -> List[ChunkEntry]:
         """Get chunks that frequently co-occur with the given chunk.
@@ -383,6 +611,7 @@ class C3CogStore(CogStore):
         Used for predictive pre-compression: when we see chunk A,
         we pre-load predicted chunks B, C as zstd dictionaries.
         """
+        self.flush()
         rows = self._conn.execute(
             "SELECT chunk_b, count FROM cogdedup_cooccurrence "
             "WHERE chunk_a = ? ORDER BY count DESC LIMIT ?",
@@ -395,59 +624,146 @@ class C3CogStore(CogStore):
                 results.append(entry)
         return results
 
-    # --- Memory-to-chunks mapping (Upgrade #5: Compression-Aware Retrieval) ---
+    def train_shared_dict(self, top_k: int = 1024,
+                          dict_size: int = SHARED_DICT_SIZE) -> Optional[bytes]:
+        """Train a zstd dictionary from the most-referenced chunks.
 
-    def register_data_chunks(self, data_id: str, chunk_ids: Set[int]) -> None:
-        """Register chunk IDs associated with a data/memory entry."""
-        for cid in chunk_ids:
+        Frequently co-occurring chunks are exactly the content future
+        documents repeat, so a dictionary built from them lets small
+        payloads compress against that shared history. The dictionary is
+        persisted in cogdedup_meta and returned as raw bytes, or None if
+        zstd is unavailable or there are too few samples to train on.
+        """
+        if zstd is None:
+            return None
+        self.flush()
+        rows = self._conn.execute(
+            "SELECT data FROM cogdedup_chunks WHERE tier != 'cold' AND size_bytes > 0 "
+            "ORDER BY ref_count DESC LIMIT ?",
+            (top_k,),
+        ).fetchall()
+        samples = [r[0] for r in rows if r[0]]
+        if len(samples) < SHARED_DICT_MIN_SAMPLES:
+            return None
+        try:
+            dict_bytes = zstd.train_dictionary(dict_size, samples).as_bytes()
+        except zstd.ZstdError:
+            return None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cogdedup_meta (key, value, updated_at) VALUES (?, ?, ?)",
+            (SHARED_DICT_KEY, dict_bytes, time.time()),
+        )
+        self._conn.commit()
+        return dict_bytes
+
+    def _load_cdc_version(self) -> int:
+        """CDC version of the stored chunks; a new store records the current one."""
+        row = self._conn.execute(
+            "SELECT value FROM cogdedup_meta WHERE key = ?", (CDC_VERSION_KEY,),
+        ).fetchone()
+        if row is not None:
+            return int(row[0])
+        if self._conn.execute("SELECT 1 FROM cogdedup_chunks LIMIT 1").fetchone():
+            return 1  # written before the version was recorded
+        with self._conn:
             self._conn.execute(
-                "INSERT OR IGNORE INTO cogdedup_memory_chunks (memory_id, chunk_id) VALUES (?, ?)",
-                (data_id, cid),
+                "INSERT OR REPLACE INTO cogdedup_meta (key, value, updated_at) VALUES (?, ?, ?)",
+                (CDC_VERSION_KEY, str(_CDC_VERSION), time.time()),
             )
-        self._conn.commit()
+        return _CDC_VERSION
+
+    def load_shared_dict(self) -> Optional[bytes]:
+        """Return the most recently trained shared zstd dictionary, if any."""
+        row = self._conn.execute(
+            "SELECT value FROM cogdedup_meta WHERE key = ?", (SHARED_DICT_KEY,),
+        ).fetchone()
+        return row[0] if row else None
+
+    # --- Memory-to-chunks mapping (Upgrade #5: Compression-Aware Retrieval) ---
+
+    def register_data_chunks(self, data_id: str, chunk_ids: Set[int]) -> None:
+        """Register chunk IDs associated with a data/memory entry.
+
+        Goes through the write queue so the rows commit after the chunks
+        they reference.
+        """
+        self._write(
+            "INSERT OR IGNORE INTO cogdedup_memory_chunks (memory_id, chunk_id) VALUES (?, ?)",
+            [(data_id, cid) for cid in chunk_ids],
+        )
+        self._commit()
+        self._chunk_sets.pop(data_id, None)
 
     def get_chunk_ids_for_data(self, data_id: str) -> Set[int]:
         """Get all chunk IDs associated with a data/memory ID."""
+        self.flush()
         rows = self._conn.execute(
             "SELECT chunk_id FROM cogdedup_memory_chunks WHERE memory_id = ?",
             (data_id,),
         ).fetchall()
         return {r[0] for r in rows}
 
+    def _chunk_array(self, data_id: str) -> np.ndarray:
+        """Sorted int64 array of a memory's chunk IDs, cached per memory."""
+        arr = self._chunk_sets.get(data_id)
+        if arr is None:
+            self.flush()
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM cogdedup_memory_chunks WHERE memory_id = ? "
+                "ORDER BY chunk_id",
+                (data_id,),
+            ).fetchall()
+            arr = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+            if len(self._chunk_sets) >= CHUNK_SET_CACHE_MAX:
+                self._chunk_sets.clear()
+            self._chunk_sets[data_id] = arr
+        return arr
+
     def structural_similarity(self, data_id_a: str, data_id_b: str) -> float:
         """Compute Jaccard similarity over shared chunk IDs.
 
         Returns a value between 0.0 (no overlap) and 1.0 (identical chunks).
         This is a free structural similarity signal from the compression layer.
+        Chunk IDs are held as sorted numpy arrays, so the intersection runs
+        in C instead of over Python sets.
         """
-        chunks_a = self.get_chunk_ids_for_data(data_id_a)
-        chunks_b = self.get_chunk_ids_for_data(data_id_b)
-        if not chunks_a and not chunks_b:
+        chunks_a = self._chunk_array(data_id_a)
+        chunks_b = self._chunk_array(data_id_b)
+        if not chunks_a.size and not chunks_b.size:
             return 0.0
-        intersection = chunks_a & chunks_b
-        union = chunks_a | chunks_b
-        return len(intersection) / len(union) if union else 0.0
+        inter = np.intersect1d(chunks_a, chunks_b, assume_unique=True).size
+        union = chunks_a.size + chunks_b.size - inter
+        return inter / union if union else 0.0
 
     def find_structurally_similar(self, data_id: str, threshold: float = 0.3) -> List[tuple]:
         """Find memories structurally similar to the given one.
 
         Returns list of (memory_id, jaccard_score) sorted by similarity.
         """
-        target_chunks = self.get_chunk_ids_for_data(data_id)
-        if not target_chunks:
+        self.flush()
+        target_chunks = self._chunk_array(data_id)
+        if not target_chunks.size:
             return []
 
-        # Find all memories that share at least one chunk
+        # One grouped query: per memory sharing at least one chunk, count the
+        # shared chunks and its total chunks. Jaccard follows from
+        # |A & B| / (|A| + |B| - |A & B|) without per-memory round trips.
         placeholders = ",".join("?" * len(target_chunks))
         rows = self._conn.execute(
-            f"SELECT DISTINCT memory_id FROM cogdedup_memory_chunks "
-            f"WHERE chunk_id IN ({placeholders}) AND memory_id != ?",
-            list(target_chunks) + [data_id],
+            f"SELECT m.memory_id, COUNT(*) AS inter, "
+            f"(SELECT COUNT(*) FROM cogdedup_memory_chunks t "
+            f"WHERE t.memory_id = m.memory_id) AS total "
+            f"FROM cogdedup_memory_chunks m "
+            f"WHERE m.chunk_id IN ({placeholders}) AND m.memory_id != ? "
+            f"GROUP BY m.memory_id",
+            target_chunks.tolist() + [data_id],
         ).fetchall()
 
+        n_target = target_chunks.size
         results = []
-        for (mem_id,) in rows:
-            score = self.structural_similarity(data_id, mem_id)
+        for mem_id, inter, total in rows:
+            union = n_target + total - inter
+            score = inter / union if union else 0.0
             if score >= threshold:
                 results.append((mem_id, score))
 
@@ -458,16 +774,19 @@ class C3CogStore(CogStore):
 
     @property
     def size(self) -> int:
+        self.flush()
         row = self._conn.execute("SELECT COUNT(*) FROM cogdedup_chunks").fetchone()
         return row[0] if row else 0
 
     @property
     def total_bytes_stored(self) -> int:
+        self.flush()
         row = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM cogdedup_chunks").fetchone()
         return row[0] if row else 0
 
     def stats(self) -> dict:
         """Get dedup store statistics with tier breakdown."""
+        self.flush()
         row = self._conn.execute(
             "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), "
             "COALESCE(SUM(ref_count), 0) FROM cogdedup_chunks"
@@ -493,11 +812,17 @@ class C3CogStore(CogStore):
                 "warm": tier_counts.get("warm", 0),
                 "cold": tier_counts.get("cold", 0),
             },
-            "hot_cache_size": len(self._hot_by_id),
+            "hot_cache_size": len(self._hot),
             "lsh_index_size": self._lsh.size,
             "cooccurrence_pairs": cooccur_row[0] if cooccur_row else 0,
             "cooccurrence_total": cooccur_row[1] if cooccur_row else 0,
+            "cdc_version": self.cdc_version,
+            "cdc_version_current": self.cdc_version == _CDC_VERSION,
         }
 
     def close(self) -> None:
+        if self._writer is not None:
+            self._wq.put(None)
+            self._writer.join()
+            self._writer = None
         self._conn.close()
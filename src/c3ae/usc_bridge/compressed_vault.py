@@ -14,7 +14,7 @@ from pathlib import Path
 from typing import Any
 
 from c3ae.storage.vault import Vault
-from c3ae.utils import content_hash, json_dumps, json_loads, utcnow, iso_str
+from c3ae.utils import content_hash, json_dumps_bytes, json_loads, utcnow, iso_str
 
 # Minimum size to bother compressing
 _MIN_COMPRESS_BYTES = 1024
@@ -34,95 +34,216 @@ except ImportError:
     _brotli = None
 
 import bz2
+import sqlite3
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Candidate codec settings: mid levels trade a few percent of ratio for
+# a large cut in per-store CPU versus zstd-22 / brotli-11 / bzip2-9.
+_ZSTD_LEVEL = 10
+_BROTLI_QUALITY = 5
+_BZ2_LEVEL = 6
+
+# Document metadata index (one row per stored document)
+_DOC_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS doc_meta (
+    hash TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    compressed_bytes INTEGER NOT NULL,
+    compression_method TEXT NOT NULL,
+    PRIMARY KEY (hash, filename)
+);
+"""
 
+# Template mining is only worth it on sizeable logs
+_TEMPLATE_MIN_BYTES = 32 * 1024
+
+_tls = threading.local()
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _zstd_compressor() -> "zstd.ZstdCompressor":
+    """Per-thread zstd compressor, reused across calls (contexts are not thread-safe).
+
+    threads=-1 lets zstd split large inputs across its own worker threads.
+    """
+    cctx = getattr(_tls, "zstd_cctx", None)
+    if cctx is None:
+        cctx = zstd.ZstdCompressor(level=_ZSTD_LEVEL, threads=-1)
+        _tls.zstd_cctx = cctx
+    return cctx
+
+
+def _zstd_decompressor() -> "zstd.ZstdDecompressor":
+    """Per-thread zstd decompressor, reused across calls."""
+    dctx = getattr(_tls, "zstd_dctx", None)
+    if dctx is None:
+        dctx = zstd.ZstdDecompressor()
+        _tls.zstd_dctx = dctx
+    return dctx
+
+
+def _zstd_dict_contexts(zdict: "zstd.ZstdCompressionDict") -> dict[str, Any]:
+    """Per-thread compressor/decompressor pair bound to a shared dictionary."""
+    cache = getattr(_tls, "zstd_dict_ctxs", None)
+    if cache is None:
+        cache = _tls.zstd_dict_ctxs = {}
+    did = zdict.dict_id()
+    ctxs = cache.get(did)
+    if ctxs is None:
+        ctxs = cache[did] = {
+            "c": zstd.ZstdCompressor(level=_ZSTD_LEVEL, dict_data=zdict),
+            "d": zstd.ZstdDecompressor(dict_data=zdict),
+        }
+    return ctxs
 
-def _compress_smart(data: bytes) -> tuple[bytes, str]:
-    """Compress data using best available method. Returns (compressed, method)."""
-    if len(data) < _MIN_COMPRESS_BYTES:
-        return data, "none"
 
-    candidates: list[tuple[bytes, str]] = [(data, "none")]
+def _candidate_pool() -> ThreadPoolExecutor:
+    """Shared pool for the C-extension codecs (they release the GIL)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            # Re-check under the lock so racing first callers share one pool
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="vault-compress")
+    return _pool
 
-    # zstd-22
-    if zstd is not None:
-        try:
-            z = b"USZR" + zstd.ZstdCompressor(level=22).compress(data)
-            candidates.append((z, "uszr"))
-        except Exception:
-            pass
 
-    # brotli-11
-    if _brotli is not None:
-        try:
-            b = b"USBR" + _brotli.compress(data, quality=11)
-            candidates.append((b, "usbr"))
-        except Exception:
-            pass
+def _try_zstd(data: bytes) -> tuple[bytes, str] | None:
+    try:
+        return b"USZR" + _zstd_compressor().compress(data), "uszr"
+    except Exception:
+        return None
+
 
-    # bzip2-9
+def _try_zstd_dict(data: bytes, zdict: "zstd.ZstdCompressionDict") -> tuple[bytes, str] | None:
     try:
-        bz = b"USBZ" + bz2.compress(data, compresslevel=9)
-        candidates.append((bz, "usbz"))
+        frame = _zstd_dict_contexts(zdict)["c"].compress(data)
+        return b"USZS" + struct.pack("<I", zdict.dict_id()) + frame, "uszs"
     except Exception:
-        pass
+        return None
 
-    # Try USC template-based cold if available
-    if _USC_AVAILABLE:
+
+def _try_brotli(data: bytes) -> tuple[bytes, str] | None:
+    try:
+        return b"USBR" + _brotli.compress(data, quality=_BROTLI_QUALITY), "usbr"
+    except Exception:
+        return None
+
+
+def _try_bz2(data: bytes) -> tuple[bytes, str] | None:
+    try:
+        return b"USBZ" + bz2.compress(data, compresslevel=_BZ2_LEVEL), "usbz"
+    except Exception:
+        return None
+
+
+def _try_template(data: bytes) -> tuple[bytes, str] | None:
+    """USC template-based cold pack (drain3 mining + template codec)."""
+    try:
+        from usc.api.hdfs_template_codec_v1m_bundle import bundle_encode_and_compress_v1m
+        from usc.mem.hdfs_templates_v0 import HDFSTemplateBank, parse_hdfs_lines
+        from usc.cli.app import cold_pack
+
+        text = data.decode("utf-8", errors="replace")
+        lines = text.splitlines()
+
+        if len(lines) < 10:  # Only try template mining on enough lines
+            return None
+
+        from drain3 import TemplateMiner
+        from drain3.template_miner_config import TemplateMinerConfig
+        import tempfile, os
+
+        config = TemplateMinerConfig()
+        config.drain_sim_th = 0.4
+        config.drain_depth = 4
+        miner = TemplateMiner(config=config)
+        for line in lines:
+            miner.add_log_message(line)
+
+        csv_lines = ["EventId,EventTemplate"]
+        for cluster in miner.drain.clusters:
+            csv_lines.append(f"E{cluster.cluster_id},{cluster.get_template()}")
+        tpl_csv = "\n".join(csv_lines) + "\n"
+
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as tf:
+            tf.write(tpl_csv)
+            tpl_path = tf.name
         try:
-            from usc.api.hdfs_template_codec_v1m_bundle import bundle_encode_and_compress_v1m
-            from usc.mem.hdfs_templates_v0 import HDFSTemplateBank, parse_hdfs_lines
-            from usc.cli.app import cold_pack
-
-            text = data.decode("utf-8", errors="replace")
-            lines = text.splitlines()
-
-            if len(lines) >= 10:  # Only try template mining on enough lines
-                from drain3 import TemplateMiner
-                from drain3.template_miner_config import TemplateMinerConfig
-                import tempfile, csv, io, os
-
-                config = TemplateMinerConfig()
-                config.drain_sim_th = 0.4
-                config.drain_depth = 4
-                miner = TemplateMiner(config=config)
-                for line in lines:
-                    miner.add_log_message(line)
-
-                csv_lines = ["EventId,EventTemplate"]
-                for cluster in miner.drain.clusters:
-                    csv_lines.append(f"E{cluster.cluster_id},{cluster.get_template()}")
-                tpl_csv = "\n".join(csv_lines) + "\n"
-
-                with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as tf:
-                    tf.write(tpl_csv)
-                    tpl_path = tf.name
-                try:
-                    bank = HDFSTemplateBank.from_csv(tpl_path)
-                    events, unknown = parse_hdfs_lines(lines, bank)
-                    bundle, _meta = bundle_encode_and_compress_v1m(
-                        events=events, unknown_lines=unknown,
-                        template_csv_text=tpl_csv, zstd_level=10,
-                    )
-                    cold = cold_pack(bundle)
-                    candidates.append((cold, "uscc"))
-                finally:
-                    os.unlink(tpl_path)
-        except Exception:
-            pass
+            bank = HDFSTemplateBank.from_csv(tpl_path)
+            events, unknown = parse_hdfs_lines(lines, bank)
+            bundle, _meta = bundle_encode_and_compress_v1m(
+                events=events, unknown_lines=unknown,
+                template_csv_text=tpl_csv, zstd_level=10,
+            )
+            return cold_pack(bundle), "uscc"
+        finally:
+            os.unlink(tpl_path)
+    except Exception:
+        return None
+
+
+def _compress_smart(data: bytes,
+                    zdict: "zstd.ZstdCompressionDict | None" = None) -> tuple[bytes, str]:
+    """Compress data using best available method. Returns (compressed, method).
+
+    The byte codecs run concurrently on a shared thread pool; template
+    mining (pure Python) runs on the calling thread meanwhile, and only
+    for inputs of at least _TEMPLATE_MIN_BYTES. With a shared dictionary
+    the zstd candidate is dictionary-compressed (USZS: magic, u32 dict ID,
+    zstd frame). Unlike the CLI's USZD, the dictionary is not embedded.
+    """
+    if len(data) < _MIN_COMPRESS_BYTES:
+        return data, "none"
+
+    candidates: list[tuple[bytes, str]] = [(data, "none")]
+
+    pool = _candidate_pool()
+    futures = []
+    if zstd is not None and zdict is not None:
+        futures.append(pool.submit(_try_zstd_dict, data, zdict))
+    elif zstd is not None:
+        futures.append(pool.submit(_try_zstd, data))
+    if _brotli is not None:
+        futures.append(pool.submit(_try_brotli, data))
+    futures.append(pool.submit(_try_bz2, data))
+
+    template = None
+    if _USC_AVAILABLE and len(data) >= _TEMPLATE_MIN_BYTES:
+        template = _try_template(data)
+
+    # Collect in submission order so ties resolve deterministically
+    for fut in futures:
+        result = fut.result()
+        if result is not None:
+            candidates.append(result)
+    if template is not None:
+        candidates.append(template)
 
     # Pick smallest
     best = min(candidates, key=lambda x: len(x[0]))
     return best
 
 
-def _decompress(data: bytes, method: str) -> bytes:
+def _decompress(data: bytes, method: str,
+                zdict: "zstd.ZstdCompressionDict | None" = None) -> bytes:
     """Decompress based on method tag."""
     if method == "none":
         return data
     if method == "uszr":
         if data[:4] != b"USZR":
             raise ValueError("Expected USZR magic")
-        return zstd.ZstdDecompressor().decompress(data[4:])
+        return _zstd_decompressor().decompress(data[4:])
+    if method == "uszs":
+        if data[:4] != b"USZS":
+            raise ValueError("Expected USZS magic")
+        if zdict is None or zdict.dict_id() != _blob_dict_id(data):
+            raise ValueError("USZS decode requires the matching shared zstd dictionary")
+        return _zstd_dict_contexts(zdict)["d"].decompress(data[8:])
     if method == "usbr":
         if data[:4] != b"USBR":
             raise ValueError("Expected USBR magic")
@@ -138,14 +259,95 @@ def _decompress(data: bytes, method: str) -> bytes:
     raise ValueError(f"Unknown compression method: {method}")
 
 
+def _blob_dict_id(data: bytes) -> int:
+    """Shared dictionary ID recorded in a USZS blob header."""
+    return struct.unpack_from("<I", data, 4)[0]
+
+
 class CompressedVault(Vault):
-    """Vault with transparent USC compression."""
+    """Vault with transparent USC compression.
+
+    An optional shared zstd dictionary (see set_shared_dict) is kept under
+    ``dicts/`` so every blob compressed with it stays decodable.
+
+    Document metadata is mirrored into a small SQLite index
+    (``doc_index.db``) so prefix lookups and stats are indexed queries
+    instead of directory scans. Sidecar ``.meta.json`` files remain the
+    source of record; an index missing on open is rebuilt from them.
+    """
+
+    def __init__(self, vault_dir: Path | str) -> None:
+        super().__init__(vault_dir)
+        index_path = self.root / "doc_index.db"
+        fresh_index = not index_path.exists()
+        self._conn = sqlite3.connect(str(index_path), check_same_thread=False,
+                                     timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_DOC_INDEX_SCHEMA)
+        if fresh_index:
+            self._backfill_doc_index()
+        self._conn.commit()
+        self._dicts_dir = self.root / "dicts"
+        self._dicts_dir.mkdir(exist_ok=True)
+        self._zdicts: dict[int, Any] = {}
+        self._zdict = None
+        active = self._dicts_dir / "active"
+        if zstd is not None and active.exists():
+            self._zdict = self._load_dict(int(active.read_text().strip()))
+
+    def set_shared_dict(self, dict_bytes: bytes) -> int:
+        """Persist a shared zstd dictionary and use it for subsequent stores.
+
+        Returns the dictionary ID. Raises RuntimeError without zstandard.
+        """
+        if zstd is None:
+            raise RuntimeError("shared zstd dictionaries require the zstandard package")
+        zdict = zstd.ZstdCompressionDict(dict_bytes)
+        did = zdict.dict_id()
+        path = self._dicts_dir / f"{did}.zdict"
+        if not path.exists():
+            path.write_bytes(dict_bytes)
+        (self._dicts_dir / "active").write_text(str(did))
+        self._zdicts[did] = zdict
+        self._zdict = zdict
+        return did
+
+    def _load_dict(self, dict_id: int):
+        zdict = self._zdicts.get(dict_id)
+        if zdict is None:
+            path = self._dicts_dir / f"{dict_id}.zdict"
+            if not path.exists():
+                from c3ae.exceptions import VaultError
+                raise VaultError(f"Missing shared zstd dictionary {dict_id}")
+            zdict = zstd.ZstdCompressionDict(path.read_bytes())
+            self._zdicts[dict_id] = zdict
+        return zdict
+
+    def _backfill_doc_index(self) -> None:
+        """Index documents already on disk from their sidecars."""
+        rows = []
+        for meta_file in (self.root / "documents").glob("*.meta.json"):
+            try:
+                meta = json_loads(meta_file.read_bytes())
+                rows.append((
+                    meta["content_hash"], meta["original_name"],
+                    meta.get("size_bytes", 0),
+                    meta.get("compressed_bytes", meta.get("size_bytes", 0)),
+                    meta.get("compression_method", "none"),
+                ))
+            except Exception:
+                continue
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO doc_meta (hash, filename, size_bytes, "
+            "compressed_bytes, compression_method) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
 
     def store_document(self, data: bytes, filename: str,
                        metadata: dict[str, Any] | None = None) -> str:
         """Store a document with compression; returns content hash as ID."""
         h = content_hash(data)
-        compressed, method = _compress_smart(data)
+        compressed, method = _compress_smart(data, self._zdict)
 
         dest = self.root / "documents" / f"{h}_{filename}"
         if method != "none":
@@ -164,14 +366,24 @@ class CompressedVault(Vault):
             **(metadata or {}),
         }
         meta_path = self.root / "documents" / f"{h}_{filename}.meta.json"
-        meta_path.write_text(json_dumps(meta))
+        meta_path.write_bytes(json_dumps_bytes(meta))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO doc_meta (hash, filename, size_bytes, "
+            "compressed_bytes, compression_method) VALUES (?, ?, ?, ?, ?)",
+            (h, filename, len(data), len(compressed), method),
+        )
+        self._conn.commit()
         return h
 
     def get_document(self, content_hash_prefix: str) -> tuple[bytes, dict[str, Any]]:
         """Retrieve and decompress document."""
         docs_dir = self.root / "documents"
-        matches = list(docs_dir.glob(f"{content_hash_prefix}*"))
-        matches = [m for m in matches if not m.name.endswith(".meta.json")]
+        # Range scan on the primary key: every hash starting with the prefix
+        matches = self._conn.execute(
+            "SELECT hash, filename, compression_method FROM doc_meta "
+            "WHERE hash >= ? AND hash < ? LIMIT 2",
+            (content_hash_prefix, content_hash_prefix + "\U0010ffff"),
+        ).fetchall()
         if not matches:
             from c3ae.exceptions import VaultError
             raise VaultError(f"No document found for hash prefix {content_hash_prefix}")
@@ -179,17 +391,18 @@ class CompressedVault(Vault):
             from c3ae.exceptions import VaultError
             raise VaultError(f"Ambiguous hash prefix {content_hash_prefix}")
 
-        doc_path = matches[0]
+        h, filename, method = matches[0]
+        base_name = f"{h}_{filename}"
+        doc_path = docs_dir / (base_name + ".usc" if method != "none" else base_name)
         raw = doc_path.read_bytes()
 
-        # Find metadata
-        # Try both with and without .usc extension
-        base_name = doc_path.name.replace(".usc", "")
         meta_path = docs_dir / f"{base_name}.meta.json"
-        meta = json_loads(meta_path.read_text()) if meta_path.exists() else {}
+        meta = json_loads(meta_path.read_bytes()) if meta_path.exists() else {}
 
         method = meta.get("compression_method", "none")
-        if method != "none":
+        if method == "uszs":
+            data = _decompress(raw, method, self._load_dict(_blob_dict_id(raw)))
+        elif method != "none":
             data = _decompress(raw, method)
         else:
             data = raw
@@ -202,7 +415,7 @@ class CompressedVault(Vault):
         session_dir.mkdir(parents=True, exist_ok=True)
 
         raw_bytes = data.encode("utf-8")
-        compressed, method = _compress_smart(raw_bytes)
+        compressed, method = _compress_smart(raw_bytes, self._zdict)
 
         if method != "none":
             dest = session_dir / f"{filename}.usc"
@@ -215,29 +428,36 @@ class CompressedVault(Vault):
                 "compression_method": method,
                 "compression_ratio": round(len(raw_bytes) / max(1, len(compressed)), 2),
             }
-            (session_dir / f"{filename}.usc.meta.json").write_text(json_dumps(meta))
+            (session_dir / f"{filename}.usc.meta.json").write_bytes(json_dumps_bytes(meta))
         else:
             dest = session_dir / filename
             dest.write_text(data)
 
         return dest
 
+    def delete_document(self, content_hash_prefix: str) -> bool:
+        deleted = super().delete_document(content_hash_prefix)
+        if deleted:
+            self._conn.execute(
+                "DELETE FROM doc_meta WHERE hash >= ? AND hash < ?",
+                (content_hash_prefix, content_hash_prefix + "\U0010ffff"),
+            )
+            self._conn.commit()
+        return deleted
+
     def compression_stats(self) -> dict[str, Any]:
         """Get overall compression statistics."""
-        docs_dir = self.root / "documents"
         total_raw = 0
         total_compressed = 0
         methods: dict[str, int] = {}
 
-        for meta_file in docs_dir.glob("*.meta.json"):
-            try:
-                meta = json_loads(meta_file.read_text())
-                total_raw += meta.get("size_bytes", 0)
-                total_compressed += meta.get("compressed_bytes", meta.get("size_bytes", 0))
-                m = meta.get("compression_method", "none")
-                methods[m] = methods.get(m, 0) + 1
-            except Exception:
-                continue
+        for method, raw, compressed, count in self._conn.execute(
+            "SELECT compression_method, SUM(size_bytes), SUM(compressed_bytes), COUNT(*) "
+            "FROM doc_meta GROUP BY compression_method"
+        ).fetchall():
+            total_raw += raw
+            total_compressed += compressed
+            methods[method] = count
 
         return {
             "total_raw_bytes": total_raw,
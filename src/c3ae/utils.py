@@ -17,32 +17,56 @@ def json_dumps(obj: Any) -> str:
     return orjson.dumps(obj).decode()
 
 
+def json_dumps_bytes(obj: Any) -> bytes:
+    """UTF-8 JSON as bytes, for writing straight to files without a decode/encode trip."""
+    return orjson.dumps(obj)
+
+
 def json_loads(data: str | bytes) -> Any:
     return orjson.loads(data)
 
 
-def content_hash(data: bytes) -> str:
+def content_hash(data: bytes | bytearray | memoryview) -> str:
+    """Hex SHA-256 of ``data``; the vault's persistent document ID.
+
+    IDs end up in vault filenames and the ``files`` table, so the algorithm
+    and hex form are part of the on-disk format. hashlib hashes any buffer
+    in one C call without copying.
+    """
     return hashlib.sha256(data).hexdigest()
 
 
+# Preferred break points, strongest first: paragraph, line, sentence, word
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
 def chunk_text(text: str, max_chars: int = 2000, overlap: int = 200) -> list[str]:
-    """Split text into overlapping chunks."""
-    if len(text) <= max_chars:
+    """Split text into overlapping chunks.
+
+    Break points come from ``str.rfind`` over the back half of each
+    window, a C scan that beats precomputing separator positions and
+    bisecting into them for any separator mix.
+    """
+    n = len(text)
+    if n <= max_chars:
         return [text]
+    half = max_chars // 2
     chunks = []
     start = 0
-    while start < len(text):
+    while start < n:
         end = start + max_chars
         # Try to break at a paragraph or sentence boundary
-        if end < len(text):
-            for sep in ["\n\n", "\n", ". ", " "]:
-                idx = text.rfind(sep, start + max_chars // 2, end)
+        if end < n:
+            for sep in _SEPARATORS:
+                idx = text.rfind(sep, start + half, end)
                 if idx != -1:
                     end = idx + len(sep)
                     break
-        chunks.append(text[start:end].strip())
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
         start = end - overlap
-    return [c for c in chunks if c]
+    return chunks
 
 
 def iso_str(dt: datetime) -> str:
@@ -3,7 +3,12 @@ N5: Framework Adapter Protocol.
 """
 from __future__ import annotations
 
-from typing import Any, Protocol, runtime_checkable
+import threading
+from typing import Any, List, Optional, Protocol, runtime_checkable
+
+import zstandard as zstd
+
+from usc.mem.zstd_trained_dict import train_dict
 
 
 @runtime_checkable
@@ -19,3 +24,72 @@ class USCAdapter(Protocol):
     def retrieve(self, blob: bytes) -> Any:
         """Decode USC blob and convert back to framework-specific format."""
         ...
+
+
+def train_adapter_dict(corpus: List[bytes], dict_size: int = 8192) -> bytes:
+    """Train a zstd dictionary from encoded adapter payloads.
+
+    Ship the bytes with the adapter (``dict_data=``): chat turns and span
+    lines repeat the same role tags and attribute keys, which a dictionary
+    makes nearly free even in sub-KB blobs.
+    """
+    return train_dict(corpus, dict_size=dict_size).dict_bytes
+
+
+class ZstdContexts:
+    """Reusable zstd contexts for an adapter instance.
+
+    Building a context costs more than compressing a short chat turn, so an
+    adapter creates one per thread on first use (contexts are not
+    thread-safe) and keeps it. With ``dict_data``, both directions use
+    that zstd dictionary.
+    """
+
+    def __init__(self, level: int = 10, dict_data: Optional[bytes] = None) -> None:
+        self.level = level
+        self.dict_data = dict_data
+        self._zdict = zstd.ZstdCompressionDict(dict_data) if dict_data else None
+        self._tls = threading.local()
+
+    def compressor(self) -> zstd.ZstdCompressor:
+        cctx = getattr(self._tls, "cctx", None)
+        if cctx is None:
+            if self._zdict is not None:
+                cctx = zstd.ZstdCompressor(level=self.level, dict_data=self._zdict)
+            else:
+                cctx = zstd.ZstdCompressor(level=self.level)
+            self._tls.cctx = cctx
+        return cctx
+
+    def decompressor(self) -> zstd.ZstdDecompressor:
+        dctx = getattr(self._tls, "dctx", None)
+        if dctx is None:
+            if self._zdict is not None:
+                dctx = zstd.ZstdDecompressor(dict_data=self._zdict)
+            else:
+                dctx = zstd.ZstdDecompressor()
+            self._tls.dctx = dctx
+        return dctx
+
+    def compress_many(self, items: List[bytes], threads: int = -1) -> List[bytes]:
+        """Compress independent payloads in one call, on ``threads`` C threads (-1 = all cores)."""
+        if not items:
+            return []
+        cctx = self.compressor()
+        if len(items) > 1 and hasattr(cctx, "multi_compress_to_buffer"):
+            collection = cctx.multi_compress_to_buffer(items, threads=threads)
+            return [seg.tobytes() for seg in collection]
+        return [cctx.compress(item) for item in items]
+
+    def decompress_many(self, blobs: List[bytes], threads: int = -1) -> List[bytes]:
+        """Decompress independent frames in one call; see compress_many."""
+        if not blobs:
+            return []
+        dctx = self.decompressor()
+        if len(blobs) > 1 and hasattr(dctx, "multi_decompress_to_buffer"):
+            try:
+                collection = dctx.multi_decompress_to_buffer(blobs, threads=threads)
+                return [seg.tobytes() for seg in collection]
+            except zstd.ZstdError:
+                pass  # e.g. a frame without a content size; decode one by one
+        return [dctx.decompress(blob) for blob in blobs]
@@ -6,9 +6,13 @@ Only importable if langchain-core is installed.
 """
 from __future__ import annotations
 
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Tuple
 
-import zstandard as zstd
+from usc.adapters.base import ZstdContexts, train_adapter_dict
+
+
+def _u32(x: int) -> bytes:
+    return int(x).to_bytes(4, "little", signed=False)
 
 
 class LangChainMemoryAdapter:
@@ -16,6 +20,16 @@ class LangChainMemoryAdapter:
 
     name: str = "langchain"
 
+    def __init__(self, level: int = 10, dict_data: Optional[bytes] = None) -> None:
+        self._zstd = ZstdContexts(level, dict_data)
+
+    @staticmethod
+    def _to_text(messages: List[Tuple[str, str]]) -> str:
+        lines = []
+        for role, content in messages:
+            lines.append(f"[{role}] {content}")
+        return "\n".join(lines)
+
     def ingest(self, messages: List[Tuple[str, str]]) -> bytes:
         """
         Convert a list of (role, content) message tuples to USC packet.
@@ -23,17 +37,70 @@ class LangChainMemoryAdapter:
         Args:
             messages: List of (role, content) tuples, e.g. [("human", "hello"), ("ai", "hi")]
         """
-        lines = []
-        for role, content in messages:
-            lines.append(f"[{role}] {content}")
-        text = "\n".join(lines)
-        cctx = zstd.ZstdCompressor(level=10)
-        return cctx.compress(text.encode("utf-8"))
+        text = self._to_text(messages)
+        return self._zstd.compressor().compress(text.encode("utf-8"))
+
+    def ingest_batch(self, histories: List[List[Tuple[str, str]]], threads: int = -1) -> List[bytes]:
+        """Like ingest() per history, compressed in one multi-threaded zstd call."""
+        items = [self._to_text(h).encode("utf-8") for h in histories]
+        return self._zstd.compress_many(items, threads=threads)
+
+    def retrieve_batch(self, blobs: List[bytes], threads: int = -1) -> List[List[Tuple[str, str]]]:
+        """Like retrieve() per blob, decompressed in one multi-threaded zstd call."""
+        return [
+            self._from_text(raw.decode("utf-8"))
+            for raw in self._zstd.decompress_many(blobs, threads=threads)
+        ]
+
+    def ingest_many(self, histories: List[List[Tuple[str, str]]]) -> bytes:
+        """
+        Compress many short histories as one zstd frame.
+
+        Each history is length-prefixed (u32) inside the frame, so one
+        compress call and one frame header cover the whole batch and
+        repetition across histories is shared.
+        """
+        frame = b"".join(
+            _u32(len(enc)) + enc
+            for enc in (self._to_text(h).encode("utf-8") for h in histories)
+        )
+        return self._zstd.compressor().compress(frame)
+
+    def retrieve_many(self, blob: bytes) -> List[List[Tuple[str, str]]]:
+        """Decode an ingest_many blob back to its list of histories."""
+        frame = memoryview(self._zstd.decompressor().decompress(blob))
+        histories = []
+        off = 0
+        while off < len(frame):
+            if off + 4 > len(frame):
+                raise ValueError("langchain: truncated batch frame")
+            n = int.from_bytes(frame[off:off + 4], "little")
+            off += 4
+            if off + n > len(frame):
+                raise ValueError("langchain: truncated batch frame")
+            histories.append(self._from_text(str(frame[off:off + n], "utf-8")))
+            off += n
+        return histories
+
+    def train_dict(self, histories: List[List[Tuple[str, str]]], dict_size: int = 8192) -> bytes:
+        """
+        Train a zstd dictionary on past histories and use it from now on.
+
+        Returns the dictionary bytes; pass them as ``dict_data`` to any
+        adapter that must read blobs written after this call.
+        """
+        samples = [self._to_text(h).encode("utf-8") for h in histories]
+        dict_bytes = train_adapter_dict(samples, dict_size=dict_size)
+        self._zstd = ZstdContexts(self._zstd.level, dict_bytes)
+        return dict_bytes
 
     def retrieve(self, blob: bytes) -> List[Tuple[str, str]]:
         """Decode USC blob back to list of (role, content) tuples."""
-        dctx = zstd.ZstdDecompressor()
-        text = dctx.decompress(blob).decode("utf-8")
+        text = self._zstd.decompressor().decompress(blob).decode("utf-8")
+        return self._from_text(text)
+
+    @staticmethod
+    def _from_text(text: str) -> List[Tuple[str, str]]:
         messages = []
         for line in text.splitlines():
             line = line.strip()
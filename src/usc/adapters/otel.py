@@ -6,13 +6,13 @@ Only importable if opentelemetry-api is installed.
 """
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
-import zstandard as zstd
+from usc.adapters.base import ZstdContexts, train_adapter_dict
 
 
-@dataclass
+@dataclass(slots=True)
 class SpanRecord:
     """Simplified span record for USC storage."""
     name: str
@@ -22,11 +22,7 @@ class SpanRecord:
     start_time: str = ""
     end_time: str = ""
     status: str = "OK"
-    attributes: Dict[str, str] = None
-
-    def __post_init__(self):
-        if self.attributes is None:
-            self.attributes = {}
+    attributes: Dict[str, str] = field(default_factory=dict)
 
 
 class OTelSpanAdapter:
@@ -34,8 +30,11 @@ class OTelSpanAdapter:
 
     name: str = "otel"
 
-    def ingest(self, spans: List[SpanRecord]) -> bytes:
-        """Convert span records to USC packet."""
+    def __init__(self, level: int = 10, dict_data: Optional[bytes] = None) -> None:
+        self._zstd = ZstdContexts(level, dict_data)
+
+    @staticmethod
+    def _to_text(spans: List[SpanRecord]) -> str:
         lines = []
         for span in spans:
             attrs = " ".join(f"{k}={v}" for k, v in span.attributes.items())
@@ -46,14 +45,43 @@ class OTelSpanAdapter:
                 f"status={span.status} {attrs}"
             )
             lines.append(line.strip())
-        text = "\n".join(lines)
-        cctx = zstd.ZstdCompressor(level=10)
-        return cctx.compress(text.encode("utf-8"))
+        return "\n".join(lines)
+
+    def ingest(self, spans: List[SpanRecord]) -> bytes:
+        """Convert span records to USC packet."""
+        text = self._to_text(spans)
+        return self._zstd.compressor().compress(text.encode("utf-8"))
+
+    def ingest_batch(self, batches: List[List[SpanRecord]], threads: int = -1) -> List[bytes]:
+        """Like ingest() per batch, compressed in one multi-threaded zstd call."""
+        items = [self._to_text(b).encode("utf-8") for b in batches]
+        return self._zstd.compress_many(items, threads=threads)
+
+    def train_dict(self, batches: List[List[SpanRecord]], dict_size: int = 8192) -> bytes:
+        """
+        Train a zstd dictionary on past span batches and use it from now on.
+
+        Returns the dictionary bytes; pass them as ``dict_data`` to any
+        adapter that must read blobs written after this call.
+        """
+        samples = [self._to_text(b).encode("utf-8") for b in batches]
+        dict_bytes = train_adapter_dict(samples, dict_size=dict_size)
+        self._zstd = ZstdContexts(self._zstd.level, dict_bytes)
+        return dict_bytes
 
     def retrieve(self, blob: bytes) -> List[SpanRecord]:
         """Decode USC blob back to span records."""
-        dctx = zstd.ZstdDecompressor()
-        text = dctx.decompress(blob).decode("utf-8")
+        text = self._zstd.decompressor().decompress(blob).decode("utf-8")
+        return self._from_text(text)
+
+    def retrieve_batch(self, blobs: List[bytes], threads: int = -1) -> List[List[SpanRecord]]:
+        """Like retrieve() per blob, decompressed in one multi-threaded zstd call."""
+        return [
+            self._from_text(raw.decode("utf-8"))
+            for raw in self._zstd.decompress_many(blobs, threads=threads)
+        ]
+
+    def _from_text(self, text: str) -> List[SpanRecord]:
         spans = []
         for line in text.splitlines():
             line = line.strip()
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import os
+import struct
+import threading
 from dataclasses import dataclass
 from typing import List, Tuple
 
@@ -21,8 +24,45 @@ from usc.mem.zstd_trained_dict import train_dict
 
 MAGIC = b"USC_ODC1"  # 8 bytes, ODC = Outer Dictionary Codec v1
 
+# Above this framed size an embedded dict costs more than it saves:
+# zstd's own window already covers the repetition, so skip training.
+DICT_TRAIN_MAX_FRAMED = 64 * 1024
 
-@dataclass
+# Opt-in zstd tuning for the plain path: wider window plus long-distance
+# matching, sized to the input. USC_TUNE_ZSTD=1 enables it.
+TUNE_ZSTD = os.environ.get("USC_TUNE_ZSTD") == "1"
+TUNED_WINDOW_LOG = 23
+
+# zstd contexts are not thread-safe; reuse plain ones per thread
+_tls = threading.local()
+
+
+def _plain_cctx(level: int) -> zstd.ZstdCompressor:
+    cache = getattr(_tls, "cctx", None)
+    if cache is None:
+        cache = _tls.cctx = {}
+    cctx = cache.get(level)
+    if cctx is None:
+        cctx = cache[level] = zstd.ZstdCompressor(level=level)
+    return cctx
+
+
+def _tuned_cctx(level: int, source_size: int) -> zstd.ZstdCompressor:
+    params = zstd.ZstdCompressionParameters.from_level(
+        level, source_size=source_size,
+        window_log=TUNED_WINDOW_LOG, enable_ldm=True,
+    )
+    return zstd.ZstdCompressor(compression_params=params)
+
+
+def _plain_dctx() -> zstd.ZstdDecompressor:
+    dctx = getattr(_tls, "dctx", None)
+    if dctx is None:
+        dctx = _tls.dctx = zstd.ZstdDecompressor()
+    return dctx
+
+
+@dataclass(slots=True)
 class ODCMeta:
     level: int
     dict_bytes: int
@@ -31,17 +71,19 @@ class ODCMeta:
     packets: int
 
 
-def _u32(x: int) -> bytes:
-    return int(x).to_bytes(4, "little", signed=False)
+_U32 = struct.Struct("<I")
+_HEAD = struct.Struct("<8sII")   # MAGIC, level, dict_len
+_SIZES = struct.Struct("<II")    # framed_len, comp_len
 
 
-def _read_u32(buf: bytes, off: int) -> Tuple[int, int]:
-    return int.from_bytes(buf[off:off + 4], "little", signed=False), off + 4
+def _u32(x: int) -> bytes:
+    return _U32.pack(x)
 
 
-def _windows(items: List[str], win: int):
-    for i in range(0, len(items), win):
-        yield items[i:i + win]
+def _read_u32(buf: bytes, off: int) -> Tuple[int, int]:
+    if off + 4 > len(buf):
+        raise ValueError("odc: truncated header")
+    return _U32.unpack_from(buf, off)[0], off + 4
 
 
 def build_v3b_packets_from_text(
@@ -63,8 +105,13 @@ def build_v3b_packets_from_text(
     apply_v3b(pkt_dict, state=st_send)
 
     packets: List[bytes] = [pkt_dict]
-    for w in _windows(chunks, window_chunks):
-        packets.append(data_v3b(w, st_send, level=level))
+    if window_chunks == 1:
+        # Common case: one chunk per packet, no window slicing
+        for c in chunks:
+            packets.append(data_v3b([c], st_send, level=level))
+    else:
+        for i in range(0, len(chunks), window_chunks):
+            packets.append(data_v3b(chunks[i:i + window_chunks], st_send, level=level))
 
     return packets
 
@@ -86,30 +133,34 @@ def odc_encode_packets(
       [zstd(comp_with_dict(framed))...]
 
     Dictionary is embedded so decode is always possible from blob alone.
-    Falls back to plain zstd (dict_len=0) if dict training fails.
+    Uses plain zstd (dict_len=0) if dict training fails or the framed
+    stream exceeds DICT_TRAIN_MAX_FRAMED.
     """
     framed = pack_packets(packets)
 
     # train dict from framed stream; fall back to plain zstd on failure
-    samples = [framed[i:i + sample_chunk_size] for i in range(0, len(framed), sample_chunk_size)]
     dict_bytes = b""
-    try:
-        bundle = train_dict(samples, dict_size=dict_target_size)
-        dict_bytes = bundle.dict_bytes
-        cctx = zstd.ZstdCompressor(level=level, dict_data=bundle.cdict)
-    except Exception:
-        cctx = zstd.ZstdCompressor(level=level)
+    cctx = None
+    if len(framed) <= DICT_TRAIN_MAX_FRAMED:
+        samples = [framed[i:i + sample_chunk_size] for i in range(0, len(framed), sample_chunk_size)]
+        try:
+            bundle = train_dict(samples, dict_size=dict_target_size)
+            dict_bytes = bundle.dict_bytes
+            cctx = zstd.ZstdCompressor(level=level, dict_data=bundle.cdict)
+        except Exception:
+            pass
+    if cctx is None:
+        cctx = _tuned_cctx(level, len(framed)) if TUNE_ZSTD else _plain_cctx(level)
 
     comp = cctx.compress(framed)
 
-    out = bytearray()
-    out += MAGIC
-    out += _u32(level)
-    out += _u32(len(dict_bytes))
-    out += dict_bytes
-    out += _u32(len(framed))
-    out += _u32(len(comp))
-    out += comp
+    # One join: the blob is allocated once at its final size
+    out = b"".join((
+        _HEAD.pack(MAGIC, level, len(dict_bytes)),
+        dict_bytes,
+        _SIZES.pack(len(framed), len(comp)),
+        comp,
+    ))
 
     meta = ODCMeta(
         level=level,
@@ -118,7 +169,7 @@ def odc_encode_packets(
         compressed_bytes=len(comp),
         packets=len(packets),
     )
-    return bytes(out), meta
+    return out, meta
 
 
 def odc_decode_to_packets(blob: bytes) -> List[bytes]:
@@ -138,14 +189,17 @@ def odc_decode_to_packets(blob: bytes) -> List[bytes]:
 
     framed_len, off = _read_u32(blob, off)
     comp_len, off = _read_u32(blob, off)
-    comp = blob[off:off + comp_len]
+    # Decompress straight from the blob; no copy of the zstd payload
+    comp = memoryview(blob)[off:off + comp_len]
 
     if len(dict_bytes) > 0:
         ddict = zstd.ZstdCompressionDict(dict_bytes)
         dctx = zstd.ZstdDecompressor(dict_data=ddict)
     else:
-        dctx = zstd.ZstdDecompressor()
-    framed = dctx.decompress(comp)
+        dctx = _plain_dctx()
+    # framed_len is known up front, so the output is one exact allocation
+    # even for frames written without a content size
+    framed = dctx.decompress(comp, max_output_size=framed_len)
 
     if len(framed) != framed_len:
         raise ValueError("odc: framed_len mismatch")
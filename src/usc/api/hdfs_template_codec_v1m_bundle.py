@@ -1,5 +1,7 @@
 import struct
+import threading
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Tuple
 
 try:
@@ -10,7 +12,7 @@ except Exception:
 from usc.api.hdfs_template_codec_v1_channels_mask import encode_and_compress_v1m
 
 
-@dataclass
+@dataclass(slots=True)
 class EncodedTemplateBundleV1M:
     raw_structured_bytes: int
     compressed_bytes: int
@@ -24,8 +26,31 @@ MAGIC = b"USC1M"
 MAGIC_V2 = b"US1M2"  # V2: zstd-compressed template CSV
 
 
+_U32 = struct.Struct("<I")
+
+
 def _u32(x: int) -> bytes:
-    return struct.pack("<I", int(x))
+    return _U32.pack(x)
+
+
+TEMPLATE_ZSTD_LEVEL = 19
+
+_tls = threading.local()
+
+
+def _template_cctx() -> "zstd.ZstdCompressor":
+    """Per-thread level-19 compressor; its match tables are costly to set up."""
+    cctx = getattr(_tls, "cctx", None)
+    if cctx is None:
+        cctx = _tls.cctx = zstd.ZstdCompressor(level=TEMPLATE_ZSTD_LEVEL)
+    return cctx
+
+
+@lru_cache(maxsize=16)
+def _compressed_template(template_csv_text: str) -> bytes:
+    """Template CSV section bytes, memoized: bundles usually share a template bank."""
+    tpl_raw = template_csv_text.encode("utf-8", errors="replace")
+    return _template_cctx().compress(tpl_raw) if zstd else tpl_raw
 
 
 def bundle_encode_and_compress_v1m(
@@ -53,16 +78,13 @@ def bundle_encode_and_compress_v1m(
         zstd_level=zstd_level,
     )
 
-    tpl_raw = template_csv_text.encode("utf-8", errors="replace")
-    tpl_bytes = zstd.ZstdCompressor(level=19).compress(tpl_raw) if zstd else tpl_raw
+    tpl_bytes = _compressed_template(template_csv_text)
 
-    out = bytearray()
-    out += MAGIC_V2
-    out += _u32(zstd_level)
-    out += _u32(len(tpl_bytes))
-    out += tpl_bytes
-    out += _u32(len(payload))
-    out += payload
+    # One join: the blob is allocated once at its final size
+    out = b"".join((
+        MAGIC_V2, _u32(zstd_level), _u32(len(tpl_bytes)), tpl_bytes,
+        _u32(len(payload)), payload,
+    ))
 
     bundle_meta = EncodedTemplateBundleV1M(
         raw_structured_bytes=meta.raw_structured_bytes,
@@ -72,7 +94,7 @@ def bundle_encode_and_compress_v1m(
         channel_count=meta.channel_count,
         bundle_bytes=len(out),
     )
-    return bytes(out), bundle_meta
+    return out, bundle_meta
 
 
 def bundle_decode_header(blob: bytes) -> Tuple[int, str, bytes]:
@@ -94,15 +116,15 @@ def bundle_decode_header(blob: bytes) -> Tuple[int, str, bytes]:
     else:
         raise ValueError(f"bad bundle magic: {blob[:5]!r}")
 
-    zstd_level = struct.unpack("<I", blob[off:off+4])[0]
+    zstd_level = _U32.unpack_from(blob, off)[0]
     off += 4
 
-    tpl_len = struct.unpack("<I", blob[off:off+4])[0]
+    tpl_len = _U32.unpack_from(blob, off)[0]
     off += 4
     tpl_bytes = blob[off:off+tpl_len]
     off += tpl_len
 
-    payload_len = struct.unpack("<I", blob[off:off+4])[0]
+    payload_len = _U32.unpack_from(blob, off)[0]
     off += 4
     payload = blob[off:off+payload_len]
 
@@ -4,6 +4,8 @@ from usc.bloom.keyword import (
     bloom_add,
     bloom_check,
     bloom_check_all,
+    bloom_add_many,
+    bloom_check_many,
 )
 from usc.bloom.semantic import (
     SemanticBloom,
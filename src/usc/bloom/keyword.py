@@ -1,21 +1,248 @@
 """
 Keyword bloom filter — extracted from existing PFQ1 code for reuse.
 Uses FNV-1a hashing (same as tpl_pfq1_query_v1).
+
+Bit positions are part of the PFQ1 and UIDX wire formats, so the hash
+(FNV-1a over code points, per-probe seeds) must not change. The k probe
+positions per token are computed by a small C kernel via ctypes (one call
+per token instead of k*len(token) interpreter steps) with a bit-identical
+pure Python fallback. bloom_add_many/bloom_check_many hash a whole token
+batch and set/test its bits in one kernel call. Every function
+takes either a bytearray bitmap or a uint8 numpy array of the same bytes.
 """
 from __future__ import annotations
 
-from typing import List
+import ctypes
+import hashlib
+import os
+import platform
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import List, Sequence, Union
+
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except ImportError:
+    _HAS_NUMPY = False
+
+_SEED_BASE = 0x9E3779B9
+_SEED_STEP = 0x85EBCA6B
+
+# --- C extension for the probe-position hot loop ---
+
+_BLOOM_C_SRC = r"""
+#include <stdint.h>
+
+/* FNV-1a over UTF-32 code points, matching fnv1a_hash32(): the seeded
+   offset basis is not truncated until the first multiply. All n_hashes
+   seeds advance together over each code point (n_hashes <= 64). */
+static void token_positions(
+    const uint32_t *codes, int lo, int hi, int n_hashes, uint64_t n_bits,
+    uint64_t *pos
+) {
+    uint64_t h[64];
+    for (int i = 0; i < n_hashes; i++)
+        h[i] = 2166136261ULL ^ (0x9E3779B9ULL + (uint64_t)i * 0x85EBCA6BULL);
+    for (int j = lo; j < hi; j++) {
+        uint64_t c = codes[j];
+        for (int i = 0; i < n_hashes; i++)
+            h[i] = ((h[i] ^ c) * 16777619ULL) & 0xFFFFFFFFULL;
+    }
+    for (int i = 0; i < n_hashes; i++)
+        pos[i] = h[i] % n_bits;
+}
+
+void fnv1a_positions(
+    const uint32_t *codes, const int32_t *offsets, int n_tokens,
+    int n_hashes, uint64_t n_bits, uint32_t *out
+) {
+    uint64_t pos[64];
+    for (int t = 0; t < n_tokens; t++) {
+        token_positions(codes, offsets[t], offsets[t + 1], n_hashes, n_bits, pos);
+        for (int i = 0; i < n_hashes; i++)
+            out[(int64_t)t * n_hashes + i] = (uint32_t)pos[i];
+    }
+}
+
+void fnv1a_bloom_add(
+    const uint32_t *codes, const int32_t *offsets, int n_tokens,
+    int n_hashes, uint64_t n_bits, uint8_t *bits
+) {
+    uint64_t pos[64];
+    for (int t = 0; t < n_tokens; t++) {
+        token_positions(codes, offsets[t], offsets[t + 1], n_hashes, n_bits, pos);
+        for (int i = 0; i < n_hashes; i++)
+            bits[pos[i] >> 3] |= (uint8_t)(1u << (pos[i] & 7));
+    }
+}
+
+void fnv1a_bloom_check(
+    const uint32_t *codes, const int32_t *offsets, int n_tokens,
+    int n_hashes, uint64_t n_bits, const uint8_t *bits, uint8_t *out
+) {
+    uint64_t pos[64];
+    for (int t = 0; t < n_tokens; t++) {
+        token_positions(codes, offsets[t], offsets[t + 1], n_hashes, n_bits, pos);
+        uint8_t hit = 1;
+        for (int i = 0; i < n_hashes && hit; i++)
+            hit = (bits[pos[i] >> 3] >> (pos[i] & 7)) & 1;
+        out[t] = hit;
+    }
+}
+"""
+
+# The kernels keep one running hash per seed on the stack
+_MAX_KERNEL_HASHES = 64
+# and write probe positions as uint32
+_MAX_KERNEL_BITS = 1 << 32
+
+_bloom_lib = None
+
+
+def _compile_bloom_lib():
+    """Compile and load the bloom C kernel. Cached on disk."""
+    global _bloom_lib
+    if _bloom_lib is not None:
+        return _bloom_lib
+
+    cache_dir = Path(tempfile.gettempdir()) / "usc_bloom_cache"
+    cache_dir.mkdir(exist_ok=True)
+    # The file name tracks the source and machine, so any change rebuilds
+    # instead of loading a stale or foreign-arch library
+    stamp = "\0".join([_BLOOM_C_SRC, platform.machine()])
+    digest = hashlib.sha256(stamp.encode()).hexdigest()[:16]
+    so_path = cache_dir / f"fnv1a_bloom_{digest}.so"
+
+    if not so_path.exists():
+        # Build under per-process names and rename into place, so a
+        # concurrent process never loads a half-written library
+        c_path = cache_dir / f"fnv1a_bloom_{digest}.{os.getpid()}.c"
+        tmp_path = cache_dir / f"fnv1a_bloom_{digest}.{os.getpid()}.so"
+        c_path.write_text(_BLOOM_C_SRC)
+        try:
+            ret = subprocess.run(
+                ["cc", "-shared", "-O3", "-fPIC", "-o", str(tmp_path), str(c_path)],
+                check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            ).returncode
+        except OSError:
+            ret = -1  # no compiler
+        finally:
+            c_path.unlink(missing_ok=True)
+        if ret != 0:
+            tmp_path.unlink(missing_ok=True)
+            return None
+        os.replace(tmp_path, so_path)
+
+    try:
+        lib = ctypes.CDLL(str(so_path))
+        lib.fnv1a_positions.restype = None
+        lib.fnv1a_positions.argtypes = [
+            ctypes.c_char_p,                  # codes (UTF-32-LE)
+            ctypes.POINTER(ctypes.c_int32),   # offsets (n_tokens + 1)
+            ctypes.c_int,                     # n_tokens
+            ctypes.c_int,                     # n_hashes
+            ctypes.c_uint64,                  # n_bits
+            ctypes.POINTER(ctypes.c_uint32),  # out (n_tokens * n_hashes)
+        ]
+        lib.fnv1a_bloom_add.restype = None
+        lib.fnv1a_bloom_add.argtypes = [
+            ctypes.c_char_p,                  # codes (UTF-32-LE)
+            ctypes.POINTER(ctypes.c_int32),   # offsets (n_tokens + 1)
+            ctypes.c_int,                     # n_tokens
+            ctypes.c_int,                     # n_hashes
+            ctypes.c_uint64,                  # n_bits
+            ctypes.c_void_p,                  # bits (updated in place)
+        ]
+        lib.fnv1a_bloom_check.restype = None
+        lib.fnv1a_bloom_check.argtypes = [
+            ctypes.c_char_p,                  # codes (UTF-32-LE)
+            ctypes.POINTER(ctypes.c_int32),   # offsets (n_tokens + 1)
+            ctypes.c_int,                     # n_tokens
+            ctypes.c_int,                     # n_hashes
+            ctypes.c_uint64,                  # n_bits
+            ctypes.c_void_p,                  # bits
+            ctypes.POINTER(ctypes.c_uint8),   # out (n_tokens)
+        ]
+        _bloom_lib = lib
+        return lib
+    except Exception:
+        return None
+
+
+# Try to compile at import time (non-blocking if fails)
+try:
+    _compile_bloom_lib()
+except Exception:
+    pass
 
 
-def fnv1a_hash32(s: str, seed: int = 0) -> int:
-    """FNV-1a 32-bit hash with seed mixing."""
+def fnv1a_hash32(s: Union[str, bytes], seed: int = 0) -> int:
+    """FNV-1a 32-bit hash with seed mixing.
+
+    ``str`` input hashes code points; ``bytes`` input hashes byte values
+    (identical for ASCII).
+    """
     h = 2166136261 ^ seed
-    for ch in s:
-        h ^= ord(ch)
-        h = (h * 16777619) & 0xFFFFFFFF
+    for c in (s if isinstance(s, (bytes, bytearray)) else map(ord, s)):
+        h = ((h ^ c) * 16777619) & 0xFFFFFFFF
     return h
 
 
+def _kernel_ok(n_bits: int, n_hashes: int) -> bool:
+    """Whether the C kernel handles these parameters; n_bits == 0 would
+    divide by zero in C, so it is left to the Python path to raise."""
+    return (
+        _bloom_lib is not None and 0 < n_bits <= _MAX_KERNEL_BITS
+        and n_hashes <= _MAX_KERNEL_HASHES
+    )
+
+
+def _probe_positions(t: str, n_bits: int, n_hashes: int) -> Sequence[int]:
+    """Bit positions probed for an already-lowercased token."""
+    if _kernel_ok(n_bits, n_hashes):
+        codes = t.encode("utf-32-le", "surrogatepass")
+        out = (ctypes.c_uint32 * n_hashes)()
+        offsets = (ctypes.c_int32 * 2)(0, len(t))
+        _bloom_lib.fnv1a_positions(codes, offsets, 1, n_hashes, n_bits, out)
+        return out
+    return [
+        fnv1a_hash32(t, _SEED_BASE + i * _SEED_STEP) % n_bits
+        for i in range(n_hashes)
+    ]
+
+
+def _pack_tokens(tokens: List[str]):
+    """UTF-32-LE code points of all tokens plus int32 start offsets.
+
+    surrogatepass keeps lone surrogates as their code points, as ord() sees
+    them in fnv1a_hash32.
+    """
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    codes = "".join(tokens).encode("utf-32-le", "surrogatepass")
+    return codes, offsets.ctypes.data_as(ctypes.POINTER(ctypes.c_int32)), offsets
+
+
+def _batch_ok(bloom, tokens: List[str], n_bits: int, n_hashes: int) -> bool:
+    """Whether a batch can go to the C kernel. A bitmap shorter than n_bits
+    stays on the Python path, which raises IndexError instead of letting
+    the kernel read or write past the buffer."""
+    return (
+        bool(tokens) and _HAS_NUMPY and _kernel_ok(n_bits, n_hashes)
+        and _bits_array(bloom).nbytes >= (n_bits + 7) // 8
+    )
+
+
+def _bits_array(bloom):
+    """uint8 view of a bloom bitmap; numpy bitmaps are used as-is."""
+    if isinstance(bloom, np.ndarray):
+        return bloom
+    return np.frombuffer(bloom, dtype=np.uint8)
+
+
 def bloom_make(n_bits: int) -> bytearray:
     """Allocate a bloom filter with n_bits bits."""
     return bytearray((n_bits + 7) // 8)
@@ -23,24 +250,51 @@ def bloom_make(n_bits: int) -> bytearray:
 
 def bloom_add(bloom: bytearray, n_bits: int, n_hashes: int, token: str) -> None:
     """Add a token to the bloom filter."""
-    t = token.lower()
-    for i in range(n_hashes):
-        h = fnv1a_hash32(t, 0x9E3779B9 + i * 0x85EBCA6B)
-        pos = h % n_bits
-        bloom[pos // 8] |= (1 << (pos % 8))
+    for pos in _probe_positions(token.lower(), n_bits, n_hashes):
+        bloom[pos >> 3] |= (1 << (pos & 7))
 
 
 def bloom_check(bloom: bytes, n_bits: int, n_hashes: int, token: str) -> bool:
     """Check if a token might be in the bloom filter."""
-    t = token.lower()
-    for i in range(n_hashes):
-        h = fnv1a_hash32(t, 0x9E3779B9 + i * 0x85EBCA6B)
-        pos = h % n_bits
-        if not (bloom[pos // 8] & (1 << (pos % 8))):
+    for pos in _probe_positions(token.lower(), n_bits, n_hashes):
+        if not (bloom[pos >> 3] & (1 << (pos & 7))):
             return False
     return True
 
 
+def bloom_add_many(bloom: bytearray, n_bits: int, n_hashes: int, tokens: List[str]) -> None:
+    """Add many tokens at once; same bits as calling bloom_add per token."""
+    _add_lowered_many(bloom, n_bits, n_hashes, [t.lower() for t in tokens])
+
+
+def _add_lowered_many(bloom, n_bits: int, n_hashes: int, tokens: List[str]) -> None:
+    """bloom_add_many for tokens the caller has already lowercased."""
+    if not _batch_ok(bloom, tokens, n_bits, n_hashes):
+        for t in tokens:
+            for pos in _probe_positions(t, n_bits, n_hashes):
+                bloom[pos >> 3] |= (1 << (pos & 7))
+        return
+    bits = _bits_array(bloom)
+    if not bits.flags.writeable:
+        raise TypeError("bloom bitmap is read-only")
+    codes, offsets_p, _keep = _pack_tokens(tokens)
+    _bloom_lib.fnv1a_bloom_add(codes, offsets_p, len(tokens), n_hashes, n_bits, bits.ctypes.data)
+
+
+def bloom_check_many(bloom: bytes, n_bits: int, n_hashes: int, tokens: List[str]) -> List[bool]:
+    """Per-token bloom_check results for a batch of tokens."""
+    if not _batch_ok(bloom, tokens, n_bits, n_hashes):
+        return [bloom_check(bloom, n_bits, n_hashes, t) for t in tokens]
+    bits = _bits_array(bloom)
+    codes, offsets_p, _keep = _pack_tokens([t.lower() for t in tokens])
+    out = np.empty(len(tokens), dtype=np.uint8)
+    _bloom_lib.fnv1a_bloom_check(
+        codes, offsets_p, len(tokens), n_hashes, n_bits, bits.ctypes.data,
+        out.ctypes.data_as(ctypes.POINTER(ctypes.c_uint8)),
+    )
+    return out.astype(bool).tolist()
+
+
 def bloom_check_all(bloom: bytes, n_bits: int, n_hashes: int, tokens: List[str]) -> bool:
     """Check if ALL tokens might be in the bloom filter."""
     return all(bloom_check(bloom, n_bits, n_hashes, t) for t in tokens)
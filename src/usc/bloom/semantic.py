@@ -8,9 +8,19 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass, field
-from typing import Callable, List, Optional
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
 
-from usc.bloom.keyword import bloom_make, bloom_add, bloom_check, bloom_check_all, fnv1a_hash32
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except ImportError:
+    _HAS_NUMPY = False
+
+from usc.bloom.keyword import (
+    bloom_make, bloom_check, bloom_check_all, bloom_check_many,
+    fnv1a_hash32, _add_lowered_many, _probe_positions,
+)
 
 _WORD_RE = re.compile(r"[A-Za-z0-9_./:-]{2,}")
 
@@ -18,8 +28,41 @@ _WORD_RE = re.compile(r"[A-Za-z0-9_./:-]{2,}")
 EmbedFn = Callable[[str], List[float]]
 
 
+@lru_cache(maxsize=4096)
+def _bucket_positions(bucket: int, n_bits: int, n_hashes: int) -> Tuple[int, ...]:
+    """Bloom bit positions of the ``__sem_bucket_{bucket}`` token, memoized.
+
+    Bucket ids are drawn from a small fixed range, so queries reuse these
+    instead of formatting and hashing the token every time.
+    """
+    return tuple(_probe_positions(f"__sem_bucket_{bucket}", n_bits, n_hashes))
+
+
+def _any_bucket_hit(bloom: "SemanticBloom", buckets: List[int]) -> bool:
+    """True if any bucket has all of its bits set."""
+    bits = bloom.bits
+    if _HAS_NUMPY and buckets:
+        pos = np.array(
+            [_bucket_positions(b, bloom.n_bits, bloom.n_hashes) for b in buckets],
+            dtype=np.uint32,
+        )
+        hit = (bits[pos >> 3] >> (pos & 7).astype(np.uint8)) & 1
+        return bool(hit.all(axis=1).any())
+    for b in buckets:
+        if all(
+            bits[pos >> 3] & (1 << (pos & 7))
+            for pos in _bucket_positions(b, bloom.n_bits, bloom.n_hashes)
+        ):
+            return True
+    return False
+
+
 def _tokenize(text: str) -> List[str]:
-    """Extract keyword tokens from text."""
+    """Extract keyword tokens from text.
+
+    Lowercasing the whole text before one findall beats lowercasing each
+    finditer match (about 2x on long traces): both passes stay in C.
+    """
     return _WORD_RE.findall(text.lower())
 
 
@@ -29,12 +72,16 @@ def embed_to_buckets(vector: List[float], n_buckets: int = 64) -> List[int]:
 
     Uses simple sign-based hashing — each dimension's sign contributes
     to a bucket index. This gives O(1) hashing with decent locality.
+    Vectorized with numpy when available; passing a numpy array skips
+    the list-to-array conversion, which dominates for list input.
     """
-    if not vector:
+    if len(vector) == 0:
         return []
-    buckets: List[int] = []
     # Group dimensions into chunks, hash each chunk's sign pattern
     chunk_size = max(1, len(vector) // n_buckets)
+    if _HAS_NUMPY:
+        return _embed_to_buckets_numpy(vector, n_buckets, chunk_size)
+    buckets: List[int] = []
     for i in range(0, len(vector), chunk_size):
         chunk = vector[i:i + chunk_size]
         # Sign hash: each positive dim = 1, negative = 0, then hash the pattern
@@ -47,17 +94,70 @@ def embed_to_buckets(vector: List[float], n_buckets: int = 64) -> List[int]:
     return list(set(buckets))  # deduplicate
 
 
-@dataclass
+def _embed_to_buckets_numpy(vector, n_buckets: int, chunk_size: int) -> List[int]:
+    """Vectorized embed_to_buckets: same buckets, same order."""
+    signs = np.asarray(vector, dtype=np.float64) >= 0
+    n_chunks = -(-signs.size // chunk_size)
+    # Pad to whole chunks of whole 32-bit words; padding counts as negative
+    width = -(-chunk_size // 32) * 32
+    padded = np.zeros(n_chunks * chunk_size, dtype=bool)
+    padded[:signs.size] = signs
+    grid = np.zeros((n_chunks, width), dtype=bool)
+    grid[:, :chunk_size] = padded.reshape(n_chunks, chunk_size)
+    # Dimension j sets bit j % 32, so OR the 32-wide words of each chunk
+    bits = grid.reshape(n_chunks, -1, 32).any(axis=1)
+    patterns = bits.astype(np.uint64) @ (np.uint64(1) << np.arange(32, dtype=np.uint64))
+    return list(set((patterns % np.uint64(n_buckets)).tolist()))
+
+
+def _empty_bits():
+    return np.zeros(0, dtype=np.uint8) if _HAS_NUMPY else bytearray()
+
+
+@dataclass(slots=True, eq=False)
 class SemanticBloom:
-    """Bloom filter that supports both keyword and semantic queries."""
+    """Bloom filter that supports both keyword and semantic queries.
+
+    ``bits`` is a uint8 numpy array (a bytearray without numpy), so batch
+    checks gather and test bytes with ufuncs instead of copying the bitmap.
+    Equality compares the bitmap bytes, not the arrays element-wise.
+    """
     n_bits: int
     n_hashes: int
-    bits: bytearray = field(default_factory=lambda: bytearray())
+    bits: "np.ndarray | bytearray" = field(default_factory=_empty_bits)
     has_semantic: bool = False
 
     def __post_init__(self):
-        if not self.bits:
-            self.bits = bloom_make(self.n_bits)
+        if len(self.bits) == 0:
+            if _HAS_NUMPY:
+                self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+            else:
+                self.bits = bloom_make(self.n_bits)
+
+    def __eq__(self, other):
+        if not isinstance(other, SemanticBloom):
+            return NotImplemented
+        return (
+            self.n_bits == other.n_bits
+            and self.n_hashes == other.n_hashes
+            and self.has_semantic == other.has_semantic
+            and self.to_bytes() == other.to_bytes()
+        )
+
+    def to_bytes(self) -> bytes:
+        """Raw bitmap bytes (same layout as bloom_make)."""
+        return bytes(self.bits)
+
+    @classmethod
+    def from_bytes(
+        cls, data: bytes, n_bits: int, n_hashes: int, has_semantic: bool = False,
+    ) -> "SemanticBloom":
+        """Rebuild a bloom from to_bytes() output."""
+        if _HAS_NUMPY:
+            bits = np.frombuffer(data, dtype=np.uint8).copy()
+        else:
+            bits = bytearray(data)
+        return cls(n_bits=n_bits, n_hashes=n_hashes, bits=bits, has_semantic=has_semantic)
 
 
 def build_semantic_bloom(
@@ -75,23 +175,29 @@ def build_semantic_bloom(
     """
     bloom = SemanticBloom(n_bits=n_bits, n_hashes=n_hashes)
 
+    if embed_fn is None:
+        # Keyword-only: one lower() and one regex scan over all texts. The
+        # newline separator is not a token character, so no tokens merge.
+        _add_lowered_many(bloom.bits, n_bits, n_hashes, _tokenize("\n".join(texts)))
+        return bloom
+
+    # Collect every token first so the bloom is filled in one batch
+    tokens: List[str] = []
     for text in texts:
         # Always add keyword tokens
-        tokens = _tokenize(text)
-        for tok in tokens:
-            bloom_add(bloom.bits, n_bits, n_hashes, tok)
-
-        # Optionally add semantic buckets
-        if embed_fn is not None:
-            try:
-                vector = embed_fn(text)
-                buckets = embed_to_buckets(vector, n_buckets)
-                for b in buckets:
-                    bloom_add(bloom.bits, n_bits, n_hashes, f"__sem_bucket_{b}")
-                bloom.has_semantic = True
-            except Exception:
-                pass  # graceful fallback to keyword-only
+        tokens.extend(_tokenize(text))
 
+        # Add semantic buckets
+        try:
+            vector = embed_fn(text)
+            buckets = embed_to_buckets(vector, n_buckets)
+            tokens.extend(f"__sem_bucket_{b}" for b in buckets)
+            bloom.has_semantic = True
+        except Exception:
+            pass  # graceful fallback to keyword-only
+
+    # Tokens are already lowercase, so skip bloom_add_many's lower() pass
+    _add_lowered_many(bloom.bits, n_bits, n_hashes, tokens)
     return bloom
 
 
@@ -118,22 +224,15 @@ def query_semantic(
     """
     # Always check keyword tokens first
     tokens = _tokenize(query_text)
-    keyword_hit = any(
-        bloom_check(bloom.bits, bloom.n_bits, bloom.n_hashes, tok)
-        for tok in tokens
-    ) if tokens else False
-
-    if keyword_hit:
+    if tokens and any(bloom_check_many(bloom.bits, bloom.n_bits, bloom.n_hashes, tokens)):
         return True
 
     # Try semantic bucket matching
     if embed_fn is not None and bloom.has_semantic:
         try:
             vector = embed_fn(query_text)
-            buckets = embed_to_buckets(vector, n_buckets)
-            for b in buckets:
-                if bloom_check(bloom.bits, bloom.n_bits, bloom.n_hashes, f"__sem_bucket_{b}"):
-                    return True
+            if _any_bucket_hit(bloom, embed_to_buckets(vector, n_buckets)):
+                return True
         except Exception:
             pass
 
@@ -153,7 +252,6 @@ def estimate_false_positive_rate(
     if not false_tokens:
         return 0.0
     false_positives = sum(
-        1 for t in false_tokens
-        if bloom_check(bloom.bits, bloom.n_bits, bloom.n_hashes, t)
+        bloom_check_many(bloom.bits, bloom.n_bits, bloom.n_hashes, false_tokens)
     )
     return false_positives / len(false_tokens)
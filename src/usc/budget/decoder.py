@@ -9,15 +9,23 @@ from typing import List, Optional
 from usc.zerocopy.lazy_packet import LazyBlob
 
 
-@dataclass
+@dataclass(slots=True)
 class PartialResult:
-    """Result of a budgeted decode."""
-    packets: List[bytes] = field(default_factory=list)
+    """Result of a budgeted decode.
+
+    ``packets`` are zero-copy views into the decoded stream; use
+    to_bytes_list() when owned bytes are needed.
+    """
+    packets: List[memoryview] = field(default_factory=list)
     total_packets: int = 0
     decoded_packets: int = 0
     total_bytes_decoded: int = 0
     budget_exhausted: bool = False
 
+    def to_bytes_list(self) -> List[bytes]:
+        """Copy the decoded packets out as bytes."""
+        return [bytes(p) for p in self.packets]
+
 
 def budgeted_decode(
     blob: bytes,
@@ -41,15 +49,15 @@ def budgeted_decode(
             result.budget_exhausted = True
             break
 
-        pkt = lazy.packet(i)
+        pkt = lazy.packet_view(i)
 
-        if bytes_so_far + len(pkt) > max_bytes and result.decoded_packets > 0:
+        if bytes_so_far + pkt.nbytes > max_bytes and result.decoded_packets > 0:
             result.budget_exhausted = True
             break
 
         result.packets.append(pkt)
         result.decoded_packets += 1
-        bytes_so_far += len(pkt)
+        bytes_so_far += pkt.nbytes
         result.total_bytes_decoded = bytes_so_far
 
     return result
@@ -1,82 +1,118 @@
 from __future__ import annotations
+import io
+import shutil
+import struct
 from pathlib import Path
+from typing import BinaryIO, Callable, Dict
+
+# Streaming decoders copy through buffers of this size instead of holding
+# the whole blob and the whole decoded text in memory at once.
+_STREAM_BUF = 1 << 20
+
 
 def sniff_magic(path: Path) -> bytes:
     with path.open("rb") as f:
         return f.read(4)
 
+
+def _write_lines(out_path: str, lines) -> None:
+    Path(out_path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _copy_text(src: BinaryIO, out_path: str) -> None:
+    """Decode a binary stream as UTF-8 (errors replaced) into out_path."""
+    text = io.TextIOWrapper(src, encoding="utf-8", errors="replace", newline="")
+    with open(out_path, "w", encoding="utf-8") as out:
+        shutil.copyfileobj(text, out, _STREAM_BUF)
+
+
+def _decode_stream(f: BinaryIO, out_path: str) -> str:
+    from usc.api.stream_codec_v3d_auto import decode_stream_auto
+    f.seek(0)
+    _write_lines(out_path, decode_stream_auto(f.read()))
+    return "stream"
+
+
+def _decode_pf3(f: BinaryIO, out_path: str) -> str:
+    from usc.mem.tpl_pf3_decode_v1_h1m2 import decode_pf3_h1m2_to_lines
+    f.seek(0)
+    _write_lines(out_path, decode_pf3_h1m2_to_lines(f.read()))
+    return "hot-lite-full"
+
+
+def _decode_hot(f: BinaryIO, out_path: str) -> str:
+    raise SystemExit("HOT decode not wired yet (USCH). Next step will add it.")
+
+
+def _decode_cold(f: BinaryIO, out_path: str) -> str:
+    raise SystemExit("COLD decode (USCC) not yet wired. Use USZR fallback mode for decodable cold.")
+
+
+def _decode_zstd(f: BinaryIO, out_path: str) -> str:
+    try:
+        import zstandard as _zstd
+    except ImportError:
+        raise SystemExit("zstandard required for USZR decode")
+    with _zstd.ZstdDecompressor().stream_reader(f, read_size=_STREAM_BUF) as reader:
+        _copy_text(reader, out_path)
+    return "cold-zstd"
+
+
+def _decode_brotli(f: BinaryIO, out_path: str) -> str:
+    try:
+        import brotli
+    except ImportError:
+        raise SystemExit("brotli required for USBR decode (pip install brotli)")
+    text = brotli.decompress(f.read()).decode("utf-8", errors="replace")
+    Path(out_path).write_text(text, encoding="utf-8")
+    return "cold-brotli"
+
+
+def _decode_bzip2(f: BinaryIO, out_path: str) -> str:
+    import bz2
+    with bz2.open(f, "rb") as reader:
+        _copy_text(reader, out_path)
+    return "cold-bzip2"
+
+
+def _decode_zstd_dict(f: BinaryIO, out_path: str) -> str:
+    try:
+        import zstandard as _zstd
+    except ImportError:
+        raise SystemExit("zstandard required for USZD decode")
+    dict_len = struct.unpack("<I", f.read(4))[0]
+    dict_data = _zstd.ZstdCompressionDict(f.read(dict_len))
+    dctx = _zstd.ZstdDecompressor(dict_data=dict_data)
+    with dctx.stream_reader(f, read_size=_STREAM_BUF) as reader:
+        _copy_text(reader, out_path)
+    return "cold-zstd-dict"
+
+
+# Container magic -> decoder(file positioned after the magic, out_path) -> mode label
+_MAGIC_DISPATCH: Dict[bytes, Callable[[BinaryIO, str], str]] = {
+    b"USST": _decode_stream,      # STREAM container
+    b"TPF3": _decode_pf3,         # PF3 (HOT-LITE-FULL)
+    b"USCH": _decode_hot,         # HOT (USCH + PFQ1)
+    b"USCC": _decode_cold,        # COLD bundle
+    b"USZR": _decode_zstd,        # raw zstd fallback
+    b"USBR": _decode_brotli,      # raw brotli fallback
+    b"USBZ": _decode_bzip2,       # raw bzip2 fallback
+    b"USZD": _decode_zstd_dict,   # trained-dictionary zstd
+}
+
+
 def decode_auto(in_path: str, out_path: str) -> str:
     """
     Auto-detect container format and route to correct decoder.
     Returns the detected mode label.
+
+    Only the 4-byte magic is read up front. The zstd and bzip2 fallbacks
+    stream from the open file, so a large cold blob is never held in
+    memory next to its decoded text.
     """
-    p = Path(in_path)
-    magic = sniff_magic(p)
-    blob = p.read_bytes()
-
-    # STREAM (USST container) -> magic = USST
-    if magic == b"USST":
-        from usc.api.stream_codec_v3d_auto import decode_stream_auto
-        lines = decode_stream_auto(blob)
-        Path(out_path).write_text("\n".join(lines) + "\n", encoding="utf-8")
-        return "stream"
-
-    # PF3 (HOT-LITE-FULL)  -> magic = TPF3
-    if magic == b"TPF3":
-        from usc.mem.tpl_pf3_decode_v1_h1m2 import decode_pf3_h1m2_to_lines
-        lines = decode_pf3_h1m2_to_lines(blob)
-        Path(out_path).write_text("\n".join(lines) + "\n", encoding="utf-8")
-        return "hot-lite-full"
-
-    # HOT (USCH + PFQ1) -> magic = USCH
-    if magic == b"USCH":
-        raise SystemExit("HOT decode not wired yet (USCH). Next step will add it.")
-
-    # COLD (USCC bundle) -> magic = USCC
-    if magic == b"USCC":
-        raise SystemExit("COLD decode (USCC) not yet wired. Use USZR fallback mode for decodable cold.")
-
-    # USZR: raw zstd fallback
-    if magic == b"USZR":
-        try:
-            import zstandard as _zstd
-        except ImportError:
-            raise SystemExit("zstandard required for USZR decode")
-        text = _zstd.ZstdDecompressor().decompress(blob[4:]).decode("utf-8", errors="replace")
-        Path(out_path).write_text(text, encoding="utf-8")
-        return "cold-zstd"
-
-    # USBR: raw brotli fallback
-    if magic == b"USBR":
-        try:
-            import brotli
-        except ImportError:
-            raise SystemExit("brotli required for USBR decode (pip install brotli)")
-        text = brotli.decompress(blob[4:]).decode("utf-8", errors="replace")
-        Path(out_path).write_text(text, encoding="utf-8")
-        return "cold-brotli"
-
-    # USBZ: raw bzip2 fallback
-    if magic == b"USBZ":
-        import bz2
-        text = bz2.decompress(blob[4:]).decode("utf-8", errors="replace")
-        Path(out_path).write_text(text, encoding="utf-8")
-        return "cold-bzip2"
-
-    # USZD: trained-dictionary zstd
-    if magic == b"USZD":
-        import struct as struct_mod
-        try:
-            import zstandard as _zstd
-        except ImportError:
-            raise SystemExit("zstandard required for USZD decode")
-        dict_len = struct_mod.unpack("<I", blob[4:8])[0]
-        dict_bytes = blob[8:8 + dict_len]
-        compressed = blob[8 + dict_len:]
-        dict_data = _zstd.ZstdCompressionDict(dict_bytes)
-        dctx = _zstd.ZstdDecompressor(dict_data=dict_data)
-        text = dctx.decompress(compressed).decode("utf-8", errors="replace")
-        Path(out_path).write_text(text, encoding="utf-8")
-        return "cold-zstd-dict"
-
-    raise SystemExit(f"Unknown file magic: {magic!r} (expected USST / TPF3 / USCH / USCC / USZR / USBR / USBZ / USZD)")
+    with Path(in_path).open("rb") as f:
+        magic = f.read(4)
+        decoder = _MAGIC_DISPATCH.get(magic)
+        if decoder is None:
+            raise SystemExit(f"Unknown file magic: {magic!r} (expected USST / TPF3 / USCH / USCC / USZR / USBR / USBZ / USZD)")
+        return decoder(f, out_path)
@@ -20,10 +20,24 @@ Usage:
 from __future__ import annotations
 
 import math
+import threading
 import time
 from collections import deque
 from dataclasses import dataclass, field
-from typing import Deque, Dict, List, Optional
+from itertools import islice
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# M2 at or below this fraction of n * max(1, mean**2) is treated as the
+# rounding residue the sliding updates leave behind (e.g. once an outlier
+# leaves a window of equal values); the window is then recomputed exactly
+_M2_RESYNC_EPS = 1e-12
+# Likewise once M2 has shrunk to this fraction of its peak since the last
+# resync: removing a large outlier cancels most of M2's significant digits
+_M2_PEAK_RESYNC = 1e-6
+# A z-score this close (relative) to an alert or severity threshold is
+# re-scored against exact window stats, so ties round the same way as a
+# direct computation
+_Z_TIE_TOL = 1e-9
 
 
 @dataclass
@@ -66,6 +80,17 @@ class AnomalyDetector:
     Low ratio = novelty (data unlike anything seen before)
     High ratio = extreme dedup (suspicious duplication or system loop)
 
+    Window mean and variance are kept as running Welford state (count,
+    mean, M2), updated in O(1) as samples enter and leave the window,
+    alongside a running sum of the window's older half for the drift
+    trend. The state is recomputed exactly from the window once per
+    window_size evictions so rounding error cannot accumulate, and
+    whenever it may have lost precision or a score lands on a threshold.
+
+    That state must move as a unit, so every method holds one lock.
+    Producers on several threads should prefer observe_many(), which
+    takes the lock once per batch rather than once per sample.
+
     Args:
         window_size: Number of recent observations to maintain
         z_threshold_low: Z-score below which to flag low-ratio anomaly
@@ -81,9 +106,108 @@ class AnomalyDetector:
         self._window_size = window_size
         self._z_low = z_threshold_low
         self._z_high = z_threshold_high
+        # Past 1.5x a threshold an alert escalates one severity level
+        self._z_low_severe = z_threshold_low * 1.5
+        self._z_high_severe = z_threshold_high * 1.5
+        self._thresholds = (
+            z_threshold_low, z_threshold_high, self._z_low_severe, self._z_high_severe,
+        )
+        # Scores inside (z_low_edge, z_high_edge) cannot be an alert or a tie
+        self._z_low_edge = z_threshold_low + _Z_TIE_TOL * max(1.0, abs(z_threshold_low))
+        self._z_high_edge = z_threshold_high - _Z_TIE_TOL * max(1.0, abs(z_threshold_high))
         self._history: Deque[float] = deque(maxlen=window_size)
         self._alerts: List[AnomalyAlert] = []
         self._observation_count: int = 0
+        self._n: int = 0
+        self._mean: float = 0.0
+        self._M2: float = 0.0
+        self._M2_peak: float = 0.0  # largest M2 since the last resync
+        self._evictions: int = 0
+        # Sum of the oldest len(history) // 2 samples
+        self._first_sum: float = 0.0
+        self._lock = threading.Lock()
+
+    def _append(self, x: float) -> None:
+        """Push x into the window, updating the running mean/M2."""
+        hist = self._history
+        if len(hist) == self._window_size:
+            if not hist:
+                return  # a zero-length window keeps nothing
+            x_old = hist[0]
+            hist.append(x)
+            self._evictions += 1
+            if self._evictions >= self._window_size:
+                self._resync()
+                return
+            # The sample now at the end of the first half crossed over
+            half = len(hist) // 2
+            if half:
+                self._first_sum += hist[half - 1] - x_old
+            # Reverse Welford for the sample that fell out
+            n = self._n - 1
+            if n == 0:
+                self._mean = 0.0
+                self._M2 = 0.0
+            else:
+                delta = x_old - self._mean
+                self._mean -= delta / n
+                self._M2 -= delta * (x_old - self._mean)
+            self._n = n
+        else:
+            hist.append(x)
+            # An odd-to-even length step grows the first half by one
+            if not len(hist) & 1:
+                self._first_sum += hist[len(hist) // 2 - 1]
+        self._n += 1
+        delta = x - self._mean
+        self._mean += delta / self._n
+        self._M2 += delta * (x - self._mean)
+        if self._M2 > self._M2_peak:
+            self._M2_peak = self._M2
+
+    def _resync(self) -> None:
+        """Recompute mean/M2 exactly from the window."""
+        self._evictions = 0
+        self._n = len(self._history)
+        self._first_sum = sum(islice(self._history, self._n // 2))
+        if self._n == 0:
+            self._mean = 0.0
+            self._M2 = self._M2_peak = 0.0
+            return
+        self._mean = sum(self._history) / self._n
+        self._M2 = self._M2_peak = sum((x - self._mean) ** 2 for x in self._history)
+
+    def _imprecise(self) -> bool:
+        """Whether the running M2 may be dominated by rounding residue."""
+        M2 = self._M2
+        sq = self._mean * self._mean
+        return (M2 <= _M2_RESYNC_EPS * self._n * (sq if sq > 1.0 else 1.0)
+                or M2 <= _M2_PEAK_RESYNC * self._M2_peak)
+
+    def _near_threshold(self, z: float) -> bool:
+        tol = _Z_TIE_TOL * max(1.0, abs(z))
+        return any(abs(z - t) <= tol for t in self._thresholds)
+
+    def _variance(self) -> float:
+        """Window variance; may resync, so read self._mean after calling."""
+        if self._imprecise():
+            self._resync()
+        return max(self._M2, 0.0) / self._n if self._n else 0.0
+
+    def _score_stats(self, ratio: float) -> Tuple[float, float]:
+        """(mean, std) to score ratio against, exact if it lands on a threshold."""
+        variance = self._variance()
+        mean = self._mean
+        std = math.sqrt(variance) if variance > 0 else 0.001
+        z = (ratio - mean) / std
+        if self._z_low_edge <= z <= self._z_high_edge:
+            return mean, std
+        if self._near_threshold(z):
+            self._resync()
+            mean = self._mean
+            variance = max(self._M2, 0.0) / self._n
+            std = math.sqrt(variance) if variance > 0 else 0.001
+        return mean, std
 
     def observe(self, ratio: float, label: str = "") -> Optional[AnomalyAlert]:
         """Record an observation and check for anomaly.
@@ -95,92 +219,177 @@ class AnomalyDetector:
         Returns:
             AnomalyAlert if anomaly detected, None otherwise.
         """
-        self._observation_count += 1
+        with self._lock:
+            self._observation_count += 1
 
-        # Need enough history for meaningful stats
-        if len(self._history) < 5:
-            self._history.append(ratio)
-            return None
+            # Need enough history for meaningful stats
+            if len(self._history) < 5:
+                self._append(ratio)
+                return None
 
-        mean = sum(self._history) / len(self._history)
-        variance = sum((x - mean) ** 2 for x in self._history) / len(self._history)
-        std = math.sqrt(variance) if variance > 0 else 0.001
+            mean, std = self._score_stats(ratio)
+            alert = self._check(ratio, label, mean, std)
+            self._append(ratio)
+            return alert
 
+    def _check(self, ratio: float, label: str, mean: float, std: float) -> Optional[AnomalyAlert]:
+        """Score ratio against the window stats; record and return any alert."""
         z_score = (ratio - mean) / std
-
-        alert = None
         if z_score < self._z_low:
-            severity = "high" if z_score < self._z_low * 1.5 else "medium"
-            alert = AnomalyAlert(
-                timestamp=time.time(),
-                label=label,
-                ratio=ratio,
-                z_score=z_score,
-                mean=mean,
-                std=std,
-                severity=severity,
-            )
-            self._alerts.append(alert)
+            severity = "high" if z_score < self._z_low_severe else "medium"
         elif z_score > self._z_high:
-            severity = "medium" if z_score > self._z_high * 1.5 else "low"
-            alert = AnomalyAlert(
-                timestamp=time.time(),
-                label=label,
-                ratio=ratio,
-                z_score=z_score,
-                mean=mean,
-                std=std,
-                severity=severity,
-            )
-            self._alerts.append(alert)
-
-        self._history.append(ratio)
+            severity = "medium" if z_score > self._z_high_severe else "low"
+        else:
+            return None
+        alert = AnomalyAlert(
+            timestamp=time.time(),
+            label=label,
+            ratio=ratio,
+            z_score=z_score,
+            mean=mean,
+            std=std,
+            severity=severity,
+        )
+        self._alerts.append(alert)
         return alert
 
+    def observe_many(
+        self, ratios: Iterable[float], labels: Optional[Sequence[str]] = None,
+    ) -> List[Optional[AnomalyAlert]]:
+        """Observe a batch of ratios; same results as calling observe() on each.
+
+        The Welford state lives in locals for the whole sweep, so each
+        sample costs a few float ops instead of several method calls and
+        attribute round-trips.
+
+        Returns:
+            One entry per ratio: its AnomalyAlert, or None.
+        """
+        with self._lock:
+            hist = self._history
+            append = hist.append
+            window = self._window_size
+            z_low, z_high = self._z_low, self._z_high
+            n, mean, M2, evictions = self._n, self._mean, self._M2, self._evictions
+            peak = self._M2_peak
+            low_edge, high_edge = self._z_low_edge, self._z_high_edge
+            first_sum = self._first_sum
+            half = window // 2
+            sqrt = math.sqrt
+            if not window:
+                # A zero-length window never fills, so nothing can alert
+                out = [None for _ in ratios]
+                self._observation_count += len(out)
+                return out
+            out: List[Optional[AnomalyAlert]] = []
+            for i, x in enumerate(ratios):
+                alert = None
+                if len(hist) >= 5:
+                    variance = max(M2, 0.0) / n
+                    std = sqrt(variance) if variance > 0 else 0.001
+                    z = (x - mean) / std
+                    sq = mean * mean
+                    if (z < low_edge or z > high_edge
+                            or M2 <= _M2_RESYNC_EPS * n * (sq if sq > 1.0 else 1.0)
+                            or M2 <= _M2_PEAK_RESYNC * peak):
+                        # Rare: hand the state back and score through the
+                        # exact-when-needed path of observe()
+                        self._n, self._mean, self._M2, self._M2_peak = n, mean, M2, peak
+                        self._evictions, self._first_sum = evictions, first_sum
+                        mean, std = self._score_stats(x)
+                        n, M2, peak = self._n, self._M2, self._M2_peak
+                        evictions, first_sum = self._evictions, self._first_sum
+                        z = (x - mean) / std
+                    if z < z_low or z > z_high:
+                        alert = self._check(x, labels[i] if labels else "", mean, std)
+                out.append(alert)
+                # Inline _append()
+                if len(hist) == window:
+                    x_old = hist[0]
+                    append(x)
+                    evictions += 1
+                    if evictions >= window:
+                        evictions = 0
+                        n = len(hist)
+                        mean = sum(hist) / n
+                        M2 = peak = sum((y - mean) ** 2 for y in hist)
+                        first_sum = sum(islice(hist, half))
+                        continue
+                    if half:
+                        first_sum += hist[half - 1] - x_old
+                    n -= 1
+                    if n == 0:
+                        mean = M2 = 0.0
+                    else:
+                        delta = x_old - mean
+                        mean -= delta / n
+                        M2 -= delta * (x_old - mean)
+                else:
+                    append(x)
+                    if not len(hist) & 1:
+                        first_sum += hist[len(hist) // 2 - 1]
+                n += 1
+                delta = x - mean
+                mean += delta / n
+                M2 += delta * (x - mean)
+                if M2 > peak:
+                    peak = M2
+            self._n, self._mean, self._M2, self._evictions = n, mean, M2, evictions
+            self._M2_peak = peak
+            self._first_sum = first_sum
+            self._observation_count += len(out)
+            return out
+
     def drift_report(self) -> DriftReport:
         """Generate a summary of current drift state."""
-        if len(self._history) < 2:
+        with self._lock:
+            if len(self._history) < 2:
+                return DriftReport(
+                    window_size=len(self._history),
+                    current_mean=sum(self._history) / max(1, len(self._history)),
+                    current_std=0.0,
+                    trend=0.0,
+                    alerts_count=len(self._alerts),
+                    is_drifting=False,
+                )
+
+            variance = self._variance()
+            mean = self._mean
+            std = math.sqrt(variance) if variance > 0 else 0.0
+
+            # Trend: compare first half vs second half means, both from
+            # running sums (first half kept directly, second by subtraction).
+            n = len(self._history)
+            half = n // 2
+            first_sum = self._first_sum
+            first_half = first_sum / max(1, half)
+            second_half = (mean * n - first_sum) / max(1, n - half)
+            trend = second_half - first_half
+
+            # Drifting if trend is significant relative to std
+            is_drifting = abs(trend) > std if std > 0 else abs(trend) > 0.5
+
             return DriftReport(
                 window_size=len(self._history),
-                current_mean=sum(self._history) / max(1, len(self._history)),
-                current_std=0.0,
-                trend=0.0,
+                current_mean=round(mean, 2),
+                current_std=round(std, 2),
+                trend=round(trend, 2),
                 alerts_count=len(self._alerts),
-                is_drifting=False,
+                is_drifting=is_drifting,
             )
 
-        mean = sum(self._history) / len(self._history)
-        variance = sum((x - mean) ** 2 for x in self._history) / len(self._history)
-        std = math.sqrt(variance) if variance > 0 else 0.0
-
-        # Trend: compare first half vs second half means
-        half = len(self._history) // 2
-        hist_list = list(self._history)
-        first_half = sum(hist_list[:half]) / max(1, half)
-        second_half = sum(hist_list[half:]) / max(1, len(hist_list) - half)
-        trend = second_half - first_half
-
-        # Drifting if trend is significant relative to std
-        is_drifting = abs(trend) > std if std > 0 else abs(trend) > 0.5
-
-        return DriftReport(
-            window_size=len(self._history),
-            current_mean=round(mean, 2),
-            current_std=round(std, 2),
-            trend=round(trend, 2),
-            alerts_count=len(self._alerts),
-            is_drifting=is_drifting,
-        )
-
     @property
     def alerts(self) -> List[AnomalyAlert]:
-        return list(self._alerts)
+        with self._lock:
+            return list(self._alerts)
 
     @property
     def observation_count(self) -> int:
         return self._observation_count
 
     def reset(self) -> None:
-        self._history.clear()
-        self._alerts.clear()
-        self._observation_count = 0
+        with self._lock:
+            self._history.clear()
+            self._alerts.clear()
+            self._observation_count = 0
+            self._resync()
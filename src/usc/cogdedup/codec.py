@@ -20,6 +20,8 @@ v2 additions:
 from __future__ import annotations
 
 import struct
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Set, Tuple
 
 try:
@@ -28,15 +30,15 @@ except ImportError:
     zstd = None
 
 from usc.cogdedup.hasher import (
-    content_defined_chunks,
+    _CDC_VERSION,
+    content_defined_chunks_with_hashes,
     sha256_hash,
-    simhash64,
     hamming_distance,
     SIMILARITY_THRESHOLD,
 )
 from usc.cogdedup.store import CogStore, ChunkEntry
 from usc.cogdedup.predictor import PredictiveCompressor
-from usc.mem.varint import encode_uvarint, decode_uvarint
+from usc.mem.varint import encode_uvarint, encode_uvarint_into, decode_uvarint
 
 
 MAGIC = b"UCOG"
@@ -48,34 +50,99 @@ DELTA = 0x01
 FULL = 0x02
 PRED_DELTA = 0x03
 
+_HEADER = MAGIC + bytes([VERSION])
+_REF_TAG = bytes([REF])
+_DELTA_TAG = bytes([DELTA])
+_FULL_TAG = bytes([FULL])
+_PRED_DELTA_TAG = bytes([PRED_DELTA])
+
+
+# Speculative encoding: a DELTA / PRED_DELTA token no larger than this
+# fraction of the estimated FULL token is emitted without trying FULL.
+# The estimate is the store's per-level moving average of FULL compression
+# ratios (CogStore.full_ratio_estimates); the lock guards its updates when
+# several threads encode into one store.
+SPECULATIVE_ACCEPT = 0.5
+_RATIO_EMA_ALPHA = 0.2
+_ratio_lock = threading.Lock()
+
+# Contexts are not thread-safe, so they are cached per thread. Dictionary
+# contexts are keyed by the dictionary source (chunk bytes or the
+# predictor's cached dict) and kept in a small LRU: building one means
+# loading the dictionary into fresh match tables, which costs far more
+# than the delta compression itself.
+_DICT_CTX_CACHE_SIZE = 64
+
+_tls = threading.local()
+
+
+def _cctx(level: int) -> "zstd.ZstdCompressor":
+    cache = getattr(_tls, "cctx", None)
+    if cache is None:
+        cache = _tls.cctx = {}
+    cctx = cache.get(level)
+    if cctx is None:
+        cctx = cache[level] = zstd.ZstdCompressor(level=level)
+    return cctx
+
+
+def _dctx() -> "zstd.ZstdDecompressor":
+    dctx = getattr(_tls, "dctx", None)
+    if dctx is None:
+        dctx = _tls.dctx = zstd.ZstdDecompressor()
+    return dctx
+
+
+def _dict_ctx(key: tuple, make):
+    """Per-thread LRU of dictionary-bound contexts; make() builds a miss."""
+    cache = getattr(_tls, "dict_ctxs", None)
+    if cache is None:
+        cache = _tls.dict_ctxs = OrderedDict()
+    ctx = cache.get(key)
+    if ctx is None:
+        ctx = cache[key] = make()
+        if len(cache) > _DICT_CTX_CACHE_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return ctx
+
 
 def _zstd_compress(data: bytes, level: int = 10) -> bytes:
     if zstd is None:
         raise RuntimeError("zstandard required")
-    return zstd.ZstdCompressor(level=level).compress(data)
+    return _cctx(level).compress(data)
 
 
 def _zstd_decompress(data: bytes) -> bytes:
     if zstd is None:
         raise RuntimeError("zstandard required")
-    return zstd.ZstdDecompressor().decompress(data)
+    return _dctx().decompress(data)
+
 
+def _compute_delta(src: bytes, dst: bytes, src_key: Optional[str] = None) -> bytes:
+    """Simple delta: zstd compress dst using src as dictionary.
 
-def _compute_delta(src: bytes, dst: bytes) -> bytes:
-    """Simple delta: zstd compress dst using src as dictionary."""
+    src_key names src in the context cache (callers pass the chunk's
+    SHA-256), so a hit does not hash the dictionary bytes again.
+    """
     if zstd is None:
         raise RuntimeError("zstandard required")
-    dict_data = zstd.ZstdCompressionDict(src)
-    cctx = zstd.ZstdCompressor(level=10, dict_data=dict_data)
+    cctx = _dict_ctx(
+        ("c", src if src_key is None else src_key),
+        lambda: zstd.ZstdCompressor(level=10, dict_data=zstd.ZstdCompressionDict(src)),
+    )
     return cctx.compress(dst)
 
 
-def _apply_delta(src: bytes, delta: bytes) -> bytes:
-    """Apply delta: decompress with src as dictionary."""
+def _apply_delta(src: bytes, delta: bytes, src_key: Optional[str] = None) -> bytes:
+    """Apply delta: decompress with src as dictionary (src_key as in _compute_delta)."""
     if zstd is None:
         raise RuntimeError("zstandard required")
-    dict_data = zstd.ZstdCompressionDict(src)
-    dctx = zstd.ZstdDecompressor(dict_data=dict_data)
+    dctx = _dict_ctx(
+        ("d", src if src_key is None else src_key),
+        lambda: zstd.ZstdDecompressor(dict_data=zstd.ZstdCompressionDict(src)),
+    )
     return dctx.decompress(delta)
 
 
@@ -83,7 +150,10 @@ def _compress_with_dict(data: bytes, dict_data: "zstd.ZstdCompressionDict", leve
     """Compress using a pre-built predictive dictionary."""
     if zstd is None:
         raise RuntimeError("zstandard required")
-    cctx = zstd.ZstdCompressor(level=level, dict_data=dict_data)
+    cctx = _dict_ctx(
+        ("pc", level, dict_data),
+        lambda: zstd.ZstdCompressor(level=level, dict_data=dict_data),
+    )
     return cctx.compress(data)
 
 
@@ -91,7 +161,7 @@ def _decompress_with_dict(data: bytes, dict_data: "zstd.ZstdCompressionDict") ->
     """Decompress using a pre-built predictive dictionary."""
     if zstd is None:
         raise RuntimeError("zstandard required")
-    dctx = zstd.ZstdDecompressor(dict_data=dict_data)
+    dctx = _dict_ctx(("pd", dict_data), lambda: zstd.ZstdDecompressor(dict_data=dict_data))
     return dctx.decompress(data)
 
 
@@ -118,75 +188,101 @@ def cogdedup_encode(
         data_id: Optional ID for compression-aware retrieval mapping
         predictor: Optional PredictiveCompressor for anticipatory compression
     """
-    chunks = content_defined_chunks(data)
-    if not chunks:
-        chunks = [data] if data else [b""]
-
-    out = bytearray()
-    out += MAGIC
-    out.append(VERSION)
-    out += encode_uvarint(len(chunks))
-
-    stats = {"ref": 0, "delta": 0, "full": 0, "pred_delta": 0, "chunks": len(chunks)}
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    # Hashes come straight from the chunk offsets; a chunk is only sliced
+    # out of data once it is known not to be an exact match
+    bounds, shas, simhashes = content_defined_chunks_with_hashes(data)
+    if not shas:
+        bounds, shas, simhashes = [0, 0], [sha256_hash(b"")], [0]
+    n_chunks = len(shas)
+
+    # One bytes token per chunk, joined once at the end
+    tokens: List[bytes] = []
+
+    stats = {
+        "ref": 0, "delta": 0, "full": 0, "pred_delta": 0, "chunks": n_chunks,
+        "full_skipped": 0, "cdc_version": _CDC_VERSION,
+    }
     chunk_ids_in_batch: List[int] = []
+    full_ratio = store.full_ratio_estimates()
+    # PRED_DELTA tag + dict id list, encoded once per distinct id tuple
+    pred_headers: Dict[Tuple[int, ...], bytes] = {}
 
-    for chunk in chunks:
-        sha = sha256_hash(chunk)
-        sh = simhash64(chunk)
+    for i, sha in enumerate(shas):
 
         # 1. Try exact match first (zero cost — just a reference)
         exact = store.lookup_exact(sha)
         if exact is not None:
-            out.append(REF)
-            out += encode_uvarint(exact.chunk_id)
+            tokens.append(_REF_TAG + encode_uvarint(exact.chunk_id))
             stats["ref"] += 1
             chunk_ids_in_batch.append(exact.chunk_id)
             continue
-
-        # 2. Compute all candidate encodings, pick the smallest
-        full_bytes = _zstd_compress(chunk, level=zstd_level)
-        full_token = bytearray([FULL])
-        full_token += encode_uvarint(len(full_bytes))
-        full_token += full_bytes
-        best_token = bytes(full_token)
+        chunk = data[bounds[i]:bounds[i + 1]]
+        sh = simhashes[i]
+
+        # 2. Candidate encodings, cheapest first. A DELTA / PRED_DELTA token
+        # well under the estimated FULL size is taken without compressing
+        # FULL at all; otherwise FULL is computed and the smallest wins.
+        ratio = full_ratio.get(zstd_level)
+        accept_len = ratio * len(chunk) * SPECULATIVE_ACCEPT if ratio is not None else -1
+        best_token: Optional[bytes] = None
         best_type = "full"
 
         # 2a. Similarity delta
         similar = store.lookup_similar(sh)
         if similar is not None:
-            delta_bytes = _compute_delta(similar.data, chunk)
-            delta_token = bytearray([DELTA])
-            delta_token += encode_uvarint(similar.chunk_id)
-            delta_token += encode_uvarint(len(delta_bytes))
-            delta_token += delta_bytes
-            if len(delta_token) < len(best_token):
-                best_token = bytes(delta_token)
-                best_type = "delta"
-
-        # 2b. Predictive pre-compression (only if no exact/similarity delta)
-        if predictor is not None and chunk_ids_in_batch:
+            delta_bytes = _compute_delta(similar.data, chunk, similar.sha256)
+            best_token = b"".join((
+                _DELTA_TAG, encode_uvarint(similar.chunk_id),
+                encode_uvarint(len(delta_bytes)), delta_bytes,
+            ))
+            best_type = "delta"
+
+        # 2b. Predictive pre-compression
+        if (predictor is not None and chunk_ids_in_batch
+                and (best_token is None or len(best_token) > accept_len)):
             last_id = chunk_ids_in_batch[-1]
             pred_result = predictor.get_dictionary_and_ids(last_id)
             if pred_result is not None:
                 pred_dict, dict_chunk_ids = pred_result
                 try:
                     pred_bytes = _compress_with_dict(chunk, pred_dict, level=zstd_level)
-                    pred_token = bytearray([PRED_DELTA])
-                    pred_token += encode_uvarint(len(dict_chunk_ids))
-                    for did in dict_chunk_ids:
-                        pred_token += encode_uvarint(did)
-                    pred_token += encode_uvarint(len(pred_bytes))
-                    pred_token += pred_bytes
-                    if len(pred_token) < len(best_token):
-                        best_token = bytes(pred_token)
+                    key = tuple(dict_chunk_ids)
+                    header = pred_headers.get(key)
+                    if header is None:
+                        buf = bytearray(_PRED_DELTA_TAG)
+                        encode_uvarint_into(buf, len(key))
+                        for did in key:
+                            encode_uvarint_into(buf, did)
+                        header = pred_headers[key] = bytes(buf)
+                    pred_token = b"".join((header, encode_uvarint(len(pred_bytes)), pred_bytes))
+                    if best_token is None or len(pred_token) < len(best_token):
+                        best_token = pred_token
                         best_type = "pred_delta"
                 except Exception:
                     pass
 
+        # 2c. FULL, unless a candidate was already accepted
+        if best_token is not None and len(best_token) <= accept_len:
+            stats["full_skipped"] += 1
+        else:
+            full_bytes = _zstd_compress(chunk, level=zstd_level)
+            if chunk:
+                r = len(full_bytes) / len(chunk)
+                with _ratio_lock:
+                    prev = full_ratio.get(zstd_level)
+                    full_ratio[zstd_level] = r if prev is None else prev + _RATIO_EMA_ALPHA * (r - prev)
+            full_token = b"".join((_FULL_TAG, encode_uvarint(len(full_bytes)), full_bytes))
+            if best_token is None or len(full_token) <= len(best_token):
+                best_token = full_token
+                best_type = "full"
+
         # Emit the winning token
-        out += best_token
+        tokens.append(best_token)
         stats[best_type] += 1
-        entry = store.store(chunk)
+        # Pass the hashes computed above so the store does not hash again
+        entry = store.store_with_hash(chunk, sha, sh)
         chunk_ids_in_batch.append(entry.chunk_id)
 
     # Post-encode: update co-occurrence and data mapping
@@ -196,7 +292,7 @@ def cogdedup_encode(
     if data_id and hasattr(store, 'register_data_chunks'):
         store.register_data_chunks(data_id, set(chunk_ids_in_batch))
 
-    return bytes(out), stats
+    return b"".join((_HEADER, encode_uvarint(n_chunks), *tokens)), stats
 
 
 def cogdedup_decode(blob: bytes, store: CogStore,
@@ -217,6 +313,7 @@ def cogdedup_decode(blob: bytes, store: CogStore,
 
     n_chunks, off = decode_uvarint(blob, off)
     parts: List[bytes] = []
+    pred_dicts: Dict[Tuple[int, ...], bytes] = {}
 
     for _ in range(n_chunks):
         chunk_type = blob[off]
@@ -238,7 +335,7 @@ def cogdedup_decode(blob: bytes, store: CogStore,
             ref_entry = store.get(ref_id)
             if ref_entry is None:
                 raise ValueError(f"DELTA ref to unknown chunk_id={ref_id}")
-            reconstructed = _apply_delta(ref_entry.data, delta_bytes)
+            reconstructed = _apply_delta(ref_entry.data, delta_bytes, ref_entry.sha256)
             parts.append(reconstructed)
 
         elif chunk_type == FULL:
@@ -258,20 +355,26 @@ def cogdedup_decode(blob: bytes, store: CogStore,
             delta_bytes = blob[off:off + delta_len]
             off += delta_len
 
-            # Rebuild dictionary from the exact chunk IDs stored in the blob
-            dict_content = b""
-            for did in dict_chunk_ids:
-                entry = store.get(did)
-                if entry is not None and entry.data:
-                    dict_content += entry.data
+            # Rebuild dictionary from the exact chunk IDs stored in the blob;
+            # sibling PRED_DELTA chunks often share the same id list
+            key = tuple(dict_chunk_ids)
+            dict_content = pred_dicts.get(key)
+            if dict_content is None:
+                dict_parts = []
+                for did in dict_chunk_ids:
+                    entry = store.get(did)
+                    if entry is not None and entry.data:
+                        dict_parts.append(entry.data)
+                dict_content = pred_dicts[key] = b"".join(dict_parts)
 
             if not dict_content:
                 raise ValueError(
                     f"PRED_DELTA: cannot rebuild dictionary from chunk_ids={dict_chunk_ids}"
                 )
 
-            dict_data = zstd.ZstdCompressionDict(dict_content)
-            reconstructed = _decompress_with_dict(delta_bytes, dict_data)
+            # Same raw-content dictionary as ZstdCompressionDict(dict_content);
+            # keyed by content so repeated dictionaries reuse their context
+            reconstructed = _apply_delta(dict_content, delta_bytes)
             parts.append(reconstructed)
 
         else:
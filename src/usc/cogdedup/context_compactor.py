@@ -93,30 +93,34 @@ class ContextCompactor:
                 chunks_total=0,
             )
 
-        # Build output: for each chunk, either keep it or replace with ref
-        parts: List[str] = []
+        # Build output as bytes: for each chunk, either keep it or replace
+        # it with a ref. The result is decoded once at the end, so kept
+        # chunks are never decoded on their own and a code point split
+        # across a chunk boundary survives intact.
+        parts: List[bytes] = []
         refs_inserted = 0
+        min_len = self._min_chunk_len
 
         for chunk in chunks:
-            chunk_text = chunk.decode("utf-8", errors="replace")
-            sha = sha256_hash(chunk)
-
-            # Look up in store
-            entry = self._store.lookup_exact(sha)
-            if (
-                entry is not None
-                and entry.ref_count >= self._min_ref_count
-                and len(chunk_text) >= self._min_chunk_len
-            ):
-                # High-frequency chunk — replace with compact reference
-                ref_placeholder = _REF_FMT.format(entry.chunk_id)
-                parts.append(ref_placeholder)
-                self._expansion_cache[entry.chunk_id] = chunk_text
-                refs_inserted += 1
-            else:
-                parts.append(chunk_text)
-
-        compressed_text = "".join(parts)
+            # Decoding never yields more chars than bytes, so a chunk this
+            # short can be kept without hashing or a store lookup
+            if len(chunk) >= min_len:
+                entry = self._store.lookup_exact(sha256_hash(chunk))
+                if entry is not None and entry.ref_count >= self._min_ref_count:
+                    chunk_text = chunk.decode("utf-8", errors="replace")
+                    if len(chunk_text) >= min_len:
+                        # High-frequency chunk — replace with compact reference
+                        parts.append(_REF_FMT.format(entry.chunk_id).encode("utf-8"))
+                        self._expansion_cache[entry.chunk_id] = chunk_text
+                        refs_inserted += 1
+                        continue
+            parts.append(chunk)
+
+        # Unchanged chunks concatenate back to exactly the prompt's bytes
+        if refs_inserted:
+            compressed_text = b"".join(parts).decode("utf-8", errors="replace")
+        else:
+            compressed_text = prompt
         orig_tokens = _estimate_tokens(prompt)
         comp_tokens = _estimate_tokens(compressed_text)
         savings = ((orig_tokens - comp_tokens) / max(1, orig_tokens)) * 100.0
@@ -139,17 +143,26 @@ class ContextCompactor:
         Used when LLM output echoes back references (rare but possible).
         Also used to reconstruct the full prompt if needed for logging.
         """
-        def _replace(m: re.Match) -> str:
-            chunk_id = int(m.group(1))
-            if chunk_id in self._expansion_cache:
-                return self._expansion_cache[chunk_id]
-            # Try store
-            entry = self._store.get(chunk_id)
-            if entry is not None and entry.data:
-                return entry.data.decode("utf-8", errors="replace")
-            return m.group(0)  # Can't expand — leave as-is
-
-        return _REF_PATTERN.sub(_replace, text)
+        # split() with one capture group alternates text / chunk-id digits;
+        # resolving the ids in place avoids a Python callback per match.
+        parts = _REF_PATTERN.split(text)
+        for i in range(1, len(parts), 2):
+            expanded = self._resolve(int(parts[i]))
+            # Can't expand — leave the placeholder as-is
+            parts[i] = expanded if expanded is not None else f"«REF:{parts[i]}»"
+        return "".join(parts)
+
+    def _resolve(self, chunk_id: int) -> Optional[str]:
+        """Decoded text for chunk_id, memoized in the expansion cache."""
+        cached = self._expansion_cache.get(chunk_id)
+        if cached is not None:
+            return cached
+        entry = self._store.get(chunk_id)
+        if entry is not None and entry.data:
+            text = entry.data.decode("utf-8", errors="replace")
+            self._expansion_cache[chunk_id] = text
+            return text
+        return None
 
     def expand_prompt(self, compressed_text: str) -> str:
         """Alias for expand_response — works on any text with refs."""
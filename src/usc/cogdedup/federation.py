@@ -24,11 +24,15 @@ Usage:
 """
 from __future__ import annotations
 
+from collections import OrderedDict
 from typing import Dict, List, Optional, Set
 
 from usc.cogdedup.store import CogStore, MemoryCogStore, ChunkEntry
 from usc.cogdedup.hasher import sha256_hash, simhash64
 
+# Per-agent LRU of simhashes known to have no similar chunk in shared
+SHARED_MISS_CACHE_SIZE = 4096
+
 
 class FederatedStore(CogStore):
     """A federated store that checks shared tier first, then local.
@@ -52,6 +56,10 @@ class FederatedStore(CogStore):
         self._promoted: Set[str] = set()  # sha256 hashes
         # Local ID -> shared ID mapping
         self._id_remap: Dict[int, int] = {}
+        # Simhashes that found nothing similar in shared, valid while the
+        # shared store's size is unchanged (it only changes by insertion)
+        self._shared_sim_neg: "OrderedDict[int, None]" = OrderedDict()
+        self._shared_sim_gen = -1
 
     @property
     def agent_id(self) -> str:
@@ -65,14 +73,29 @@ class FederatedStore(CogStore):
         return self._local.lookup_exact(sha256)
 
     def lookup_similar(self, simhash: int) -> Optional[ChunkEntry]:
-        # Check shared first
-        entry = self._shared.lookup_similar(simhash)
-        if entry is not None:
-            return entry
+        # Check shared first, unless this simhash already missed there
+        gen = self._shared.size
+        if gen != self._shared_sim_gen:
+            self._shared_sim_neg.clear()
+            self._shared_sim_gen = gen
+        neg = self._shared_sim_neg
+        if simhash in neg:
+            neg.move_to_end(simhash)
+        else:
+            entry = self._shared.lookup_similar(simhash)
+            if entry is not None:
+                return entry
+            neg[simhash] = None
+            if len(neg) > SHARED_MISS_CACHE_SIZE:
+                neg.popitem(last=False)
         return self._local.lookup_similar(simhash)
 
     def store(self, data: bytes) -> ChunkEntry:
-        sha = sha256_hash(data)
+        return self.store_with_hash(data, sha256_hash(data))
+
+    def store_with_hash(self, data: bytes, sha256: str,
+                        simhash: Optional[int] = None) -> ChunkEntry:
+        sha = sha256
 
         # Check if already in shared
         shared_entry = self._shared.lookup_exact(sha)
@@ -80,7 +103,7 @@ class FederatedStore(CogStore):
             return shared_entry
 
         # Store locally
-        entry = self._local.store(data)
+        entry = self._local.store_with_hash(data, sha, simhash)
 
         # Check for promotion: if ref_count exceeds threshold
         if entry.ref_count >= self._promote_threshold and sha not in self._promoted:
@@ -104,7 +127,7 @@ class FederatedStore(CogStore):
         """Promote a local chunk to the shared tier."""
         if entry.data is None:
             return
-        shared_entry = self._shared.store(entry.data)
+        shared_entry = self._shared.store_with_hash(entry.data, entry.sha256, entry.simhash)
         self._promoted.add(entry.sha256)
         self._id_remap[entry.chunk_id] = shared_entry.chunk_id
 
@@ -3,6 +3,9 @@
 Performance-critical module:
 - simhash64: numpy vectorization (~112x faster than pure Python)
 - content_defined_chunks: C extension via ctypes (~50x faster) with Python fallback
+- simhash64 runs in the same C extension when it is available, and
+  content_defined_chunks_with_hashes chunks and hashes a buffer without
+  slicing out the chunks
 Falls back to pure Python if dependencies unavailable.
 """
 from __future__ import annotations
@@ -10,10 +13,15 @@ from __future__ import annotations
 import ctypes
 import hashlib
 import os
+import platform
 import struct
+import subprocess
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 try:
     import numpy as np
@@ -22,50 +30,243 @@ except ImportError:
     _HAS_NUMPY = False
 
 
-# Rabin fingerprint parameters for content-defined chunking
-_RABIN_POLY = 0x3DA3358B4DC173
-_RABIN_WINDOW = 48
+# Content-defined chunking: FastCDC-style Gear hash with normalized
+# chunking. The rolling fingerprint is fp = (fp << 1) + _GEAR[byte];
+# chunks shorter than the average size must hit the stricter _MASK_S,
+# longer ones the looser _MASK_L, which pulls sizes toward _AVG_CHUNK.
+# Bump _CDC_VERSION whenever boundaries change: it is reported in encode
+# stats and recorded by persistent stores, whose chunks keep the boundaries
+# of the version they were cut under (1 = the pre-Gear shift/xor hash).
+_CDC_VERSION = 2
 _MIN_CHUNK = 1024      # 1 KB minimum chunk
 _AVG_CHUNK = 4096      # 4 KB average chunk
 _MAX_CHUNK = 16384     # 16 KB maximum chunk
-_MASK = _AVG_CHUNK - 1  # must be power-of-2 minus 1
+# Masks sit in the top bits of the low 32 so each masked bit mixes in
+# 19-32 trailing bytes (a low-bit mask would only see the last few)
+_MASK_S = ((_AVG_CHUNK << 2) - 1) << 18
+_MASK_L = ((_AVG_CHUNK >> 2) - 1) << 22
+# Trailing bytes that reach the masked fingerprint bits
+_FP_WINDOW = max(_MASK_S, _MASK_L).bit_length()
+_FP_MASK = (1 << _FP_WINDOW) - 1
+_GEAR_SEED = 0x6745230198BADCFE
+# Native CDC splits inputs at least this large across threads (multi-core only)
+PARALLEL_CDC_MIN_BYTES = 4 << 20
+
+
+def _splitmix64(seed: int, n: int) -> List[int]:
+    out = []
+    x = seed
+    for _ in range(n):
+        x = (x + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        z = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        out.append(z ^ (z >> 31))
+    return out
+
+
+# Pseudo-random 64-bit value per byte, shared by the C kernel and fallbacks
+_GEAR = _splitmix64(_GEAR_SEED, 256)
 
 # FNV-1a constants
 _FNV_OFFSET = 0xcbf29ce484222325
 _FNV_PRIME = 0x100000001b3
+# First FNV-1a step for every byte value, for the pure Python SimHash
+_FNV_FIRST = [((_FNV_OFFSET ^ b) * _FNV_PRIME) & 0xFFFFFFFFFFFFFFFF for b in range(256)]
+# _BYTES_WITH_BIT[k] lists the byte values with bit k set
+_BYTES_WITH_BIT = [[v for v in range(256) if v >> k & 1] for k in range(8)]
 
 # --- C extension for CDC hot loop ---
 
 _CDC_C_SRC = r"""
 #include <stdint.h>
+#include <string.h>
+
+static const uint64_t GEAR[256] = {@GEAR@};
+
+/* Roll fp (the fingerprint just before position i) over [i, last] and
+   return the first position whose fingerprint hits mask, or -1; *fpp is
+   left at the returned (or last) position. Four positions per step: each
+   one's fingerprint is fp shifted plus a combination of its gear values
+   that does not depend on fp, so the loop-carried chain is one shift-add
+   per four bytes instead of per byte. */
+static int roll_scan(const uint8_t *d, int i, int last, uint64_t mask, uint64_t *fpp) {
+    uint64_t fp = *fpp;
+    for (; i + 3 <= last; i += 4) {
+        uint64_t t0 = GEAR[d[i]];
+        uint64_t t1 = (t0 << 1) + GEAR[d[i + 1]];
+        uint64_t t2 = (t1 << 1) + GEAR[d[i + 2]];
+        uint64_t t3 = (t2 << 1) + GEAR[d[i + 3]];
+        uint64_t f0 = (fp << 1) + t0, f1 = (fp << 2) + t1;
+        uint64_t f2 = (fp << 3) + t2, f3 = (fp << 4) + t3;
+        if (!((f0 & mask) && (f1 & mask) && (f2 & mask) && (f3 & mask))) {
+            if (!(f0 & mask)) { *fpp = f0; return i; }
+            if (!(f1 & mask)) { *fpp = f1; return i + 1; }
+            if (!(f2 & mask)) { *fpp = f2; return i + 2; }
+            *fpp = f3;
+            return i + 3;
+        }
+        fp = f3;
+    }
+    for (; i <= last; i++) {
+        fp = (fp << 1) + GEAR[d[i]];
+        if (!(fp & mask)) { *fpp = fp; return i; }
+    }
+    *fpp = fp;
+    return -1;
+}
+
+/* End of the chunk starting at d[0], given d[0:n] and that offsets
+   below `from` are already known not to cut; -1 if the cut lies beyond
+   d[n - 1]. Cuts match rolling fp = (fp << 1) + GEAR[byte] from the chunk
+   start and cutting where clen >= max_chunk or (fp & mask) == 0, with
+   mask = clen < avg_chunk ? mask_s : mask_l, never below min_chunk.
+   A byte more than 63 positions back is shifted out of fp entirely, so
+   fp is seeded from the 64 bytes before the first candidate and the rest
+   of the prefix is skipped; the same seeding lets a stream resume the
+   scan of a growing chunk at `from`. */
+int cdc_next_cut(
+    const uint8_t *d, int n, int from,
+    int min_chunk, int avg_chunk, int max_chunk,
+    uint64_t mask_s, uint64_t mask_l
+) {
+    int first = from > min_chunk - 1 ? from : min_chunk - 1;
+    int loose = avg_chunk - 1;   /* first offset using mask_l */
+    int last = max_chunk - 1;
+    int forced = 1;
+    if (last >= n) {
+        last = n - 1;
+        forced = 0;
+    }
+    if (first > last) return -1;
 
+    uint64_t fp = 0;
+    for (int k = first - 64 < 0 ? 0 : first - 64; k < first; k++)
+        fp = (fp << 1) + GEAR[d[k]];
+
+    int hit = roll_scan(d, first, loose - 1 < last ? loose - 1 : last, mask_s, &fp);
+    if (hit < 0)
+        hit = roll_scan(d, loose > first ? loose : first, last, mask_l, &fp);
+
+    if (hit >= 0) return hit + 1;
+    return forced ? last + 1 : -1;
+}
+
+/* Every chunk end of data[0:n] except a trailing partial chunk */
 int cdc_boundaries(
     const uint8_t *data, int n,
     int *out_bounds, int max_bounds,
-    int min_chunk, int max_chunk, uint64_t mask
+    int min_chunk, int avg_chunk, int max_chunk,
+    uint64_t mask_s, uint64_t mask_l
 ) {
+    if (min_chunk < 1) min_chunk = 1;
+    if (max_chunk < min_chunk) max_chunk = min_chunk;
+
     int count = 0;
     int start = 0;
-    uint64_t fp = 0;
+    while (start + min_chunk <= n) {
+        int len = cdc_next_cut(data + start, n - start, 0,
+                               min_chunk, avg_chunk, max_chunk, mask_s, mask_l);
+        if (len < 0) break;
+        if (count < max_bounds)
+            out_bounds[count] = start + len;
+        count++;
+        start += len;
+    }
+    return count;
+}
 
-    for (int i = 0; i < n; i++) {
-        fp = (fp << 1) ^ data[i];
-        int clen = i - start + 1;
-        if (clen < min_chunk) continue;
-        if (clen >= max_chunk || (fp & mask) == 0) {
-            if (count < max_bounds)
-                out_bounds[count] = i + 1;
+/* Every position in [lo, hi) whose fp hits mask_s (flag bit 0) or mask_l
+   (flag bit 1). Chunks are at least 64 bytes, so fp at any position
+   cdc_boundaries can cut at depends only on the trailing 64 bytes, not on
+   where the chunk started: disjoint ranges can be scanned independently
+   and the cuts picked from the merged list afterwards. Returns -1 if more
+   than max_out positions hit. */
+int cdc_candidates(
+    const uint8_t *data, int lo, int hi,
+    int *out_pos, uint8_t *out_flags, int max_out,
+    uint64_t mask_s, uint64_t mask_l
+) {
+    uint64_t fp = 0;
+    for (int k = lo - 64 < 0 ? 0 : lo - 64; k < lo; k++)
+        fp = (fp << 1) + GEAR[data[k]];
+    int count = 0;
+    for (int i = lo; i < hi; i++) {
+        fp = (fp << 1) + GEAR[data[i]];
+        uint8_t f = (uint8_t)(!(fp & mask_s) | (!(fp & mask_l) << 1));
+        if (f) {
+            if (count >= max_out) return -1;
+            out_pos[count] = i;
+            out_flags[count] = f;
             count++;
-            start = i + 1;
-            fp = 0;
         }
     }
     return count;
 }
-"""
+
+/* simhash64() of d[0:n]: FNV-1a over every 4-byte shingle, then a
+   majority vote per bit. Each byte of the shingle hashes is histogrammed
+   (eight 256-entry tables) and the per-bit counts are read off the
+   tables, instead of 64 counter updates per shingle. */
+uint64_t simhash64(const uint8_t *d, int n) {
+    if (n < 4) return 0;
+    uint32_t hist[8][256];
+    memset(hist, 0, sizeof hist);
+    int m = n - 3;
+    for (int i = 0; i < m; i++) {
+        uint64_t h = (0xcbf29ce484222325ULL ^ d[i]) * 0x100000001b3ULL;
+        h = (h ^ d[i + 1]) * 0x100000001b3ULL;
+        h = (h ^ d[i + 2]) * 0x100000001b3ULL;
+        h = (h ^ d[i + 3]) * 0x100000001b3ULL;
+        for (int k = 0; k < 8; k++)
+            hist[k][(h >> (8 * k)) & 255]++;
+    }
+    /* Count of bit j = the upper half of a 2^(j+1)-entry table; folding
+       that half onto the lower one then leaves the table for bit j - 1 */
+    uint64_t result = 0;
+    for (int k = 0; k < 8; k++) {
+        uint32_t *t = hist[k];
+        for (int j = 7; j >= 0; j--) {
+            int half = 1 << j;
+            uint64_t c = 0;
+            for (int v = 0; v < half; v++) {
+                c += t[half + v];
+                t[v] += t[half + v];
+            }
+            if (2 * c > (uint64_t)m) result |= 1ULL << (8 * k + j);
+        }
+    }
+    return result;
+}
+
+/* simhash64() of every chunk data[bounds[i]:bounds[i + 1]], i < n_chunks */
+void simhash_chunks(const uint8_t *data, const int *bounds, int n_chunks, uint64_t *out) {
+    for (int i = 0; i < n_chunks; i++)
+        out[i] = simhash64(data + bounds[i], bounds[i + 1] - bounds[i]);
+}
+""".replace("@GEAR@", ", ".join(f"0x{g:016x}ULL" for g in _GEAR))
 
 _cdc_lib = None
 
+# Tuned for the build host; retried without them if the compiler refuses
+_CDC_NATIVE_FLAGS = ("-march=native", "-mtune=native")
+
+
+def _cpu_features() -> str:
+    """CPU feature list -march=native compiles for, or the hostname if unknown.
+
+    A temp dir shared across hosts (NFS, container images) must not hand a
+    library built for one CPU to another with fewer instruction-set extensions.
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                # "flags" on x86, "Features" on ARM
+                if line.startswith(("flags", "Features")):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.node()
+
 
 def _compile_cdc_lib():
     """Compile and load CDC C extension. Cached on disk."""
@@ -75,26 +276,74 @@ def _compile_cdc_lib():
 
     cache_dir = Path(tempfile.gettempdir()) / "usc_cogdedup_cache"
     cache_dir.mkdir(exist_ok=True)
-    so_path = cache_dir / "cdc_fast.so"
-    c_path = cache_dir / "cdc_fast.c"
+    # The file name tracks the source, flags, machine and CPU features, so
+    # any change rebuilds instead of loading a stale or foreign-CPU library
+    stamp = "\0".join([_CDC_C_SRC, *_CDC_NATIVE_FLAGS, platform.machine(), _cpu_features()])
+    digest = hashlib.sha256(stamp.encode()).hexdigest()[:16]
+    so_path = cache_dir / f"cdc_fast_{digest}.so"
 
     if not so_path.exists():
+        c_path = cache_dir / f"cdc_fast_{digest}.{os.getpid()}.c"
+        tmp_path = cache_dir / f"cdc_fast_{digest}.{os.getpid()}.so"
         c_path.write_text(_CDC_C_SRC)
-        ret = os.system(f"cc -shared -O3 -fPIC -o {so_path} {c_path} 2>/dev/null")
-        if ret != 0:
-            return None
+        try:
+            for flags in (_CDC_NATIVE_FLAGS, ()):
+                ret = subprocess.run(
+                    ["cc", "-shared", "-O3", *flags, "-fPIC", "-o", str(tmp_path), str(c_path)],
+                    check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                ).returncode
+                if ret == 0:
+                    break
+            else:
+                return None
+            os.replace(tmp_path, so_path)
+        finally:
+            c_path.unlink(missing_ok=True)
 
     try:
         lib = ctypes.CDLL(str(so_path))
         lib.cdc_boundaries.restype = ctypes.c_int
         lib.cdc_boundaries.argtypes = [
-            ctypes.POINTER(ctypes.c_uint8),  # data
+            ctypes.c_char_p,                  # data (bytes, passed without a copy)
             ctypes.c_int,                     # n
             ctypes.POINTER(ctypes.c_int),     # out_bounds
             ctypes.c_int,                     # max_bounds
             ctypes.c_int,                     # min_chunk
+            ctypes.c_int,                     # avg_chunk
+            ctypes.c_int,                     # max_chunk
+            ctypes.c_uint64,                  # mask_s
+            ctypes.c_uint64,                  # mask_l
+        ]
+        lib.cdc_next_cut.restype = ctypes.c_int
+        lib.cdc_next_cut.argtypes = [
+            ctypes.c_void_p,                  # d (chunk start inside a buffer)
+            ctypes.c_int,                     # n
+            ctypes.c_int,                     # from
+            ctypes.c_int,                     # min_chunk
+            ctypes.c_int,                     # avg_chunk
             ctypes.c_int,                     # max_chunk
-            ctypes.c_uint64,                  # mask
+            ctypes.c_uint64,                  # mask_s
+            ctypes.c_uint64,                  # mask_l
+        ]
+        lib.cdc_candidates.restype = ctypes.c_int
+        lib.cdc_candidates.argtypes = [
+            ctypes.c_char_p,                  # data (bytes, passed without a copy)
+            ctypes.c_int,                     # lo
+            ctypes.c_int,                     # hi
+            ctypes.POINTER(ctypes.c_int),     # out_pos
+            ctypes.POINTER(ctypes.c_uint8),   # out_flags
+            ctypes.c_int,                     # max_out
+            ctypes.c_uint64,                  # mask_s
+            ctypes.c_uint64,                  # mask_l
+        ]
+        lib.simhash64.restype = ctypes.c_uint64
+        lib.simhash64.argtypes = [ctypes.c_char_p, ctypes.c_int]
+        lib.simhash_chunks.restype = None
+        lib.simhash_chunks.argtypes = [
+            ctypes.c_char_p,                  # data
+            ctypes.POINTER(ctypes.c_int),     # bounds (n_chunks + 1)
+            ctypes.c_int,                     # n_chunks
+            ctypes.POINTER(ctypes.c_uint64),  # out
         ]
         _cdc_lib = lib
         return lib
@@ -110,7 +359,7 @@ except Exception:
 
 
 def content_defined_chunks(data: bytes) -> List[bytes]:
-    """Split data into content-defined chunks using Rabin fingerprint.
+    """Split data into content-defined chunks using a Gear fingerprint.
 
     Returns list of byte chunks. Chunk boundaries are determined by the
     content itself, so insertions/deletions only affect nearby chunks.
@@ -123,22 +372,139 @@ def content_defined_chunks(data: bytes) -> List[bytes]:
     return _cdc_python(data)
 
 
+def content_defined_chunks_with_hashes(data: bytes) -> Tuple[List[int], List[str], List[int]]:
+    """Chunk offsets of content_defined_chunks plus each chunk's hashes.
+
+    Returns (bounds, shas, simhashes): chunk i is data[bounds[i]:bounds[i + 1]]
+    and has sha256_hash shas[i] and simhash64 simhashes[i]. With the C
+    extension no chunk is sliced out of data: the SimHashes come from one
+    kernel call over the boundary array and the digests from memoryview
+    slices.
+    """
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    n = len(data)
+    if _cdc_lib is None or n <= _MIN_CHUNK:
+        chunks = content_defined_chunks(data)
+        bounds = [0]
+        bounds.extend(accumulate(map(len, chunks)))
+        return bounds, sha256_hash_batch(chunks), [simhash64(c) for c in chunks]
+
+    bounds = [0]
+    bounds.extend(_cdc_native_bounds(data))
+    if bounds[-1] < n:
+        bounds.append(n)
+    n_chunks = len(bounds) - 1
+    bounds_arr = (ctypes.c_int * len(bounds))(*bounds)
+    sims = (ctypes.c_uint64 * n_chunks)()
+    _cdc_lib.simhash_chunks(data, bounds_arr, n_chunks, sims)
+    view = memoryview(data)
+    sha256 = hashlib.sha256
+    shas = [sha256(view[a:b]).hexdigest() for a, b in zip(bounds, bounds[1:])]
+    return bounds, shas, sims[:]
+
+
+# Per-thread boundary buffer for _cdc_native, grown on demand and reused
+_cdc_tls = threading.local()
+
+
+def _cdc_bounds_buffer(max_bounds: int):
+    buf = getattr(_cdc_tls, "bounds", None)
+    if buf is None or len(buf) < max_bounds:
+        buf = _cdc_tls.bounds = (ctypes.c_int * max_bounds)()
+    return buf
+
+
+def _cdc_segment_candidates(data: bytes, lo: int, hi: int):
+    """(positions, flags) of cdc_candidates over [lo, hi), or None on overflow."""
+    max_out = (hi - lo) // 64 + 64
+    pos = (ctypes.c_int * max_out)()
+    flags = (ctypes.c_uint8 * max_out)()
+    count = _cdc_lib.cdc_candidates(data, lo, hi, pos, flags, max_out, _MASK_S, _MASK_L)
+    if count < 0:
+        return None
+    return pos[:count], flags[:count]
+
+
+def _cdc_parallel_bounds(data: bytes, workers: int) -> Optional[List[int]]:
+    """Chunk ends identical to cdc_boundaries, scanned by several threads.
+
+    Each thread lists the mask hits of one slice of the input; the cuts
+    are then picked from the merged list in order, which only visits about
+    one hit per kilobyte. Returns None when a slice hits too often (highly
+    repetitive input) for the candidate buffers to pay off.
+    """
+    n = len(data)
+    step = -(-n // workers)
+    parts = list(_get_hash_pool().map(
+        lambda lo: _cdc_segment_candidates(data, lo, min(lo + step, n)),
+        range(0, n, step),
+    ))
+    if any(p is None for p in parts):
+        return None
+    cands = [c for p, _ in parts for c in p]
+    flags = [f for _, part_flags in parts for f in part_flags]
+
+    bounds: List[int] = []
+    start = k = 0
+    m = len(cands)
+    while start + _MIN_CHUNK <= n:
+        first = start + _MIN_CHUNK - 1
+        loose = start + _AVG_CHUNK - 1
+        last = min(start + _MAX_CHUNK, n) - 1
+        while k < m and cands[k] < first:
+            k += 1
+        end = 0
+        j = k
+        while j < m and cands[j] <= last:
+            if flags[j] & (2 if cands[j] >= loose else 1):
+                end = cands[j] + 1
+                break
+            j += 1
+        if not end:
+            if start + _MAX_CHUNK > n:
+                break
+            end = start + _MAX_CHUNK
+        bounds.append(end)
+        start = end
+    return bounds
+
+
+def _cdc_native_bounds(data: bytes) -> List[int]:
+    """Chunk end offsets from the C scan, not counting a trailing partial chunk.
+
+    ctypes.CDLL calls drop the GIL for their duration and the kernels
+    touch no Python objects, so other threads keep running during a scan.
+    Inputs of at least PARALLEL_CDC_MIN_BYTES on multi-core machines are
+    additionally split across the shared hash pool; the chunks are the
+    same as from a single scan.
+    """
+    n = len(data)
+    bounds = None
+    workers = min(os.cpu_count() or 1, n // (PARALLEL_CDC_MIN_BYTES >> 2))
+    if n >= PARALLEL_CDC_MIN_BYTES and workers > 1:
+        bounds = _cdc_parallel_bounds(data, workers)
+    if bounds is None:
+        max_bounds = n // _MIN_CHUNK + 2
+        out_bounds = _cdc_bounds_buffer(max_bounds)
+        # bytes convert to const char* in place; no copy of the input
+        count = _cdc_lib.cdc_boundaries(
+            data, n, out_bounds, max_bounds,
+            _MIN_CHUNK, _AVG_CHUNK, _MAX_CHUNK, _MASK_S, _MASK_L,
+        )
+        bounds = out_bounds[:min(count, max_bounds)]
+    return bounds
+
+
 def _cdc_native(data: bytes) -> List[bytes]:
     """C-accelerated content-defined chunking."""
+    if not isinstance(data, bytes):
+        data = bytes(data)
     n = len(data)
-    max_bounds = n // _MIN_CHUNK + 2
-    out_bounds = (ctypes.c_int * max_bounds)()
-    data_arr = (ctypes.c_uint8 * n).from_buffer_copy(data)
-
-    count = _cdc_lib.cdc_boundaries(
-        data_arr, n, out_bounds, max_bounds,
-        _MIN_CHUNK, _MAX_CHUNK, _MASK,
-    )
 
     chunks: List[bytes] = []
     start = 0
-    for i in range(min(count, max_bounds)):
-        end = out_bounds[i]
+    for end in _cdc_native_bounds(data):
         chunks.append(data[start:end])
         start = end
 
@@ -148,25 +514,80 @@ def _cdc_native(data: bytes) -> List[bytes]:
     return chunks
 
 
-def _cdc_python(data: bytes) -> List[bytes]:
-    """Pure Python fallback for content-defined chunking."""
-    chunks: List[bytes] = []
-    start = 0
+def next_chunk_end(buf: bytearray, start: int, scanned: int = 0) -> int:
+    """End offset of the chunk starting at buf[start], or -1 if not yet known.
+
+    For streams that grow ``buf`` between calls: ``scanned`` bytes of the
+    chunk were already checked (pass ``len(buf) - start`` from the last
+    -1 result) and are not scanned again. Cuts are the ones
+    content_defined_chunks makes.
+    """
+    n = len(buf) - start
+    if n < _MIN_CHUNK:
+        return -1
+    if _cdc_lib is not None:
+        head = ctypes.c_char.from_buffer(buf, start)
+        try:
+            end = _cdc_lib.cdc_next_cut(
+                ctypes.addressof(head), n, scanned,
+                _MIN_CHUNK, _AVG_CHUNK, _MAX_CHUNK, _MASK_S, _MASK_L,
+            )
+        finally:
+            del head  # release the export so buf can be resized again
+        return start + end if end >= 0 else -1
+
+    gear = _GEAR
+    i = start + max(_MIN_CHUNK - 1, scanned)
+    last = start + min(_MAX_CHUNK, n) - 1
+    if i > last:
+        return -1
     fp = 0
+    for byte in buf[i - _FP_WINDOW + 1:i + 1]:
+        fp = ((fp << 1) + gear[byte]) & _FP_MASK
+    split = start + _AVG_CHUNK - 1
+    mask = _MASK_S if i < split else _MASK_L
+    while fp & mask and i < last:
+        i += 1
+        fp = ((fp << 1) + gear[buf[i]]) & _FP_MASK
+        if i == split:
+            mask = _MASK_L
+    if fp & mask and i - start + 1 < _MAX_CHUNK:
+        return -1
+    return i + 1
+
 
-    for i in range(len(data)):
-        fp = ((fp << 1) ^ data[i]) & 0xFFFFFFFFFFFFFFFF
+def _cdc_python(data: bytes) -> List[bytes]:
+    """Pure Python fallback for content-defined chunking.
 
-        chunk_len = i - start + 1
-        if chunk_len < _MIN_CHUNK:
-            continue
+    Only the trailing _FP_WINDOW bytes of a chunk reach the masked
+    fingerprint bits, so each chunk starts from the fingerprint of the
+    window ending at its min_chunk-th byte instead of rolling over the
+    whole prefix.
+    """
+    chunks: List[bytes] = []
+    gear = _GEAR
+    n = len(data)
+    start = 0
 
-        if chunk_len >= _MAX_CHUNK or (fp & _MASK) == 0:
-            chunks.append(data[start:i + 1])
-            start = i + 1
-            fp = 0
+    while start + _MIN_CHUNK <= n:
+        i = start + _MIN_CHUNK - 1
+        fp = 0
+        for byte in data[i - _FP_WINDOW + 1:i + 1]:
+            fp = ((fp << 1) + gear[byte]) & _FP_MASK
+        split = start + _AVG_CHUNK - 1
+        last = min(start + _MAX_CHUNK, n) - 1
+        mask = _MASK_S if i < split else _MASK_L
+        while fp & mask and i < last:
+            i += 1
+            fp = ((fp << 1) + gear[data[i]]) & _FP_MASK
+            if i == split:
+                mask = _MASK_L
+        if fp & mask and i - start + 1 < _MAX_CHUNK:
+            break  # ran off the end of the data without a boundary
+        chunks.append(data[start:i + 1])
+        start = i + 1
 
-    if start < len(data):
+    if start < n:
         chunks.append(data[start:])
 
     return chunks
@@ -177,6 +598,12 @@ def sha256_hash(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
+def sha256_hash_batch(items: Sequence[bytes]) -> List[str]:
+    """sha256_hash of every item, in order, in one comprehension over a bound hashlib.sha256."""
+    sha256 = hashlib.sha256
+    return [sha256(x).hexdigest() for x in items]
+
+
 def simhash64(data: bytes) -> int:
     """64-bit SimHash for similarity detection.
 
@@ -186,6 +613,8 @@ def simhash64(data: bytes) -> int:
     if len(data) < 4:
         return 0
 
+    if _cdc_lib is not None:
+        return _cdc_lib.simhash64(data if isinstance(data, bytes) else bytes(data), len(data))
     if _HAS_NUMPY:
         return _simhash64_numpy(data)
     return _simhash64_python(data)
@@ -198,64 +627,128 @@ def _simhash64_numpy(data: bytes) -> int:
 
     arr = np.frombuffer(data, dtype=np.uint8)
 
-    # Create sliding window view of 4-byte shingles: (num_shingles, 4)
-    shingles = np.lib.stride_tricks.as_strided(
-        arr, shape=(num_shingles, 4), strides=(1, 1)
-    )
-
-    # Vectorized FNV-1a hash across all shingles simultaneously
-    FNV_OFFSET = np.uint64(_FNV_OFFSET)
-    FNV_PRIME = np.uint64(_FNV_PRIME)
-
-    h = np.full(num_shingles, FNV_OFFSET, dtype=np.uint64)
-    for j in range(4):
-        h ^= shingles[:, j].astype(np.uint64)
-        h *= FNV_PRIME
+    # Vectorized FNV-1a hash across all shingles simultaneously. Byte j of
+    # every shingle is the contiguous slice arr[j:j + num_shingles], so no
+    # strided shingle view or per-column uint64 copies are needed; the
+    # first XOR-multiply step is a table lookup on the first byte.
+    h = _FNV_FIRST_NP.take(arr[:num_shingles])
+    for j in range(1, 4):
+        h ^= arr[j:j + num_shingles]
+        h *= _FNV_PRIME_NP
         # uint64 wraps naturally — no mask needed
 
-    # Count bits: for each of 64 bit positions, count how many hashes have it set
-    half_n = num_shingles // 2
-    result = 0
-    for bit in range(64):
-        mask = np.uint64(1 << bit)
-        set_count = int(np.count_nonzero(h & mask))
-        if set_count > half_n:
-            result |= (1 << bit)
-
-    return result
+    # Per-bit set counts for all 64 positions, then majority vote
+    counts = _bit_counts(h)
+    majority = np.packbits(counts > num_shingles // 2, bitorder="little")
+    return int.from_bytes(majority.tobytes(), "little")
+
+
+# Shingle count above which _bit_counts histograms byte values instead of
+# unpacking every bit (the histogram's fixed cost only pays off on large chunks)
+_BINCOUNT_MIN_SHINGLES = 4096
+
+if _HAS_NUMPY:
+    _FNV_FIRST_NP = np.array(_FNV_FIRST, dtype=np.uint64)
+    _FNV_PRIME_NP = np.uint64(_FNV_PRIME)
+    # _BYTE_BITS[v, k] is bit k of byte value v
+    _BYTE_BITS = np.unpackbits(
+        np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little"
+    ).astype(np.int64)
+
+
+def _bit_counts(h: "np.ndarray") -> "np.ndarray":
+    """How many of the uint64 hashes in h have each of the 64 bits set."""
+    b = h.astype("<u8", copy=False).view(np.uint8).reshape(-1, 8)
+    if len(h) > _BINCOUNT_MIN_SHINGLES:
+        # Histogram each byte column; the table maps it to 8 bit counts
+        return np.concatenate([
+            np.bincount(b[:, k], minlength=256) @ _BYTE_BITS for k in range(8)
+        ])
+    # Unpack to one 0/1 byte per bit and add rows as uint64 words, eight
+    # byte-wide counters per word; 255 rows at a time cannot overflow a byte
+    bits = np.unpackbits(b, axis=1, bitorder="little").view(np.uint64)
+    whole = len(bits) - len(bits) % 255
+    counts = np.zeros(64, dtype=np.int64)
+    if whole:
+        lanes = bits[:whole].reshape(-1, 255, 8).sum(axis=1, dtype=np.uint64)
+        counts += lanes.view(np.uint8).reshape(-1, 64).sum(axis=0, dtype=np.int64)
+    if whole < len(bits):
+        counts += bits[whole:].sum(axis=0, dtype=np.uint64).view(np.uint8)
+    return counts
 
 
 def _simhash64_python(data: bytes) -> int:
-    """Pure Python fallback for SimHash."""
-    counts = [0] * 64
+    """Pure Python fallback for SimHash.
 
+    Histograms each byte of the shingle hashes (8 increments per shingle
+    instead of 64 bit tests) and turns the histograms into per-bit
+    counts at the end.
+    """
+    hist = [0] * 2048
+    first = _FNV_FIRST
     for i in range(len(data) - 3):
-        h = _FNV_OFFSET
-        for j in range(4):
-            h ^= data[i + j]
-            h = (h * _FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
-
-        for bit in range(64):
-            if h & (1 << bit):
-                counts[bit] += 1
-            else:
-                counts[bit] -= 1
-
+        h = first[data[i]]
+        h = ((h ^ data[i + 1]) * _FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
+        h = ((h ^ data[i + 2]) * _FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
+        h = ((h ^ data[i + 3]) * _FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
+        hist[h & 0xFF] += 1
+        hist[256 + (h >> 8 & 0xFF)] += 1
+        hist[512 + (h >> 16 & 0xFF)] += 1
+        hist[768 + (h >> 24 & 0xFF)] += 1
+        hist[1024 + (h >> 32 & 0xFF)] += 1
+        hist[1280 + (h >> 40 & 0xFF)] += 1
+        hist[1536 + (h >> 48 & 0xFF)] += 1
+        hist[1792 + (h >> 56)] += 1
+
+    num_shingles = max(len(data) - 3, 0)
     result = 0
     for bit in range(64):
-        if counts[bit] > 0:
+        base = (bit >> 3) << 8
+        set_count = sum(hist[base + v] for v in _BYTES_WITH_BIT[bit & 7])
+        if 2 * set_count > num_shingles:
             result |= (1 << bit)
     return result
 
 
+# Batch hashing fans out only when there are enough chunks to pay for
+# the thread hand-off, and only on multi-core machines.
+PARALLEL_HASH_MIN_CHUNKS = 8
+
+_hash_pool: Optional[ThreadPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+
+def _chunk_hashes(chunk: bytes) -> Tuple[str, int]:
+    return sha256_hash(chunk), simhash64(chunk)
+
+
+def _get_hash_pool() -> ThreadPoolExecutor:
+    """Shared pool for chunk hashing (hashlib and numpy release the GIL)."""
+    global _hash_pool
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            # Re-check under the lock so racing first callers share one pool
+            if _hash_pool is None:
+                _hash_pool = ThreadPoolExecutor(
+                    max_workers=os.cpu_count(), thread_name_prefix="cogdedup-hash",
+                )
+    return _hash_pool
+
+
+def hash_chunks(chunks: Sequence[bytes]) -> List[Tuple[str, int]]:
+    """(sha256_hash, simhash64) for every chunk, in order.
+
+    Runs on a shared thread pool when there are more than
+    PARALLEL_HASH_MIN_CHUNKS chunks and more than one CPU.
+    """
+    if len(chunks) > PARALLEL_HASH_MIN_CHUNKS and (os.cpu_count() or 1) > 1:
+        return list(_get_hash_pool().map(_chunk_hashes, chunks))
+    return list(zip(sha256_hash_batch(chunks), map(simhash64, chunks)))
+
+
 def hamming_distance(a: int, b: int) -> int:
     """Hamming distance between two 64-bit integers."""
-    x = a ^ b
-    count = 0
-    while x:
-        count += 1
-        x &= x - 1
-    return count
+    return (a ^ b).bit_count()
 
 
 SIMILARITY_THRESHOLD = 8  # max hamming distance for "similar"
@@ -5,7 +5,11 @@ expected hash. Prevents bit-flip attacks and corrupted delta chains.
 Also adds ref_count thresholds to limit similarity search targets
 (prevents adversarial chunks from becoming universal delta bases).
 
-Uses xxHash for fast verification (falls back to CRC32 if unavailable).
+Uses XXH3-64 for fast verification. Without xxhash it falls back to a
+32-bit CRC: hardware CRC32C via google-crc32c when installed (so the
+fallback is not a throughput cliff), else zlib's CRC32. Hashes written by
+an older fallback (8-byte XXH64, 4-byte zlib CRC32) still verify, and so do
+CRC32C hashes on a host without google-crc32c (checked in pure Python).
 
 Usage:
     # Wrap codec with integrity verification
@@ -24,7 +28,7 @@ from __future__ import annotations
 import struct
 import zlib
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional, Sequence, Tuple
 
 try:
     import xxhash
@@ -32,30 +36,99 @@ try:
 except ImportError:
     _HAS_XXHASH = False
 
+try:
+    import google_crc32c
+    _HAS_CRC32C = True
+except ImportError:
+    _HAS_CRC32C = False
+
+
+_HASH64 = struct.Struct("<Q")
+_HASH32 = struct.Struct("<I")
+
+
+def _zlib_crc32(data: bytes) -> int:
+    return zlib.crc32(data) & 0xFFFFFFFF
+
+
+def _crc32c_table() -> Tuple[int, ...]:
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+_CRC32C_TABLE = _crc32c_table()
+
+
+def _crc32c_py(data: bytes) -> int:
+    """CRC32C (Castagnoli) in pure Python; only for verifying foreign hashes."""
+    table = _CRC32C_TABLE
+    crc = 0xFFFFFFFF
+    for b in data:
+        crc = table[(crc ^ b) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+# 32-bit fallback when xxhash is missing
+_crc32 = google_crc32c.value if _HAS_CRC32C else _zlib_crc32
+_crc32c = google_crc32c.value if _HAS_CRC32C else _crc32c_py
+
 
 def fast_hash(data: bytes) -> int:
     """Fast 64-bit hash for integrity verification.
 
-    Uses xxHash if available, otherwise CRC32 (less bits but still catches corruption).
+    Uses XXH3-64 if xxhash is available, otherwise CRC32C or CRC32 (less
+    bits but still catches corruption).
     """
     if _HAS_XXHASH:
-        return xxhash.xxh64(data).intdigest()
-    # Fallback: CRC32 (32-bit, but still catches accidental corruption)
-    return zlib.crc32(data) & 0xFFFFFFFF
+        return xxhash.xxh3_64_intdigest(data)
+    # Fallback: 32-bit CRC, still catches accidental corruption
+    return _crc32(data)
+
+
+def fast_hash_batch(items: Sequence[bytes]) -> List[int]:
+    """fast_hash for every item, without a Python call per item."""
+    if _HAS_XXHASH:
+        return list(map(xxhash.xxh3_64_intdigest, items))
+    return list(map(_crc32, items))
 
 
 def fast_hash_bytes(data: bytes) -> bytes:
     """Return hash as bytes for embedding in wire format."""
     h = fast_hash(data)
     if _HAS_XXHASH:
-        return struct.pack("<Q", h)  # 8 bytes
-    return struct.pack("<I", h)  # 4 bytes
+        return _HASH64.pack(h)  # 8 bytes
+    return _HASH32.pack(h)  # 4 bytes
+
+
+def fast_hash_bytes_batch(items: Sequence[bytes]) -> List[bytes]:
+    """fast_hash_bytes for every item."""
+    pack = _HASH64.pack if _HAS_XXHASH else _HASH32.pack
+    return [pack(h) for h in fast_hash_batch(items)]
+
+
+def _matches_legacy(data: bytes, expected: bytes) -> bool:
+    """True if expected is a hash another fallback chain would have written.
+
+    That is XXH64 before the XXH3 switch, or either 32-bit CRC: zlib CRC32
+    from before CRC32C, or CRC32C from a host that had google-crc32c.
+    """
+    if len(expected) == 8:
+        return _HAS_XXHASH and _HASH64.pack(xxhash.xxh64(data).intdigest()) == expected
+    if len(expected) != 4:
+        return False
+    (crc,) = _HASH32.unpack(expected)
+    return _zlib_crc32(data) == crc or _crc32c(data) == crc
 
 
 def verify_hash(data: bytes, expected: bytes) -> bool:
     """Verify data matches expected hash bytes."""
     actual = fast_hash_bytes(data)
-    return actual == expected
+    return actual == expected or _matches_legacy(data, expected)
 
 
 @dataclass
@@ -98,6 +171,18 @@ class IntegrityVerifier:
         self._failed += 1
         return False
 
+    def verify_many(self, items: Sequence[Tuple[bytes, bytes]]) -> List[bool]:
+        """verify() for a batch of (data, expected_hash) pairs."""
+        actual = fast_hash_bytes_batch([data for data, _ in items])
+        results = [
+            got == expected or _matches_legacy(data, expected)
+            for (data, expected), got in zip(items, actual)
+        ]
+        ok = sum(results)
+        self._verified += ok
+        self._failed += len(results) - ok
+        return results
+
     def check_delta_expansion(self, src_len: int, result_len: int) -> bool:
         """Check if delta expansion is within safe bounds."""
         if src_len == 0:
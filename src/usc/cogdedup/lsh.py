@@ -11,25 +11,98 @@ The band parameters control the trade-off:
 With 8 bands of 8 bits:
   - Two hashes differing by <=8 bits have ~97% chance of sharing at least one band
   - This matches SIMILARITY_THRESHOLD = 8
+
+With numpy, query_nearest instead XORs the query against a flat uint64
+array of every indexed simhash and popcounts the lot in one vector op.
+That is exact (no missed bands) and far cheaper than checking band
+candidates one by one: real chunk streams are skewed, so a few band
+values collect most ids and the candidate set approaches the index.
+The same flat array answers query_candidates (8-bit bands are just its
+bytes), so with numpy no per-band bucket dicts are kept at all, and
+simhashes live only in that uint64 array rather than as boxed ints.
 """
 from __future__ import annotations
 
+import struct
 from collections import defaultdict
-from typing import Dict, List, Optional, Set
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from usc.cogdedup.hasher import SIMILARITY_THRESHOLD
 
-from usc.cogdedup.hasher import hamming_distance, SIMILARITY_THRESHOLD
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except ImportError:
+    _HAS_NUMPY = False
 
 N_BANDS = 8
 BAND_WIDTH = 8  # bits per band
 
 
-def _extract_bands(simhash: int) -> List[int]:
-    """Extract N_BANDS band values from a 64-bit SimHash."""
-    bands = []
-    for i in range(N_BANDS):
-        band_val = (simhash >> (i * BAND_WIDTH)) & ((1 << BAND_WIDTH) - 1)
-        bands.append(band_val)
-    return bands
+_BAND_MASK = (1 << BAND_WIDTH) - 1
+
+# Compact buckets once this fraction of indexed ids are tombstoned
+TOMBSTONE_COMPACT_RATIO = 0.25
+
+# Initial capacity of the flat simhash array (doubles as it fills)
+_FLAT_INIT = 64
+# Distance given to dead slots of the flat array; above any threshold
+_DEAD_DISTANCE = 0xFF
+# Bands are the bytes of the flat simhash array, so it replaces the buckets
+_FLAT_BANDS = _HAS_NUMPY and BAND_WIDTH == 8 and N_BANDS == 8
+
+
+if _HAS_NUMPY:
+    _M1 = np.uint64(0x5555555555555555)
+    _M2 = np.uint64(0x3333333333333333)
+    _M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+    _H01 = np.uint64(0x0101010101010101)
+    _S1, _S2, _S4, _S56 = (np.uint64(k) for k in (1, 2, 4, 56))
+    _LO_BYTES = np.uint64(0x0101010101010101)
+    _HI_BYTES = np.uint64(0x8080808080808080)
+
+
+def _popcount64(x: "np.ndarray") -> "np.ndarray":
+    """Per-element popcount of a uint64 array (x may be overwritten)."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(x)
+    # SWAR popcount on whole arrays: ~5x faster than unpacking to bits
+    x -= (x >> _S1) & _M1
+    x = (x & _M2) + ((x >> _S2) & _M2)
+    x = (x + (x >> _S4)) & _M4
+    return ((x * _H01) >> _S56).astype(np.uint8)
+
+
+if BAND_WIDTH == 8 and N_BANDS == 8:
+    # Byte-wide bands: one C-level unpack of the little-endian hash bytes
+    _unpack_bands = struct.Struct("<8B").unpack
+
+    @lru_cache(maxsize=16384)
+    def _extract_bands(simhash: int) -> Tuple[int, ...]:
+        """Extract N_BANDS band values from a 64-bit SimHash.
+
+        Pure function of the hash, so results are memoized: repeated and
+        near-duplicate chunks recur constantly on store/lookup paths.
+        """
+        return _unpack_bands(simhash.to_bytes(8, "little"))
+else:
+    @lru_cache(maxsize=16384)
+    def _extract_bands(simhash: int) -> Tuple[int, ...]:
+        """Extract N_BANDS band values from a 64-bit SimHash.
+
+        Pure function of the hash, so results are memoized: repeated and
+        near-duplicate chunks recur constantly on store/lookup paths.
+        """
+        return tuple(
+            (simhash >> (i * BAND_WIDTH)) & _BAND_MASK for i in range(N_BANDS)
+        )
+
+
+def _new_buckets() -> List[Dict[int, Set[int]]]:
+    if _FLAT_BANDS:
+        return []
+    return [defaultdict(set) for _ in range(N_BANDS)]
 
 
 class LSHIndex:
@@ -40,38 +113,146 @@ class LSHIndex:
     """
 
     def __init__(self) -> None:
-        # band_id -> band_value -> set of chunk_ids
-        self._buckets: List[Dict[int, Set[int]]] = [
-            defaultdict(set) for _ in range(N_BANDS)
-        ]
-        # chunk_id -> simhash (for hamming distance verification)
+        # band_id -> band_value -> set of chunk_ids (only without _FLAT_BANDS)
+        self._buckets: List[Dict[int, Set[int]]] = _new_buckets()
+        # chunk_id -> simhash (for hamming distance verification; the flat
+        # arrays hold these instead under _FLAT_BANDS)
         self._simhashes: Dict[int, int] = {}
+        # Soft-deleted ids: still in buckets, skipped by queries
+        self._tombstones: Set[int] = set()
+        self._reset_flat()
+
+    def _reset_flat(self) -> None:
+        # Flat mirror of _simhashes for vectorized nearest search: slot ->
+        # simhash / chunk_id / live flag, plus chunk_id -> slot
+        self._slot: Dict[int, int] = {}
+        self._flat_n = 0
+        self._flat_dead = 0
+        if _HAS_NUMPY:
+            self._flat_sim = np.empty(_FLAT_INIT, dtype=np.uint64)
+            self._flat_ids = np.empty(_FLAT_INIT, dtype=np.int64)
+            self._flat_live = np.empty(_FLAT_INIT, dtype=bool)
+
+    def _flat_put(self, chunk_id: int, simhash: int) -> None:
+        slot = self._slot.get(chunk_id)
+        if slot is None:
+            slot = self._flat_n
+            if slot == len(self._flat_sim):
+                cap = 2 * slot
+                self._flat_sim = np.resize(self._flat_sim, cap)
+                self._flat_ids = np.resize(self._flat_ids, cap)
+                self._flat_live = np.resize(self._flat_live, cap)
+            self._flat_n = slot + 1
+            self._slot[chunk_id] = slot
+            self._flat_ids[slot] = chunk_id
+        elif not self._flat_live[slot]:
+            self._flat_dead -= 1
+        self._flat_sim[slot] = simhash
+        self._flat_live[slot] = True
+
+    def _flat_kill(self, chunk_id: int, forget: bool) -> None:
+        """Mark chunk_id's slot dead; forget=True also frees the id."""
+        slot = self._slot.pop(chunk_id, None) if forget else self._slot.get(chunk_id)
+        if slot is None or not self._flat_live[slot]:
+            return
+        self._flat_live[slot] = False
+        self._flat_dead += 1
+        if self._flat_dead > TOMBSTONE_COMPACT_RATIO * self._flat_n:
+            self._flat_compact()
+
+    def _flat_compact(self) -> None:
+        n = self._flat_n
+        live = self._flat_live[:n]
+        sims = self._flat_sim[:n][live]
+        ids = self._flat_ids[:n][live]
+        cap = max(_FLAT_INIT, 2 * len(ids))
+        self._flat_sim = np.resize(sims, cap)
+        self._flat_ids = np.resize(ids, cap)
+        self._flat_live = np.ones(cap, dtype=bool)
+        self._flat_n = len(ids)
+        self._flat_dead = 0
+        self._slot = {cid: i for i, cid in enumerate(ids.tolist())}
 
     def insert(self, chunk_id: int, simhash: int) -> None:
         """Add a chunk to the LSH index."""
-        self._simhashes[chunk_id] = simhash
-        bands = _extract_bands(simhash)
-        for band_id, band_val in enumerate(bands):
-            self._buckets[band_id][band_val].add(chunk_id)
+        if chunk_id in self._tombstones:
+            self.remove(chunk_id)
+        if _HAS_NUMPY:
+            self._flat_put(chunk_id, simhash)
+        if not _FLAT_BANDS:
+            self._simhashes[chunk_id] = simhash
+            bands = _extract_bands(simhash)
+            for band_id, band_val in enumerate(bands):
+                self._buckets[band_id][band_val].add(chunk_id)
 
     def remove(self, chunk_id: int) -> None:
         """Remove a chunk from the LSH index."""
+        if _FLAT_BANDS:
+            self._flat_kill(chunk_id, forget=True)
+            return
+        self._tombstones.discard(chunk_id)
         sh = self._simhashes.pop(chunk_id, None)
         if sh is None:
             return
-        bands = _extract_bands(sh)
-        for band_id, band_val in enumerate(bands):
-            self._buckets[band_id][band_val].discard(chunk_id)
+        if _HAS_NUMPY:
+            self._flat_kill(chunk_id, forget=True)
+        if not _FLAT_BANDS:
+            bands = _extract_bands(sh)
+            for band_id, band_val in enumerate(bands):
+                self._buckets[band_id][band_val].discard(chunk_id)
+
+    def discard(self, chunk_id: int) -> None:
+        """Soft-delete a chunk: O(1), buckets are cleaned up lazily.
+
+        Intended for bulk removals (cold archival), where per-id
+        ``remove`` would touch N_BANDS buckets each time. Buckets are
+        compacted once tombstones reach TOMBSTONE_COMPACT_RATIO.
+        Under _FLAT_BANDS a removal is already O(1), so this is remove.
+        """
+        if _FLAT_BANDS:
+            self._flat_kill(chunk_id, forget=True)
+            return
+        if chunk_id not in self._simhashes:
+            return
+        self._tombstones.add(chunk_id)
+        if _HAS_NUMPY:
+            self._flat_kill(chunk_id, forget=False)
+        if len(self._tombstones) > TOMBSTONE_COMPACT_RATIO * len(self._simhashes):
+            self.compact()
+
+    def compact(self) -> None:
+        """Drop tombstoned ids from the buckets."""
+        if not self._tombstones:
+            return
+        live = [
+            (cid, sh) for cid, sh in self._simhashes.items()
+            if cid not in self._tombstones
+        ]
+        self.rebuild(live)
 
     def query_candidates(self, simhash: int) -> Set[int]:
         """Get candidate chunk IDs that share at least one band value.
 
         These are potential similar matches — verify with hamming_distance().
         """
+        if _FLAT_BANDS:
+            n = self._flat_n
+            if not n:
+                return set()
+            # A shared band is a zero byte of the XOR; the classic
+            # has-zero-byte test finds them for every slot in three ops
+            x = self._flat_sim[:n] ^ np.uint64(simhash)
+            hits = ((x - _LO_BYTES) & ~x & _HI_BYTES).astype(bool)
+            if self._flat_dead:
+                hits &= self._flat_live[:n]
+            return set(self._flat_ids[:n][hits].tolist())
+
         candidates: Set[int] = set()
         bands = _extract_bands(simhash)
         for band_id, band_val in enumerate(bands):
             candidates.update(self._buckets[band_id][band_val])
+        if self._tombstones:
+            candidates -= self._tombstones
         return candidates
 
     def query_nearest(self, simhash: int, threshold: int = SIMILARITY_THRESHOLD) -> Optional[int]:
@@ -79,12 +260,23 @@ class LSHIndex:
 
         Returns chunk_id or None.
         """
+        if _HAS_NUMPY:
+            n = self._flat_n
+            if not n:
+                return None
+            d = _popcount64(self._flat_sim[:n] ^ np.uint64(simhash))
+            if self._flat_dead:
+                d[~self._flat_live[:n]] = _DEAD_DISTANCE
+            i = int(d.argmin())
+            return int(self._flat_ids[i]) if d[i] <= threshold else None
+
         candidates = self.query_candidates(simhash)
         best_dist = threshold + 1
         best_id: Optional[int] = None
 
+        simhashes = self._simhashes
         for cid in candidates:
-            d = hamming_distance(simhash, self._simhashes[cid])
+            d = (simhash ^ simhashes[cid]).bit_count()
             if d < best_dist:
                 best_dist = d
                 best_id = cid
@@ -93,11 +285,30 @@ class LSHIndex:
 
     @property
     def size(self) -> int:
-        return len(self._simhashes)
+        if _FLAT_BANDS:
+            return len(self._slot)
+        return len(self._simhashes) - len(self._tombstones)
 
     def rebuild(self, entries: List[tuple]) -> None:
         """Bulk rebuild from list of (chunk_id, simhash) tuples."""
-        self._buckets = [defaultdict(set) for _ in range(N_BANDS)]
+        self._buckets = _new_buckets()
         self._simhashes.clear()
-        for chunk_id, simhash in entries:
-            self.insert(chunk_id, simhash)
+        self._tombstones.clear()
+        if not _FLAT_BANDS:
+            self._reset_flat()
+            for chunk_id, simhash in entries:
+                self.insert(chunk_id, simhash)
+            return
+        # No buckets to fill: load the flat arrays in bulk (later
+        # duplicates of an id win, as with repeated insert)
+        latest = dict(entries)
+        n = len(latest)
+        cap = max(_FLAT_INIT, 2 * n)
+        self._flat_sim = np.empty(cap, dtype=np.uint64)
+        self._flat_ids = np.empty(cap, dtype=np.int64)
+        self._flat_live = np.ones(cap, dtype=bool)
+        self._flat_sim[:n] = np.fromiter(latest.values(), dtype=np.uint64, count=n)
+        self._flat_ids[:n] = np.fromiter(latest, dtype=np.int64, count=n)
+        self._flat_n = n
+        self._flat_dead = 0
+        self._slot = dict(zip(latest, range(n)))
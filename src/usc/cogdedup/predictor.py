@@ -10,7 +10,8 @@ remember patterns, it anticipates them.
 """
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 
 try:
     import zstandard as zstd
@@ -38,11 +39,17 @@ class PredictiveCompressor:
         predictor.update_after_encode(chunk_ids_in_batch)
     """
 
-    def __init__(self, store: CogStore, dict_cache_size: int = 256) -> None:
+    def __init__(
+        self, store: CogStore, dict_cache_size: int = 256, zstd_level: int = 10,
+    ) -> None:
         self._store = store
         self._dict_cache_size = dict_cache_size
-        # chunk_id -> (zstd dict, list of chunk IDs that built it)
-        self._dict_cache: Dict[int, Tuple["zstd.ZstdCompressionDict", List[int]]] = {}
+        # Dictionaries are digested once for this level; it must match the
+        # encoder's zstd_level, since a digested dictionary fixes the
+        # compression parameters of every compressor that uses it
+        self._zstd_level = zstd_level
+        # LRU: chunk_id -> (zstd dict, list of chunk IDs that built it)
+        self._dict_cache: OrderedDict[int, Tuple["zstd.ZstdCompressionDict", List[int]]] = OrderedDict()
         # Track which chunk_ids we've seen recently for cache warming
         self._recent_ids: List[int] = []
 
@@ -66,8 +73,10 @@ class PredictiveCompressor:
             return None
 
         # Check cache first
-        if trigger_chunk_id in self._dict_cache:
-            return self._dict_cache[trigger_chunk_id]
+        cached = self._dict_cache.get(trigger_chunk_id)
+        if cached is not None:
+            self._dict_cache.move_to_end(trigger_chunk_id)
+            return cached
 
         # Query co-occurrence predictions
         predicted = self._store.get_predicted_chunks(trigger_chunk_id, top_k=5)
@@ -82,11 +91,11 @@ class PredictiveCompressor:
 
         try:
             dict_data = zstd.ZstdCompressionDict(dict_content)
+            dict_data.precompute_compress(level=self._zstd_level)
             # Cache it
             if len(self._dict_cache) >= self._dict_cache_size:
-                # Evict oldest entry
-                oldest = next(iter(self._dict_cache))
-                del self._dict_cache[oldest]
+                # Evict least recently used entry
+                self._dict_cache.popitem(last=False)
             self._dict_cache[trigger_chunk_id] = (dict_data, dict_chunk_ids)
             return (dict_data, dict_chunk_ids)
         except Exception:
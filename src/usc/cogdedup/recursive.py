@@ -24,12 +24,50 @@ Usage:
 from __future__ import annotations
 
 import json
+import re
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
 from usc.cogdedup.codec import cogdedup_encode, cogdedup_decode
 from usc.cogdedup.store import CogStore
 
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+# json.dumps builds a new encoder per call when given options; reuse one
+_json_encode = json.JSONEncoder(separators=(",", ":"), sort_keys=True).encode
+
+
+# orjson writes NaN/±inf as null and reads integers beyond 64 bits back as
+# floats, so memories that could hit either go through the json module
+_LONG_DIGITS = re.compile(rb"\d{20}")
+
+
+def _dump_memory(m: Dict[str, Any]) -> bytes:
+    """Compact, key-sorted JSON for one memory, as UTF-8 bytes."""
+    if _HAS_ORJSON:
+        try:
+            out = orjson.dumps(m, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass  # e.g. non-str keys or ints beyond 64 bits
+        else:
+            # Non-finite floats only ever come out as null
+            if b"null" not in out:
+                return out
+    return _json_encode(m).encode("utf-8")
+
+
+def _loads(line: bytes) -> Any:
+    if _HAS_ORJSON and _LONG_DIGITS.search(line) is None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass  # NaN / Infinity, written by the json module
+    return json.loads(line)
+
 
 @dataclass
 class CompressionResult:
@@ -75,9 +113,14 @@ class RecursiveCompressor:
         Each memory is JSON-serialized, concatenated with newline delimiters,
         then encoded with cogdedup.
         """
-        # Serialize: one JSON per line (JSONL format)
-        lines = [json.dumps(m, separators=(",", ":"), sort_keys=True) for m in memories]
-        raw = "\n".join(lines).encode("utf-8")
+        # Serialize: one JSON per line (JSONL format), appended straight
+        # into one buffer instead of a list of lines joined afterwards
+        buf = bytearray()
+        for m in memories:
+            if buf:
+                buf += b"\n"
+            buf += _dump_memory(m)
+        raw = bytes(buf)
 
         data_id = f"{self._prefix}:{batch_id}" if batch_id else ""
         blob, stats = cogdedup_encode(raw, self._store, data_id=data_id)
@@ -104,13 +147,11 @@ class RecursiveCompressor:
     def decompress_memories(self, blob: bytes) -> List[Dict[str, Any]]:
         """Decompress a blob back to list of memory dicts."""
         raw = cogdedup_decode(blob, self._store)
-        text = raw.decode("utf-8")
-        lines = text.split("\n")
         memories = []
-        for line in lines:
+        for line in raw.split(b"\n"):
             line = line.strip()
             if line:
-                memories.append(json.loads(line))
+                memories.append(_loads(line))
         return memories
 
     def compress_reasoning_bank(
@@ -1,15 +1,25 @@
 """Abstract and in-memory cognitive store for chunk deduplication."""
 from __future__ import annotations
 
+import heapq
 import time
 import zlib
+from collections import Counter
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Set, Tuple
 
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
 from usc.cogdedup.hasher import sha256_hash, simhash64, hamming_distance, SIMILARITY_THRESHOLD
 from usc.cogdedup.lsh import LSHIndex
 
+# Above this many co-occurring neighbors, a top-k heap beats a full sort
+_NLARGEST_MIN_NEIGHBORS = 256
+
 
 @dataclass
 class ChunkEntry:
@@ -45,6 +55,27 @@ class CogStore(ABC):
         """Store a new chunk and return its entry."""
         ...
 
+    def store_with_hash(self, data: bytes, sha256: str,
+                        simhash: Optional[int] = None) -> ChunkEntry:
+        """store() for a caller that already hashed data.
+
+        sha256 must be sha256_hash(data), and simhash (if given)
+        simhash64(data). Implementations override this to skip re-hashing.
+        """
+        return self.store(data)
+
+    def full_ratio_estimates(self) -> Dict[int, float]:
+        """Per-zstd-level moving average of FULL compression ratios.
+
+        cogdedup_encode reads and updates it for its speculative DELTA
+        accept, so the estimate only reflects data encoded into this store.
+        """
+        ratios = getattr(self, "_full_ratio", None)
+        if ratios is None:
+            # setdefault is atomic, so racing first encodes share one dict
+            ratios = self.__dict__.setdefault("_full_ratio", {})
+        return ratios
+
     @abstractmethod
     def get(self, chunk_id: int) -> Optional[ChunkEntry]:
         """Retrieve a chunk by ID."""
@@ -71,7 +102,9 @@ class MemoryCogStore(CogStore):
     - O(1) per-band similarity search via LSH index
     - Co-occurrence tracking for predictive pre-compression
     - Ref count tracking for tiered eviction
-    - Automatic cold archival (zlib-compress infrequently-used chunks)
+    - Automatic cold archival (zstd-compress infrequently-used chunks
+      against a dictionary trained once from the first archive batch;
+      zlib without zstandard)
     """
 
     # Cold archival thresholds
@@ -79,6 +112,9 @@ class MemoryCogStore(CogStore):
     COLD_AGE_SECONDS = 60      # chunks not accessed for this long
     ARCHIVE_TRIGGER = 500      # auto-archive when store exceeds this many chunks
     ARCHIVE_KEEP_WARM = 200    # keep this many most-referenced chunks warm after archive
+    COLD_ZSTD_LEVEL = 3        # zstd level for cold chunks
+    COLD_DICT_SIZE = 64 * 1024  # target size of the shared cold dictionary
+    COLD_DICT_MIN_SAMPLES = 16  # archive batch size needed to train it
 
     def __init__(self) -> None:
         self._by_id: Dict[int, ChunkEntry] = {}
@@ -93,8 +129,15 @@ class MemoryCogStore(CogStore):
         self._data_chunks: Dict[str, Set[int]] = {}  # data_id -> set of chunk_ids
 
         # Cold archive: compressed data for evicted chunks
-        self._cold_archive: Dict[int, bytes] = {}  # chunk_id -> zlib-compressed data
+        self._cold_archive: Dict[int, bytes] = {}  # chunk_id -> compressed data
         self._cold_meta: Dict[int, Tuple[str, int]] = {}  # chunk_id -> (sha256, simhash)
+        self._warm_count: int = 0  # entries whose data is held uncompressed
+        # Shared zstd dictionary for the cold archive. Chunks archived before
+        # it was trained carry no dictionary id and still decode with it.
+        self._cold_dict: Optional[Any] = None
+        if zstd is not None:
+            self._cold_cctx = zstd.ZstdCompressor(level=self.COLD_ZSTD_LEVEL)
+            self._cold_dctx = zstd.ZstdDecompressor()
 
     @property
     def size(self) -> int:
@@ -117,27 +160,33 @@ class MemoryCogStore(CogStore):
         return None
 
     def store(self, data: bytes) -> ChunkEntry:
-        sha = sha256_hash(data)
+        return self.store_with_hash(data, sha256_hash(data))
+
+    def store_with_hash(self, data: bytes, sha256: str,
+                        simhash: Optional[int] = None) -> ChunkEntry:
+        sha = sha256
 
         # Check if already stored (warm tier)
         existing = self._by_sha.get(sha)
         if existing is not None:
             # Promote from cold if needed
             if existing.data is None and existing.chunk_id in self._cold_archive:
-                existing.data = zlib.decompress(self._cold_archive.pop(existing.chunk_id))
+                existing.data = self._cold_decompress(self._cold_archive.pop(existing.chunk_id))
+                self._warm_count += 1
             existing.ref_count += 1
             existing.last_access = time.time()
             return existing
 
         cid = self._next_id
         self._next_id += 1
-        sh = simhash64(data)
+        sh = simhash64(data) if simhash is None else simhash
         now = time.time()
 
         entry = ChunkEntry(chunk_id=cid, sha256=sha, simhash=sh, data=data,
                            ref_count=1, last_access=now)
         self._by_id[cid] = entry
         self._by_sha[sha] = entry
+        self._warm_count += 1
         self._lsh.insert(cid, sh)
 
         # Auto-archive if store is getting large
@@ -151,15 +200,51 @@ class MemoryCogStore(CogStore):
         if entry is not None:
             # Decompress from cold archive on demand
             if entry.data is None and chunk_id in self._cold_archive:
-                entry.data = zlib.decompress(self._cold_archive[chunk_id])
+                entry.data = self._cold_decompress(self._cold_archive[chunk_id])
+                self._warm_count += 1
             return entry
         return None
 
+    def _cold_compress(self, data: bytes) -> bytes:
+        if zstd is None:
+            return zlib.compress(data, 6)
+        return self._cold_cctx.compress(data)
+
+    def _cold_compress_many(self, payloads: List[bytes]) -> List[bytes]:
+        """_cold_compress of every payload, as one multi-threaded zstd call."""
+        if (zstd is None or len(payloads) < 2
+                or not hasattr(self._cold_cctx, "multi_compress_to_buffer")):
+            return [self._cold_compress(p) for p in payloads]
+        # Frames are identical to per-payload compress(); the C backend
+        # spreads them over all cores without holding the GIL
+        segments = self._cold_cctx.multi_compress_to_buffer(payloads, threads=-1)
+        return [seg.tobytes() for seg in segments]
+
+    def _cold_decompress(self, blob: bytes) -> bytes:
+        if zstd is None:
+            return zlib.decompress(blob)
+        return self._cold_dctx.decompress(blob)
+
+    def _train_cold_dict(self, samples: List[bytes]) -> None:
+        """Train the shared cold dictionary; left untrained if samples are too thin."""
+        try:
+            cold_dict = zstd.train_dictionary(self.COLD_DICT_SIZE, samples)
+        except zstd.ZstdError:
+            return  # retried with the next archive batch
+        self._cold_cctx = zstd.ZstdCompressor(level=self.COLD_ZSTD_LEVEL, dict_data=cold_dict)
+        self._cold_dctx = zstd.ZstdDecompressor(dict_data=cold_dict)
+        self._cold_dict = cold_dict
+
     def _archive_cold(self) -> int:
-        """Move infrequently-used chunks to cold storage (zlib-compressed).
+        """Move infrequently-used chunks to cold storage (compressed).
 
         Returns number of chunks archived.
         """
+        # Keep at least ARCHIVE_KEEP_WARM chunks with data
+        max_to_archive = self._warm_count - self.ARCHIVE_KEEP_WARM
+        if max_to_archive <= 0:
+            return 0
+
         now = time.time()
         candidates = []
 
@@ -175,37 +260,47 @@ class MemoryCogStore(CogStore):
         # Sort: least referenced, oldest first
         candidates.sort()
 
-        # Keep at least ARCHIVE_KEEP_WARM chunks with data
-        warm_count = sum(1 for e in self._by_id.values() if e.data is not None)
-        max_to_archive = max(0, warm_count - self.ARCHIVE_KEEP_WARM)
         to_archive = candidates[:max_to_archive]
 
-        archived = 0
-        for _, _, cid in to_archive:
-            entry = self._by_id[cid]
-            if entry.data is not None:
-                self._cold_archive[cid] = zlib.compress(entry.data, 6)
-                self._cold_meta[cid] = (entry.sha256, entry.simhash)
-                entry.data = None  # Free memory
-                archived += 1
+        entries = [self._by_id[cid] for _, _, cid in to_archive]
+        payloads = [e.data for e in entries]
+
+        if (zstd is not None and self._cold_dict is None
+                and len(payloads) >= self.COLD_DICT_MIN_SAMPLES):
+            self._train_cold_dict(payloads)
+
+        for entry, blob in zip(entries, self._cold_compress_many(payloads)):
+            cid = entry.chunk_id
+            self._cold_archive[cid] = blob
+            self._cold_meta[cid] = (entry.sha256, entry.simhash)
+            entry.data = None  # Free memory
+        self._warm_count -= len(entries)
 
-        return archived
+        return len(entries)
 
     def record_cooccurrence(self, chunk_ids: List[int]) -> None:
         """Track which chunks appear together for predictive pre-compression."""
-        for i, a in enumerate(chunk_ids):
-            if a not in self._cooccurrence:
-                self._cooccurrence[a] = {}
-            for j, b in enumerate(chunk_ids):
-                if i != j:
-                    self._cooccurrence[a][b] = self._cooccurrence[a].get(b, 0) + 1
+        ids = list(chunk_ids)
+        cooc = self._cooccurrence
+        for i, a in enumerate(ids):
+            row = cooc.get(a)
+            if row is None:
+                row = cooc[a] = Counter()
+            # Every other position, counted in C; keys enter the row in the
+            # same order as with a pairwise loop
+            row.update(ids[:i])
+            row.update(ids[i + 1:])
 
     def get_predicted_chunks(self, chunk_id: int, top_k: int = 5) -> List[ChunkEntry]:
         """Get chunks that frequently co-occur with the given chunk."""
         neighbors = self._cooccurrence.get(chunk_id, {})
         if not neighbors:
             return []
-        sorted_ids = sorted(neighbors, key=neighbors.get, reverse=True)[:top_k]
+        if len(neighbors) > _NLARGEST_MIN_NEIGHBORS:
+            # Same order as the full sort (ties keep insertion order)
+            sorted_ids = heapq.nlargest(top_k, neighbors, key=neighbors.get)
+        else:
+            sorted_ids = sorted(neighbors, key=neighbors.get, reverse=True)[:top_k]
         return [self._by_id[cid] for cid in sorted_ids if cid in self._by_id]
 
     def register_data_chunks(self, data_id: str, chunk_ids: Set[int]) -> None:
@@ -222,13 +317,15 @@ class MemoryCogStore(CogStore):
         warm_bytes = sum(len(e.data) for e in warm_entries)
         cold_bytes_compressed = sum(len(v) for v in self._cold_archive.values())
         cold_count = len(self._cold_archive)
+        cold_dict_bytes = len(self._cold_dict.as_bytes()) if self._cold_dict is not None else 0
         return {
             "unique_chunks": len(self._by_id),
             "warm_chunks": len(warm_entries),
             "warm_bytes": warm_bytes,
             "cold_chunks": cold_count,
             "cold_bytes_compressed": cold_bytes_compressed,
-            "total_memory": warm_bytes + cold_bytes_compressed,
+            "cold_dict_bytes": cold_dict_bytes,
+            "total_memory": warm_bytes + cold_bytes_compressed + cold_dict_bytes,
             "total_references": total_refs,
             "dedup_ratio": round(total_refs / max(1, len(self._by_id)), 2),
             "lsh_index_size": self._lsh.size,
@@ -3,7 +3,7 @@
 For live agent sessions, compresses as the session runs rather than
 after it ends. The architecture:
 
-1. Rolling Rabin hash detects chunk boundaries on the fly
+1. Rolling Gear hash detects chunk boundaries on the fly (same as batch CDC)
 2. On each boundary, immediately do cogstore lookup
 3. Emit REF/DELTA/FULL tokens to a write-ahead log
 4. At session end, the log IS the compressed session — no second pass
@@ -22,13 +22,7 @@ except ImportError:
     zstd = None
 
 from usc.cogdedup.hasher import (
-    sha256_hash,
-    simhash64,
-    _RABIN_POLY,
-    _MIN_CHUNK,
-    _AVG_CHUNK,
-    _MAX_CHUNK,
-    _MASK,
+    _CDC_VERSION, hash_chunks, next_chunk_end, sha256_hash, simhash64,
 )
 from usc.cogdedup.store import CogStore, ChunkEntry
 from usc.cogdedup.predictor import PredictiveCompressor
@@ -69,46 +63,59 @@ class CogdedupStream:
         self._data_id = data_id
         self._predictor = predictor
 
-        # Rolling Rabin hash state
-        self._fp: int = 0
+        # Open (not yet cut) chunk, and how many of its bytes were
+        # already scanned for a boundary
         self._buf = bytearray()
-        self._chunk_start: int = 0
+        self._scanned: int = 0
 
-        # Write-ahead log: list of (chunk_type, encoded_bytes) tokens
-        self._tokens: List[bytes] = []
+        # Write-ahead log: the encoded tokens, back to back, exactly as
+        # they follow the header in the finished blob
+        self._wal = bytearray()
         self._n_chunks: int = 0
         self._chunk_ids: List[int] = []
 
         # Stats
-        self._stats = {"ref": 0, "delta": 0, "full": 0, "pred_delta": 0, "chunks": 0}
+        self._stats = {
+            "ref": 0, "delta": 0, "full": 0, "pred_delta": 0, "chunks": 0,
+            "cdc_version": _CDC_VERSION,
+        }
         self._total_fed: int = 0
         self._finished: bool = False
 
     def feed(self, data: bytes) -> int:
         """Feed data into the stream. Returns number of chunks emitted so far.
 
-        Chunk boundaries are detected using a rolling Rabin fingerprint.
-        On each boundary, the chunk is immediately encoded against the store.
+        Chunk boundaries are detected using a rolling Gear fingerprint,
+        scanned by the CDC C kernel where available and resumed where the
+        previous call stopped. On each boundary, the chunk is immediately
+        encoded against the store.
         """
         if self._finished:
             raise RuntimeError("stream already finished")
 
-        for byte in data:
-            self._buf.append(byte)
-            self._fp = ((self._fp << 1) ^ byte) & 0xFFFFFFFFFFFFFFFF
-            self._total_fed += 1
-
-            chunk_len = len(self._buf) - self._chunk_start
-            if chunk_len < _MIN_CHUNK:
-                continue
-
-            if chunk_len >= _MAX_CHUNK or (self._fp & _MASK) == 0:
-                # Chunk boundary detected — encode immediately
-                chunk_data = bytes(self._buf[self._chunk_start:])
-                self._emit_chunk(chunk_data)
-                self._buf = bytearray()
-                self._chunk_start = 0
-                self._fp = 0
+        buf = self._buf
+        buf += data
+        self._total_fed += len(data)
+        cuts = []
+        start = 0
+        scanned = self._scanned
+        while True:
+            end = next_chunk_end(buf, start, scanned)
+            if end < 0:
+                break
+            cuts.append(end)
+            start, scanned = end, 0
+        if cuts:
+            # Chunk boundaries detected — copy each chunk out of the buffer
+            # once (a bytearray slice would copy twice), hash the whole batch
+            # in one call, then encode the chunks in order
+            with memoryview(buf) as view:
+                chunks = [bytes(view[a:b]) for a, b in zip([0] + cuts, cuts)]
+            for chunk, (sha, sh) in zip(chunks, hash_chunks(chunks)):
+                self._emit_chunk(chunk, sha, sh)
+            # Emitted bytes are dropped once per call, not once per chunk
+            del buf[:cuts[-1]]
+        self._scanned = len(buf)
 
         return self._n_chunks
 
@@ -116,19 +123,25 @@ class CogdedupStream:
         """Convenience: feed a text line (with newline appended)."""
         return self.feed((line + "\n").encode("utf-8"))
 
-    def _emit_chunk(self, chunk: bytes) -> None:
-        """Encode a single chunk and append to the write-ahead log."""
-        sha = sha256_hash(chunk)
-        sh = simhash64(chunk)
+    def _emit_chunk(self, chunk: bytes, sha: Optional[str] = None,
+                    sh: Optional[int] = None) -> None:
+        """Encode a single chunk and append to the write-ahead log.
+
+        sha and sh, if the caller already has them, are the chunk's
+        sha256_hash and simhash64.
+        """
+        if sha is None:
+            sha = sha256_hash(chunk)
+        if sh is None:
+            sh = simhash64(chunk)
 
         # 1. Exact match (zero cost)
         exact = self._store.lookup_exact(sha)
         if exact is not None:
-            token = bytearray([REF])
-            token += encode_uvarint(exact.chunk_id)
+            self._wal.append(REF)
+            self._wal += encode_uvarint(exact.chunk_id)
             self._stats["ref"] += 1
             self._chunk_ids.append(exact.chunk_id)
-            self._tokens.append(bytes(token))
             self._n_chunks += 1
             return
 
@@ -137,19 +150,19 @@ class CogdedupStream:
         full_token = bytearray([FULL])
         full_token += encode_uvarint(len(full_bytes))
         full_token += full_bytes
-        best_token = bytes(full_token)
+        best_token = full_token
         best_type = "full"
 
         # 2a. Similarity delta
         similar = self._store.lookup_similar(sh)
         if similar is not None:
-            delta_bytes = _compute_delta(similar.data, chunk)
+            delta_bytes = _compute_delta(similar.data, chunk, similar.sha256)
             delta_token = bytearray([DELTA])
             delta_token += encode_uvarint(similar.chunk_id)
             delta_token += encode_uvarint(len(delta_bytes))
             delta_token += delta_bytes
             if len(delta_token) < len(best_token):
-                best_token = bytes(delta_token)
+                best_token = delta_token
                 best_type = "delta"
 
         # 2b. Predictive pre-compression
@@ -167,16 +180,16 @@ class CogdedupStream:
                     pred_token += encode_uvarint(len(pred_bytes))
                     pred_token += pred_bytes
                     if len(pred_token) < len(best_token):
-                        best_token = bytes(pred_token)
+                        best_token = pred_token
                         best_type = "pred_delta"
                 except Exception:
                     pass
 
         # Emit the winning token
         self._stats[best_type] += 1
-        entry = self._store.store(chunk)
+        entry = self._store.store_with_hash(chunk, sha, sh)
         self._chunk_ids.append(entry.chunk_id)
-        self._tokens.append(best_token)
+        self._wal += best_token
         self._n_chunks += 1
 
     def finish(self) -> Tuple[bytes, dict]:
@@ -190,17 +203,12 @@ class CogdedupStream:
         self._finished = True
 
         # Flush remaining buffer
-        remaining = bytes(self._buf[self._chunk_start:])
+        remaining = bytes(self._buf)
         if remaining:
             self._emit_chunk(remaining)
 
         # Assemble UCOG blob from write-ahead log
-        out = bytearray()
-        out += MAGIC
-        out.append(VERSION)
-        out += encode_uvarint(self._n_chunks)
-        for token in self._tokens:
-            out += token
+        header = MAGIC + bytes([VERSION]) + encode_uvarint(self._n_chunks)
 
         self._stats["chunks"] = self._n_chunks
 
@@ -211,7 +219,7 @@ class CogdedupStream:
         if self._data_id and hasattr(self._store, 'register_data_chunks'):
             self._store.register_data_chunks(self._data_id, set(self._chunk_ids))
 
-        return bytes(out), self._stats
+        return header + self._wal, self._stats
 
     @property
     def chunks_emitted(self) -> int:
@@ -226,5 +234,5 @@ class CogdedupStream:
         """Current compression ratio (may change as more data arrives)."""
         if self._total_fed == 0:
             return 1.0
-        compressed_size = sum(len(t) for t in self._tokens) + 6  # header overhead
+        compressed_size = len(self._wal) + 6  # header overhead
         return self._total_fed / max(1, compressed_size)
@@ -33,9 +33,12 @@ from __future__ import annotations
 
 import hashlib
 import json
-from collections import Counter, defaultdict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Sequence, Set, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# Key of a motif trie node under which the motif ending there is stored;
+# a private sentinel, so it never collides with an event
+_MOTIF_END = object()
 
 
 @dataclass
@@ -89,44 +92,68 @@ class TemporalMotifTracker:
         # Full event history (event type strings)
         self._history: List[str] = []
 
-        # n-gram counts: pattern tuple -> count
-        self._ngram_counts: Counter = Counter()
+        # n-gram counts as a trie over the history read backwards: the node
+        # at depth n spells the n events ending at some position, newest
+        # first, so one walk back from the latest event reaches every
+        # window ending there. Nodes are [count, motif, children].
+        self._ngrams: List[Any] = [0, None, None]
+        self._unique_ngrams: int = 0
 
         # Detected motifs
         self._motifs: Dict[Tuple[str, ...], TemporalMotif] = {}
+        self._motifs_by_id: List[TemporalMotif] = []  # indexed by motif_id
         self._next_motif_id: int = 0
+        # Trie over motif patterns for TemporalEncoder; rebuilt lazily
+        # after a new motif is detected
+        self._trie: Optional[Dict[Any, Any]] = None
 
     def observe(self, event_type: str) -> Optional[TemporalMotif]:
         """Record an event and check if it completes a known motif.
 
         Returns the motif if the last N events match a known pattern.
         """
-        self._history.append(event_type)
-        idx = len(self._history)
+        history = self._history
+        history.append(event_type)
+        idx = len(history)
+        min_len = self._min_len
 
-        # Update n-gram counts for all window sizes
+        # Update n-gram counts for all window sizes, shortest first; tuples
+        # are only built for patterns that become motifs
         matched_motif = None
-        for n in range(self._min_len, min(self._max_len + 1, idx + 1)):
-            pattern = tuple(self._history[-n:])
-            self._ngram_counts[pattern] += 1
-
-            count = self._ngram_counts[pattern]
+        node = self._ngrams
+        for n in range(1, min(self._max_len, idx) + 1):
+            children = node[2]
+            if children is None:
+                children = node[2] = {}
+            event = history[idx - n]
+            node = children.get(event)
+            if node is None:
+                node = children[event] = [0, None, None]
+                if n >= min_len:
+                    self._unique_ngrams += 1
+            if n < min_len:
+                continue
+
+            count = node[0] = node[0] + 1
             if count >= self._min_occ:
-                if pattern not in self._motifs:
-                    self._motifs[pattern] = TemporalMotif(
+                motif = node[1]
+                if motif is None:
+                    pattern = tuple(history[idx - n:])
+                    motif = node[1] = self._motifs[pattern] = TemporalMotif(
                         motif_id=self._next_motif_id,
                         pattern=pattern,
                         occurrences=count,
                         first_seen=idx - n,
                         avg_gap=0.0,
                     )
+                    self._motifs_by_id.append(motif)
                     self._next_motif_id += 1
+                    self._trie = None
                 else:
-                    self._motifs[pattern].occurrences = count
+                    motif.occurrences = count
 
                 # Return the longest matching motif
-                if matched_motif is None or n > len(matched_motif.pattern):
-                    matched_motif = self._motifs[pattern]
+                matched_motif = motif
 
         return matched_motif
 
@@ -147,6 +174,27 @@ class TemporalMotifTracker:
     def get_motif_by_pattern(self, pattern: Tuple[str, ...]) -> Optional[TemporalMotif]:
         return self._motifs.get(pattern)
 
+    def get_motif_by_id(self, motif_id: int) -> Optional[TemporalMotif]:
+        if 0 <= motif_id < len(self._motifs_by_id):
+            return self._motifs_by_id[motif_id]
+        return None
+
+    def motif_trie(self) -> Dict[Any, Any]:
+        """Nested event -> child dicts spelling every motif pattern.
+
+        The node a pattern ends at maps _MOTIF_END to its motif_id.
+        Cached until the next new motif.
+        """
+        if self._trie is None:
+            root: Dict[Any, Any] = {}
+            for pattern, motif in self._motifs.items():
+                node = root
+                for event in pattern:
+                    node = node.setdefault(event, {})
+                node[_MOTIF_END] = motif.motif_id
+            self._trie = root
+        return self._trie
+
     @property
     def history_length(self) -> int:
         return len(self._history)
@@ -156,13 +204,14 @@ class TemporalMotifTracker:
         return len(self._motifs)
 
     def stats(self) -> dict:
-        motifs = self.detected_motifs()
+        # First motif of detected_motifs(), without sorting all of them
+        top = max(self._motifs.values(), key=lambda m: m.occurrences * m.length, default=None)
         return {
             "events_observed": len(self._history),
-            "unique_ngrams": len(self._ngram_counts),
-            "motifs_detected": len(motifs),
-            "top_motif_occurrences": motifs[0].occurrences if motifs else 0,
-            "top_motif_length": motifs[0].length if motifs else 0,
+            "unique_ngrams": self._unique_ngrams,
+            "motifs_detected": len(self._motifs),
+            "top_motif_occurrences": top.occurrences if top else 0,
+            "top_motif_length": top.length if top else 0,
         }
 
 
@@ -181,8 +230,7 @@ class TemporalEncoder:
         Uses greedy longest-match: at each position, find the longest
         motif that matches and emit a reference instead of individual events.
         """
-        motifs = self._tracker.detected_motifs()
-        if not motifs:
+        if not self._tracker.motif_count:
             tokens = [("literal", e) for e in events]
             return TemporalCompressionResult(
                 tokens=tokens,
@@ -192,26 +240,34 @@ class TemporalEncoder:
                 motifs_used=0,
             )
 
-        # Build lookup: sort motifs by length descending for greedy matching
-        motifs_by_len = sorted(motifs, key=lambda m: m.length, reverse=True)
+        # Walk the motif trie from each position; the deepest motif end on
+        # the way is the longest match (patterns are distinct). The walk
+        # stops at the first event no motif continues with, so it costs at
+        # most max_pattern_len dict lookups.
+        trie = self._tracker.motif_trie()
 
         tokens = []
         i = 0
+        n = len(events)
         motifs_used: Set[int] = set()
 
-        while i < len(events):
-            matched = False
-            for motif in motifs_by_len:
-                end = i + motif.length
-                if end <= len(events):
-                    window = tuple(events[i:end])
-                    if window == motif.pattern:
-                        tokens.append(("motif", motif.motif_id))
-                        motifs_used.add(motif.motif_id)
-                        i = end
-                        matched = True
-                        break
-            if not matched:
+        while i < n:
+            node = trie
+            motif_id = None
+            end = j = i
+            while j < n:
+                node = node.get(events[j])
+                if node is None:
+                    break
+                j += 1
+                found = node.get(_MOTIF_END)
+                if found is not None:
+                    motif_id, end = found, j
+            if motif_id is not None:
+                tokens.append(("motif", motif_id))
+                motifs_used.add(motif_id)
+                i = end
+            else:
                 tokens.append(("literal", events[i]))
                 i += 1
 
@@ -228,11 +284,11 @@ class TemporalEncoder:
     def decode(self, result: TemporalCompressionResult) -> List[str]:
         """Decode a compressed sequence back to events."""
         events = []
-        motif_lookup = {m.motif_id: m for m in self._tracker.detected_motifs()}
+        get_motif = self._tracker.get_motif_by_id
 
         for token_type, value in result.tokens:
             if token_type == "motif":
-                motif = motif_lookup.get(value)
+                motif = get_motif(value)
                 if motif:
                     events.extend(motif.pattern)
                 else:
@@ -1,26 +1,34 @@
 from typing import Tuple
 
+# Single-byte encodings (0..127), the common case for lengths and small ids
+_SMALL = tuple(bytes([i]) for i in range(0x80))
+
 
 def encode_uvarint(n: int) -> bytes:
     """
     Unsigned varint (LEB128 style).
     Small numbers use 1 byte. Bigger numbers use more.
     """
+    if 0 <= n < 0x80:
+        return _SMALL[n]
     if n < 0:
         raise ValueError("uvarint cannot be negative")
 
     out = bytearray()
-    while True:
-        b = n & 0x7F
-        n >>= 7
-        if n:
-            out.append(b | 0x80)
-        else:
-            out.append(b)
-            break
+    encode_uvarint_into(out, n)
     return bytes(out)
 
 
+def encode_uvarint_into(buf: bytearray, n: int) -> None:
+    """Append the uvarint encoding of n to buf without a temporary bytes."""
+    if n < 0:
+        raise ValueError("uvarint cannot be negative")
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
 def decode_uvarint(data: bytes, offset: int = 0) -> Tuple[int, int]:
     """
     Returns (value, new_offset)
@@ -9,7 +9,7 @@ import re
 from dataclasses import dataclass
 from typing import List, Set
 
-from usc.bloom.keyword import bloom_make, bloom_add, bloom_check
+from usc.bloom.keyword import bloom_make, bloom_add_many, bloom_check
 from usc.mem.varint import encode_uvarint, decode_uvarint
 
 MAGIC = b"UIDX"  # 4 bytes — indexed wrapper
@@ -36,12 +36,11 @@ def reindex_cold_blob(
     This can be attached to an already-encoded cold blob.
     """
     bits = bloom_make(n_bits)
-    keyword_count = 0
-
+    words: List[str] = []
     for text in decoded_texts:
-        for word in _WORD_RE.findall(text.lower()):
-            bloom_add(bits, n_bits, n_hashes, word)
-            keyword_count += 1
+        words.extend(_WORD_RE.findall(text.lower()))
+    bloom_add_many(bits, n_bits, n_hashes, words)
+    keyword_count = len(words)
 
     return ColdIndex(
         n_bits=n_bits,
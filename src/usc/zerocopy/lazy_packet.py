@@ -56,6 +56,7 @@ class LazyBlob:
 
     # For simple framed packet formats
     _framed_data: Optional[bytes] = field(default=None, repr=False)
+    _framed_view: Optional[memoryview] = field(default=None, repr=False)
     _packet_offsets: List[Tuple[int, int]] = field(default_factory=list)
 
     def __init__(self, buf: bytes) -> None:
@@ -67,6 +68,7 @@ class LazyBlob:
         self._block_offsets = []
         self._n_packets = 0
         self._framed_data = None
+        self._framed_view = None
         self._packet_offsets = []
 
     def format(self) -> str:
@@ -101,6 +103,23 @@ class LazyBlob:
         self._packet_cache[index] = pkt
         return pkt
 
+    def packet_view(self, index: int) -> memoryview:
+        """Zero-copy view of a single packet; nothing is cached or copied.
+
+        Views into the decompressed framed stream stay valid for the life
+        of the blob. Call bytes() on one to keep it past that.
+        """
+        if not self._header_parsed:
+            self._parse_header()
+
+        if index < 0 or index >= self._n_packets:
+            raise IndexError(f"Packet index {index} out of range [0, {self._n_packets})")
+
+        if self._framed_view is not None and index < len(self._packet_offsets):
+            start, length = self._packet_offsets[index]
+            return self._framed_view[start:start + length]
+        return memoryview(self.packet(index))
+
     def packets(self, start: int = 0, end: Optional[int] = None) -> List[bytes]:
         """Decompress and return a range of packets."""
         if end is None:
@@ -160,18 +179,19 @@ class LazyBlob:
         off += 4
         dict_bytes = bytes(buf[off:off + dict_len])
         off += dict_len
-        _framed_len = int.from_bytes(buf[off:off + 4], "little")
+        framed_len = int.from_bytes(buf[off:off + 4], "little")
         off += 4
         comp_len = int.from_bytes(buf[off:off + 4], "little")
         off += 4
-        comp = bytes(buf[off:off + comp_len])
+        comp = buf[off:off + comp_len]
 
         if len(dict_bytes) > 0:
             ddict = zstd.ZstdCompressionDict(dict_bytes)
             dctx = zstd.ZstdDecompressor(dict_data=ddict)
         else:
             dctx = zstd.ZstdDecompressor()
-        self._framed_data = dctx.decompress(comp)
+        self._framed_data = dctx.decompress(comp, max_output_size=framed_len)
+        self._framed_view = memoryview(self._framed_data)
         self._parse_framed_packets()
 
     def _parse_odc2_header(self, buf: memoryview) -> None:
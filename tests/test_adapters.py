@@ -33,6 +33,47 @@ class TestLangChainAdapter:
         assert len(retrieved) == 1
         assert retrieved[0] == ("system", "You are a helpful assistant.")
 
+    def test_shared_adapter_across_threads(self):
+        """One adapter instance round-trips from several threads at once."""
+        from concurrent.futures import ThreadPoolExecutor
+        adapter = LangChainMemoryAdapter()
+
+        def roundtrip(i):
+            messages = [("human", f"question {i}"), ("ai", f"answer {i}")]
+            return adapter.retrieve(adapter.ingest(messages)) == messages
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            assert all(pool.map(roundtrip, range(64)))
+
+    def test_ingest_many_roundtrip(self):
+        adapter = LangChainMemoryAdapter()
+        histories = [
+            [("human", f"turn {i}"), ("ai", f"reply {i} é")] for i in range(50)
+        ] + [[]]
+        blob = adapter.ingest_many(histories)
+        assert adapter.retrieve_many(blob) == histories
+        assert len(blob) < sum(len(adapter.ingest(h)) for h in histories)
+
+    def test_batch_matches_single(self):
+        adapter = LangChainMemoryAdapter()
+        histories = [[("human", f"q{i}"), ("ai", f"a{i}")] for i in range(20)]
+        blobs = adapter.ingest_batch(histories)
+        assert [adapter.retrieve(b) for b in blobs] == histories
+        assert adapter.retrieve_batch(blobs) == histories
+        assert adapter.retrieve_batch([adapter.ingest(histories[0])]) == histories[:1]
+
+    def test_trained_dict(self):
+        adapter = LangChainMemoryAdapter()
+        past = [
+            [("human", f"Please summarize ticket #{i} for the on-call team"),
+             ("ai", f"Ticket #{i}: service degraded, rollback applied, monitoring")]
+            for i in range(200)
+        ]
+        dict_bytes = adapter.train_dict(past, dict_size=2048)
+        messages = [("human", "Please summarize ticket #999 for the on-call team")]
+        blob = adapter.ingest(messages)
+        assert LangChainMemoryAdapter(dict_data=dict_bytes).retrieve(blob) == messages
+
     def test_langchain_import_error(self):
         adapter = LangChainMemoryAdapter()
         # This should raise ImportError if langchain not installed
@@ -77,6 +118,55 @@ class TestOTelAdapter:
         assert retrieved[1].name == "db.query"
         assert retrieved[1].parent_id == "def456"
 
+    def test_retrieve_skips_non_span_lines(self):
+        """Only SPAN lines are parsed; CRLF and surrounding whitespace are tolerated."""
+        adapter = OTelSpanAdapter()
+        text = "header line\r\n  SPAN a trace=t1 k=é\r\n\nSPANX b\nSPAN c span=s2  \n"
+        blob = adapter._zstd.compressor().compress(text.encode("utf-8"))
+        spans = adapter.retrieve(blob)
+        assert [(s.name, s.trace_id, s.span_id) for s in spans] == [("a", "t1", ""), ("c", "", "s2")]
+        assert spans[0].attributes == {"k": "é"}
+
+    def test_trained_dict_shrinks_small_blobs(self):
+        adapter = OTelSpanAdapter()
+
+        def batch(i):
+            return [SpanRecord(
+                name="http.request", trace_id=f"{i:032x}", span_id=f"{i:016x}",
+                start_time=str(1000 + i), end_time=str(1100 + i),
+                attributes={"http.method": "GET", "http.url": f"/api/v1/items/{i}"},
+            )]
+
+        plain = adapter.ingest(batch(5000))
+        dict_bytes = adapter.train_dict([batch(i) for i in range(300)], dict_size=4096)
+        blob = adapter.ingest(batch(5000))
+        assert len(blob) < len(plain)
+        reader = OTelSpanAdapter(dict_data=dict_bytes)
+        assert reader.retrieve(blob)[0].attributes["http.url"] == "/api/v1/items/5000"
+
+    def test_batch_roundtrip(self):
+        adapter = OTelSpanAdapter()
+        batches = [
+            [SpanRecord(name=f"op{i}", trace_id="t", span_id=str(j)) for j in range(3)]
+            for i in range(10)
+        ]
+        blobs = adapter.ingest_batch(batches)
+        assert [adapter.retrieve(b) for b in blobs] == adapter.retrieve_batch(blobs)
+        assert adapter.retrieve_batch(blobs)[4][2].name == "op4"
+        assert adapter.retrieve_batch([]) == []
+
+    def test_parse_span_line_token_rules(self):
+        """Keys split at the first '=', later duplicates win, bare tokens are ignored."""
+        adapter = OTelSpanAdapter()
+        span = adapter._parse_span_line(
+            "SPAN op trace=t1 bare q=a=b k=1 k=2 empty= status=ERROR trace=t2"
+        )
+        assert span.name == "op"
+        assert span.trace_id == "t2"
+        assert span.status == "ERROR"
+        assert span.attributes == {"q": "a=b", "k": "2", "empty": ""}
+        assert adapter._parse_span_line("SPAN") is None
+
     def test_span_attributes_preserved(self):
         adapter = OTelSpanAdapter()
         spans = [
@@ -70,6 +70,180 @@ class TestHasher:
         for a, b in zip(c1, c2):
             assert a == b
 
+    def test_native_cdc_matches_python(self):
+        """The windowed C scan finds exactly the Python fallback's boundaries."""
+        import random
+        from usc.cogdedup import hasher
+        if hasher._cdc_lib is None:
+            pytest.skip("CDC C extension unavailable")
+        rng = random.Random(11)
+        cases = [rng.randbytes(300000), bytes(40000), bytes(range(256)) * 300]
+        cases += [rng.randbytes(n) for n in (1025, 2047, 16384, 16385, 33000)]
+        for data in cases:
+            assert hasher._cdc_native(data) == hasher._cdc_python(data)
+
+    def test_parallel_cdc_matches_single_scan(self, monkeypatch):
+        """Splitting the scan across threads leaves every boundary in place."""
+        import random
+        from usc.cogdedup import hasher
+        if hasher._cdc_lib is None:
+            pytest.skip("CDC C extension unavailable")
+        rng = random.Random(5)
+        cases = [rng.randbytes(200000), bytes(90000), bytes(range(256)) * 400]
+        cases.append(rng.randbytes(50000) * 3 + rng.randbytes(7777))
+        expected = [hasher._cdc_native(data) for data in cases]
+        monkeypatch.setattr(hasher.os, "cpu_count", lambda: 4)
+        monkeypatch.setattr(hasher, "PARALLEL_CDC_MIN_BYTES", 20000)
+        assert hasher._cdc_parallel_bounds(cases[0], 4) is not None
+        for data, chunks in zip(cases, expected):
+            assert hasher._cdc_native(data) == chunks
+
+    def test_cdc_build_falls_back_to_portable_flags(self, monkeypatch, tmp_path):
+        """A compiler rejecting the native flags still yields a stamped, working build."""
+        import shutil
+        from usc.cogdedup import hasher
+        if shutil.which("cc") is None:
+            pytest.skip("no C compiler")
+        monkeypatch.setattr(hasher.tempfile, "gettempdir", lambda: str(tmp_path))
+        monkeypatch.setattr(hasher, "_CDC_NATIVE_FLAGS", ("-mno-such-flag",))
+        monkeypatch.setattr(hasher, "_cdc_lib", None)
+        lib = hasher._compile_cdc_lib()
+        assert lib is not None
+        built = list((tmp_path / "usc_cogdedup_cache").glob("cdc_fast_*.so"))
+        assert len(built) == 1
+        data = bytes(range(256)) * 100
+        assert hasher._cdc_native(data) == hasher._cdc_python(data)
+
+    def test_cdc_build_is_keyed_by_cpu_features(self, monkeypatch, tmp_path):
+        """Hosts sharing a cache dir build separately when their CPUs differ."""
+        import shutil
+        from usc.cogdedup import hasher
+        if shutil.which("cc") is None:
+            pytest.skip("no C compiler")
+        monkeypatch.setattr(hasher.tempfile, "gettempdir", lambda: str(tmp_path))
+        cache = tmp_path / "usc_cogdedup_cache"
+        for features in ("sse2", "sse2 avx2"):
+            monkeypatch.setattr(hasher, "_cpu_features", lambda: features)
+            monkeypatch.setattr(hasher, "_cdc_lib", None)
+            assert hasher._compile_cdc_lib() is not None
+        assert len(list(cache.glob("cdc_fast_*.so"))) == 2
+        assert not list(cache.glob("*.c"))
+
+    def test_hash_pool_created_once_under_contention(self, monkeypatch):
+        import threading
+        from usc.cogdedup import hasher
+        monkeypatch.setattr(hasher, "_hash_pool", None)
+        barrier = threading.Barrier(8)
+        pools = []
+
+        def grab():
+            barrier.wait()
+            pools.append(hasher._get_hash_pool())
+
+        threads = [threading.Thread(target=grab) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len({id(p) for p in pools}) == 1
+        pools[0].shutdown()
+
+    def test_python_fallbacks_match_reference(self):
+        """Windowed CDC and histogram SimHash equal the plain recurrences."""
+        import random
+        from usc.cogdedup import hasher
+
+        def cdc_reference(data):
+            chunks, start, fp = [], 0, 0
+            for i, byte in enumerate(data):
+                fp = ((fp << 1) + hasher._GEAR[byte]) & 0xFFFFFFFFFFFFFFFF
+                clen = i - start + 1
+                mask = hasher._MASK_S if clen < hasher._AVG_CHUNK else hasher._MASK_L
+                if clen >= hasher._MIN_CHUNK and (
+                        clen >= hasher._MAX_CHUNK or (fp & mask) == 0):
+                    chunks.append(data[start:i + 1])
+                    start, fp = i + 1, 0
+            return chunks + ([data[start:]] if start < len(data) else [])
+
+        def simhash_reference(data):
+            counts = [0] * 64
+            for i in range(len(data) - 3):
+                h = hasher._FNV_OFFSET
+                for byte in data[i:i + 4]:
+                    h = ((h ^ byte) * hasher._FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
+                for bit in range(64):
+                    counts[bit] += 1 if h >> bit & 1 else -1
+            return sum(1 << bit for bit in range(64) if counts[bit] > 0)
+
+        rng = random.Random(13)
+        for data in (rng.randbytes(60000), bytes(40000), bytes(range(256)) * 100,
+                     rng.randbytes(1037), rng.randbytes(16385)):
+            assert hasher._cdc_python(data) == cdc_reference(data)
+        for n in (0, 3, 4, 5, 64, 999):
+            data = rng.randbytes(n)
+            assert hasher._simhash64_python(data) == simhash_reference(data)
+
+    def test_content_defined_chunks_buffer_inputs(self):
+        """bytearray/memoryview chunk like bytes; the reused bounds buffer stays correct."""
+        from usc.cogdedup import hasher
+        data = bytes((i * 131 + (i >> 7)) & 0xFF for i in range(60000))
+        expected = hasher._cdc_python(data)
+        assert content_defined_chunks(bytearray(data)) == expected
+        assert content_defined_chunks(memoryview(data)) == expected
+        assert content_defined_chunks(data[:5000]) == hasher._cdc_python(data[:5000])
+
+
+    def test_hash_chunks_matches_per_chunk(self, monkeypatch):
+        """Batch hashing (threaded or not) equals per-chunk sha256/simhash."""
+        from usc.cogdedup import hasher
+        from usc.cogdedup.hasher import hash_chunks
+        data = b"".join(f"line {i} of the batch hashing test\n".encode() for i in range(3000))
+        chunks = content_defined_chunks(data)
+        assert len(chunks) > hasher.PARALLEL_HASH_MIN_CHUNKS
+        expected = [(sha256_hash(c), simhash64(c)) for c in chunks]
+        assert hash_chunks(chunks) == expected
+        assert hasher.sha256_hash_batch(chunks) == [sha for sha, _ in expected]
+        monkeypatch.setattr(hasher.os, "cpu_count", lambda: 4)
+        assert hash_chunks(chunks) == expected
+        assert hash_chunks([]) == []
+
+    def test_chunks_with_hashes_match_slices(self, monkeypatch):
+        """Offsets, digests and SimHashes equal chunking then hashing each chunk."""
+        import random
+        from usc.cogdedup import hasher
+        rng = random.Random(8)
+        cases = [b"", b"abc", rng.randbytes(1024), rng.randbytes(90000), bytes(40000)]
+        for lib in (hasher._cdc_lib, None):
+            monkeypatch.setattr(hasher, "_cdc_lib", lib)
+            for data in cases:
+                bounds, shas, sims = hasher.content_defined_chunks_with_hashes(data)
+                chunks = [data[a:b] for a, b in zip(bounds, bounds[1:])]
+                assert bounds[0] == 0 and chunks == content_defined_chunks(data)
+                assert shas == [sha256_hash(c) for c in chunks]
+                assert sims == [hasher._simhash64_python(c) if len(c) >= 4 else 0 for c in chunks]
+
+    def test_native_simhash_matches_python(self):
+        """The C SimHash is bit-identical to the pure Python one."""
+        import random
+        from usc.cogdedup import hasher
+        if hasher._cdc_lib is None:
+            pytest.skip("CDC C extension unavailable")
+        rng = random.Random(9)
+        for data in [b"abcd", b"abcde", bytes(70000), rng.randbytes(4097), rng.randbytes(100000)]:
+            assert simhash64(data) == hasher._simhash64_python(data)
+
+    def test_simhash_numpy_matches_python(self):
+        """Both bit-count paths agree with the pure Python SimHash."""
+        import random
+        from usc.cogdedup import hasher
+        pytest.importorskip("numpy")
+        rng = random.Random(7)
+        sizes = (4, 5, 258, 259, 1000, hasher._BINCOUNT_MIN_SHINGLES + 3,
+                 hasher._BINCOUNT_MIN_SHINGLES + 4, 20000)
+        for n in sizes:
+            for data in (rng.randbytes(n), (b"abcabcab" * n)[:n]):
+                assert hasher._simhash64_numpy(data) == hasher._simhash64_python(data)
+
 
 class TestCogStore:
     def test_store_and_exact_lookup(self):
@@ -197,3 +371,58 @@ class TestCogCodec:
         blob, stats = cogdedup_encode(data, store)
         total = stats["ref"] + stats["delta"] + stats["full"]
         assert total == stats["chunks"]
+
+    def test_cached_delta_contexts(self):
+        """Delta contexts are reused per source, bounded, and per thread."""
+        import threading
+        from usc.cogdedup import codec
+
+        src = b"Log entry: 2025-01-01 INFO Starting service on port 8080\n" * 40
+        dst = src.replace(b"8080", b"8081")
+        delta = codec._compute_delta(src, dst)
+        assert codec._compute_delta(src, dst) == delta
+        assert codec._tls.dict_ctxs[("c", src)] is codec._dict_ctx(("c", src), None)
+        assert codec._apply_delta(src, delta) == dst
+
+        # Keyed by the chunk's SHA-256, a fresh copy of src still hits
+        sha = sha256_hash(src)
+        assert codec._compute_delta(src, dst, sha) == delta
+        assert ("c", sha) in codec._tls.dict_ctxs
+        assert codec._apply_delta(bytes(bytearray(src)), delta, sha) == dst
+
+        for i in range(codec._DICT_CTX_CACHE_SIZE + 5):
+            codec._apply_delta(src + bytes([i]), codec._compute_delta(src + bytes([i]), dst))
+        assert len(codec._tls.dict_ctxs) == codec._DICT_CTX_CACHE_SIZE
+
+        results = []
+        t = threading.Thread(target=lambda: results.append(codec._apply_delta(src, delta)))
+        t.start()
+        t.join()
+        assert results == [dst]
+
+    def test_speculative_delta_skips_full(self, monkeypatch):
+        """A small enough DELTA is emitted without compressing FULL."""
+        from usc.cogdedup import codec
+
+        store = MemoryCogStore()
+        original = b"Log entry: 2025-01-01 INFO Starting service on port 8080\n" * 300
+        cogdedup_encode(original, store)
+
+        calls = []
+        real = codec._zstd_compress
+        monkeypatch.setattr(codec, "_zstd_compress", lambda *a, **k: calls.append(1) or real(*a, **k))
+        store.full_ratio_estimates()[10] = 0.5
+        modified = original.replace(b"8080", b"8081", 3)
+        blob, stats = cogdedup_encode(modified, store)
+        assert stats["full_skipped"] == stats["delta"] > 0
+        assert len(calls) == stats["full"]
+        assert cogdedup_decode(blob, store) == modified
+
+    def test_full_ratio_estimate_is_per_store(self):
+        """One store's FULL ratios do not steer encodes into another."""
+        first, second = MemoryCogStore(), MemoryCogStore()
+        data = b"Log entry: 2025-01-01 INFO Starting service on port 8080\n" * 300
+        cogdedup_encode(data, first)
+        assert 10 in first.full_ratio_estimates()
+        assert second.full_ratio_estimates() == {}
+        assert first.full_ratio_estimates() is first.full_ratio_estimates()
@@ -77,12 +77,111 @@ class TestLSHIndex:
         assert idx.size == 0
         assert idx.query_nearest(0xAAAA) is None
 
+    def test_discard_tombstones_then_compacts(self, monkeypatch):
+        from usc.cogdedup import lsh
+        # Only the bucket layout tombstones; the flat one removes in O(1)
+        monkeypatch.setattr(lsh, "_FLAT_BANDS", False)
+        idx = LSHIndex()
+        for i in range(10):
+            idx.insert(i, 0xAAAA + i)
+        idx.discard(0)
+        assert idx.size == 9
+        assert 0 not in idx.query_candidates(0xAAAA)
+        assert idx._tombstones == {0}
+        idx.discard(1)
+        idx.discard(2)
+        # Crossing the ratio (3 of 10) compacts the buckets
+        assert not idx._tombstones
+        assert idx.size == 7
+        # Re-inserting a discarded id makes it visible again
+        idx.insert(0, 0xAAAA)
+        assert idx.query_nearest(0xAAAA) == 0
+
+    def test_query_nearest_flat_scan(self):
+        """Nearest search is exact, including matches that share no band."""
+        pytest.importorskip("numpy")
+        idx = LSHIndex()
+        base = 0x0123456789ABCDEF
+        # One flipped bit in every band: distance 8, no band in common
+        spread = base ^ sum(1 << (i * BAND_WIDTH) for i in range(N_BANDS))
+        idx.insert(7, spread)
+        assert not idx.query_candidates(base)
+        assert idx.query_nearest(base) == 7
+
+        idx.insert(8, base ^ 0b11)
+        assert idx.query_nearest(base) == 8
+        idx.discard(8)
+        assert idx.query_nearest(base) == 7
+        idx.remove(7)
+        assert idx.query_nearest(base) is None
+        for i in range(200):
+            idx.insert(100 + i, base ^ (1 << (i % 63)) ^ (1 << 63))
+        assert idx.query_nearest(base) in range(100, 300)
+        assert idx.query_nearest(base, threshold=0) is None
+
+    def test_flat_band_candidates_match_buckets(self, monkeypatch):
+        """Byte-compare candidates over the flat array equal the bucket dicts'."""
+        pytest.importorskip("numpy")
+        import random
+        from usc.cogdedup import lsh
+        rng = random.Random(4)
+        entries = [(i, rng.getrandbits(64) & ~(0xFF << (8 * (i % 8)))) for i in range(300)]
+        queries = [rng.getrandbits(64) & ~(0xFF << (8 * (i % 8))) for i in range(50)]
+
+        def run():
+            idx = LSHIndex()
+            idx.rebuild(entries)
+            for cid in range(0, 300, 7):
+                idx.discard(cid)
+            idx.remove(5)
+            idx.insert(7, entries[7][1])
+            nearest = [idx.query_nearest(q, threshold=64) for q in queries]
+            return [idx.query_candidates(q) for q in queries], idx.size, nearest
+
+        flat = run()
+        monkeypatch.setattr(lsh, "_FLAT_BANDS", False)
+        assert run() == flat
+        assert any(flat[0])
+
+    def test_popcount_fallback_matches(self, monkeypatch):
+        """The SWAR popcount used without np.bitwise_count is exact."""
+        np = pytest.importorskip("numpy")
+        from usc.cogdedup import lsh
+        rng = np.random.default_rng(5)
+        x = rng.integers(0, 2**63, size=500, dtype=np.int64).astype(np.uint64)
+        x[:3] = (0, 2**64 - 1, 1 << 63)
+        expected = [bin(int(v)).count("1") for v in x]
+        monkeypatch.delattr(lsh.np, "bitwise_count", raising=False)
+        assert lsh._popcount64(x.copy()).tolist() == expected
+
     def test_rebuild(self):
         idx = LSHIndex()
         entries = [(i, simhash64(f"chunk {i}".encode() * 100)) for i in range(50)]
         idx.rebuild(entries)
         assert idx.size == 50
 
+    def test_bulk_rebuild_matches_inserts(self):
+        """rebuild() loads the flat arrays in bulk with insert() semantics."""
+        import random
+        rng = random.Random(8)
+        entries = [(i % 180, rng.getrandbits(64)) for i in range(200)]
+        entries.append((999, (1 << 64) - 1))
+        bulk = LSHIndex()
+        bulk.insert(5000, 123)  # dropped by the rebuild
+        bulk.rebuild(entries)
+        incremental = LSHIndex()
+        for cid, sh in entries:
+            incremental.insert(cid, sh)
+
+        assert bulk.size == incremental.size == 181
+        for _, sh in entries[::7] + [(0, 123)]:
+            assert bulk.query_nearest(sh) == incremental.query_nearest(sh)
+            assert bulk.query_candidates(sh) == incremental.query_candidates(sh)
+        bulk.discard(999)
+        bulk.insert(1000, 7)
+        assert bulk.query_nearest((1 << 64) - 1) is None
+        assert bulk.query_nearest(7) == 1000
+
     def test_lsh_used_in_memorystore(self):
         """MemoryCogStore should use LSH instead of linear scan."""
         store = MemoryCogStore()
@@ -128,6 +227,38 @@ class TestCooccurrence:
         assert len(predicted) == 1
         assert predicted[0].chunk_id == e2.chunk_id
 
+    def test_cooccurrence_matches_pairwise_counts(self):
+        """Counts and neighbor order equal a loop over every ordered pair i != j."""
+        import random
+        rng = random.Random(6)
+        store = MemoryCogStore()
+        expected = {}
+        for _ in range(5):
+            ids = [rng.randrange(12) for _ in range(rng.randrange(1, 30))]
+            store.record_cooccurrence(ids)
+            for i, a in enumerate(ids):
+                row = expected.setdefault(a, {})
+                for j, b in enumerate(ids):
+                    if i != j:
+                        row[b] = row.get(b, 0) + 1
+        assert {a: list(row.items()) for a, row in store._cooccurrence.items()} == \
+            {a: list(row.items()) for a, row in expected.items()}
+
+    def test_top_k_over_many_neighbors(self):
+        """The heap path for wide neighbor sets ranks like a full sort."""
+        from usc.cogdedup import store as store_mod
+        store = MemoryCogStore()
+        hub = store.store(b"hub chunk " * 120)
+        n = store_mod._NLARGEST_MIN_NEIGHBORS + 50
+        ids = [store.store(f"neighbor {i} ".encode() * 100).chunk_id for i in range(n)]
+        for i, cid in enumerate(ids):
+            for _ in range(i % 7):
+                store.record_cooccurrence([hub.chunk_id, cid])
+        neighbors = store._cooccurrence[hub.chunk_id]
+        expected = sorted(neighbors, key=neighbors.get, reverse=True)[:8]
+        got = store.get_predicted_chunks(hub.chunk_id, top_k=8)
+        assert [e.chunk_id for e in got] == expected
+
 
 class TestPredictiveCompressor:
     def test_no_prediction_initially(self):
@@ -159,6 +290,31 @@ class TestPredictiveCompressor:
 
         assert pred.cache_size <= 2
 
+    def test_cache_is_lru_and_dicts_are_digested(self):
+        """Hits refresh recency; the digested dict compresses like a raw one."""
+        import zstandard as zstd
+        store = MemoryCogStore()
+        pred = PredictiveCompressor(store, dict_cache_size=2)
+        hub = store.store(b"shared hub chunk " * 200)
+        ids = []
+        for i in range(3):
+            e = store.store(f"chunk {i} body ".encode() * 200)
+            store.record_cooccurrence([e.chunk_id, hub.chunk_id])
+            ids.append(e.chunk_id)
+
+        pred.get_dictionary_for(ids[0])
+        pred.get_dictionary_for(ids[1])
+        pred.get_dictionary_for(ids[0])  # refresh: ids[1] is now oldest
+        pred.get_dictionary_for(ids[2])
+        assert list(pred._dict_cache) == [ids[0], ids[2]]
+
+        dict_data, dict_ids = pred.get_dictionary_and_ids(ids[0])
+        content = b"".join(store.get(d).data for d in dict_ids)
+        sample = b"chunk 0 body, slightly edited " * 50
+        raw = zstd.ZstdCompressor(level=10, dict_data=zstd.ZstdCompressionDict(content))
+        digested = zstd.ZstdCompressor(level=10, dict_data=dict_data)
+        assert digested.compress(sample) == raw.compress(sample)
+
 
 # ===================== Streaming Cogdedup Tests =====================
 
@@ -214,6 +370,30 @@ class TestStreaming:
         assert cogdedup_decode(blob1, store) == data
         assert cogdedup_decode(blob2, store) == data
 
+    @pytest.mark.parametrize("native", [True, False])
+    @pytest.mark.parametrize("piece", [1, 777, 50000])
+    def test_stream_boundaries_match_batch_cdc(self, monkeypatch, native, piece):
+        """Streaming cuts the same Gear/normalized chunks as content_defined_chunks."""
+        import random
+        from usc.cogdedup import hasher
+        if native and hasher._cdc_lib is None:
+            pytest.skip("CDC C extension unavailable")
+        rng = random.Random(3)
+        data = rng.randbytes(60000) + b"steady log line\n" * 3000
+        expected = content_defined_chunks(data)
+        if not native:
+            monkeypatch.setattr(hasher, "_cdc_lib", None)
+
+        store = MemoryCogStore()
+        stream = CogdedupStream(store)
+        emitted = []
+        real_emit = stream._emit_chunk
+        monkeypatch.setattr(stream, "_emit_chunk", lambda c, *hashes: (emitted.append(c), real_emit(c, *hashes)))
+        for i in range(0, len(data), piece):
+            stream.feed(data[i:i + piece])
+        stream.finish()
+        assert emitted == expected
+
     def test_stream_current_ratio(self):
         store = MemoryCogStore()
         stream = CogdedupStream(store)
@@ -392,6 +572,42 @@ class TestCodecV2:
         assert decoded == final_data
 
 
+    def test_pred_delta_shared_dictionary_built_once(self, monkeypatch):
+        """Sibling PRED_DELTA chunks with the same dict ids fetch them once."""
+        import zstandard as zstd
+        from usc.mem.varint import encode_uvarint
+        store = MemoryCogStore()
+        ids = [store.store(f"dictionary chunk {i} ".encode() * 20).chunk_id for i in range(3)]
+        dict_content = b"".join(store.get(i).data for i in ids)
+        cctx = zstd.ZstdCompressor(dict_data=zstd.ZstdCompressionDict(dict_content))
+        chunks = [f"dictionary chunk {i} payload {i}".encode() for i in range(4)]
+        blob = bytearray(b"UCOG" + bytes([VERSION]) + encode_uvarint(len(chunks)))
+        for chunk in chunks:
+            comp = cctx.compress(chunk)
+            blob += bytes([PRED_DELTA]) + encode_uvarint(len(ids))
+            blob += b"".join(encode_uvarint(i) for i in ids)
+            blob += encode_uvarint(len(comp)) + comp
+
+        gets = []
+        real_get = store.get
+        monkeypatch.setattr(store, "get", lambda cid: gets.append(cid) or real_get(cid))
+        assert cogdedup_decode(bytes(blob), store) == b"".join(chunks)
+        assert gets == ids
+
+    def test_encode_stores_with_precomputed_hashes(self, monkeypatch):
+        """The store reuses the encoder's hashes instead of hashing chunks again."""
+        import usc.cogdedup.store as store_mod
+        store = MemoryCogStore()
+        monkeypatch.setattr(store_mod, "sha256_hash", lambda d: pytest.fail("rehashed"))
+        monkeypatch.setattr(store_mod, "simhash64", lambda d: pytest.fail("rehashed"))
+
+        data = b"precomputed hash test line\n" * 400
+        blob, _ = cogdedup_encode(data, store)
+        assert cogdedup_decode(blob, store) == data
+        entry = store.get(0)
+        assert entry.sha256 == sha256_hash(entry.data)
+        assert entry.simhash == simhash64(entry.data)
+
 # ===================== Store Stats Tests =====================
 
 class TestStoreStats:
@@ -437,6 +653,59 @@ class TestStoreStats:
             assert entry is not None
             assert entry.data is not None  # decompressed on demand
 
+    def test_cold_archive_trains_shared_dict(self):
+        """A large archive batch trains the zstd dictionary; earlier cold chunks still decode."""
+        pytest.importorskip("zstandard")
+        import random
+        rng = random.Random(2)
+        store = MemoryCogStore()
+        store.ARCHIVE_TRIGGER = 10 ** 6
+        store.ARCHIVE_KEEP_WARM = 0
+        store.COLD_AGE_SECONDS = -1
+        payloads = [
+            "".join(f"ts={rng.randrange(10**9)} user={rng.choice('abcd')} op=read ok\n"
+                    for _ in range(60)).encode()
+            for _ in range(60)
+        ]
+        for p in payloads[:4]:
+            store.store(p)
+        assert store._archive_cold() == 4
+        assert store._cold_dict is None  # too few samples to train on
+        for p in payloads[4:]:
+            store.store(p)
+        assert store._archive_cold() == 56
+        assert store._cold_dict is not None
+        assert store.stats()["cold_dict_bytes"] > 0
+        for cid, p in enumerate(payloads):
+            assert store._by_id[cid].data is None
+            assert store.get(cid).data == p
+
+    def test_cold_batch_compression_matches_per_chunk(self):
+        """The multi-threaded batch call yields the same frames as one call per chunk."""
+        pytest.importorskip("zstandard")
+        store = MemoryCogStore()
+        payloads = [f"cold payload {i} ".encode() * (i + 1) for i in range(40)] + [b""]
+        assert store._cold_compress_many(payloads) == [store._cold_compress(p) for p in payloads]
+        assert [store._cold_decompress(b) for b in store._cold_compress_many(payloads)] == payloads
+
+    def test_warm_count_tracks_archive_and_rehydrate(self):
+        """The running warm counter agrees with a scan over the entries."""
+        store = MemoryCogStore()
+        store.ARCHIVE_TRIGGER = 10 ** 6
+        store.ARCHIVE_KEEP_WARM = 5
+        store.COLD_AGE_SECONDS = -1
+        payloads = [f"warm counter payload {i}".encode() * 20 for i in range(30)]
+        for p in payloads:
+            store.store(p)
+        assert store._archive_cold() == 25
+        assert store._warm_count == store.stats()["warm_chunks"] == 5
+        store.get(0)
+        store.store(payloads[1])
+        assert store._warm_count == store.stats()["warm_chunks"] == 7
+        assert store._archive_cold() == 2
+        assert store._warm_count == store.stats()["warm_chunks"] == 5
+        assert store._archive_cold() == 0
+
     def test_cold_archival_preserves_roundtrip(self):
         """Encoding/decoding should work after cold archival."""
         store = MemoryCogStore()
@@ -242,6 +242,7 @@ class TestBudgetedDecode:
         assert result.decoded_packets <= 3
         assert result.total_packets == len(packets)
         assert len(result.packets) == result.decoded_packets
+        assert result.to_bytes_list() == packets[:result.decoded_packets]
 
     def test_budget_limits_bytes(self):
         from usc.budget import budgeted_decode
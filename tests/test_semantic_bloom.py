@@ -1,10 +1,14 @@
 """Tests for G5: Semantic Bloom Filters."""
 import math
+
+import pytest
 from usc.bloom import (
     bloom_make,
     bloom_add,
     bloom_check,
     bloom_check_all,
+    bloom_add_many,
+    bloom_check_many,
     fnv1a_hash32,
     build_semantic_bloom,
     query_keyword,
@@ -51,6 +55,103 @@ class TestKeywordBloom:
         b = fnv1a_hash32("test-b", 0)
         assert a != b
 
+    def test_fnv1a_bytes_matches_ascii_str(self):
+        assert fnv1a_hash32(b"server-01", 7) == fnv1a_hash32("server-01", 7)
+
+    def test_probe_positions_match_reference(self):
+        """Native probe positions equal the pure-Python FNV-1a reference."""
+        from usc.bloom.keyword import _probe_positions
+        for tok in ["", "hello", "host=web-01", "café", "日本語", "emoji😀"]:
+            for n_bits in (7, 8192):
+                expected = [
+                    fnv1a_hash32(tok, 0x9E3779B9 + i * 0x85EBCA6B) % n_bits
+                    for i in range(5)
+                ]
+                assert list(_probe_positions(tok, n_bits, 5)) == expected
+
+    def test_lone_surrogates_hash_like_reference(self):
+        """Tokens with lone surrogates reach the kernel as their code points."""
+        from usc.bloom.keyword import _probe_positions
+        tokens = ["a\ud800b", "\udfff", "ok"]
+        for tok in tokens:
+            expected = [
+                fnv1a_hash32(tok, 0x9E3779B9 + i * 0x85EBCA6B) % 8192
+                for i in range(4)
+            ]
+            assert list(_probe_positions(tok, 8192, 4)) == expected
+        ref = bloom_make(8192)
+        for tok in tokens:
+            bloom_add(ref, 8192, 4, tok)
+        batch = bloom_make(8192)
+        bloom_add_many(batch, 8192, 4, tokens)
+        assert batch == ref
+        assert bloom_check_many(batch, 8192, 4, tokens) == [True, True, True]
+
+    def test_add_many_matches_add(self):
+        tokens = ["Alpha", "beta", "host=web-01", "café", "", "日本語"] * 3
+        single = bloom_make(2048)
+        for t in tokens:
+            bloom_add(single, 2048, 4, t)
+        batch = bloom_make(2048)
+        bloom_add_many(batch, 2048, 4, tokens)
+        assert batch == single
+        assert bloom_check_many(batch, 2048, 4, ["ALPHA", "café", "missing_token_zz"]) == [
+            True, True, bloom_check(batch, 2048, 4, "missing_token_zz"),
+        ]
+        assert bloom_check_many(batch, 2048, 4, []) == []
+
+    def test_fused_kernel_matches_reference_bits(self):
+        """Batch add/check set and test the same bits as pure-Python FNV-1a."""
+        tokens = [f"tok{i}_{'x' * (i % 7)}" for i in range(500)] + ["café", "日本語"]
+        for n_hashes in (1, 4, 70):
+            ref = bloom_make(3001)
+            for t in tokens:
+                for i in range(n_hashes):
+                    pos = fnv1a_hash32(t, 0x9E3779B9 + i * 0x85EBCA6B) % 3001
+                    ref[pos >> 3] |= 1 << (pos & 7)
+            batch = bloom_make(3001)
+            bloom_add_many(batch, 3001, n_hashes, tokens)
+            assert batch == ref
+            probes = tokens[:50] + [f"missing_{i}" for i in range(200)]
+            assert bloom_check_many(batch, 3001, n_hashes, probes) == [
+                bloom_check(batch, 3001, n_hashes, t) for t in probes
+            ]
+        with pytest.raises(TypeError):
+            bloom_add_many(bytes(ref), 3001, 4, tokens)
+
+    def test_bloom_build_is_stamped_by_source(self, monkeypatch, tmp_path):
+        """The kernel builds under a source-hash name, leaving no temp files."""
+        import shutil
+        from usc.bloom import keyword
+        if shutil.which("cc") is None:
+            pytest.skip("no C compiler")
+        monkeypatch.setattr(keyword.tempfile, "gettempdir", lambda: str(tmp_path))
+        monkeypatch.setattr(keyword, "_bloom_lib", None)
+        assert keyword._compile_bloom_lib() is not None
+        cache = tmp_path / "usc_bloom_cache"
+        first = [p.name for p in cache.iterdir()]
+        assert len(first) == 1 and first[0].endswith(".so")
+
+        monkeypatch.setattr(keyword, "_bloom_lib", None)
+        monkeypatch.setattr(keyword, "_BLOOM_C_SRC", keyword._BLOOM_C_SRC + "\n/* v */\n")
+        assert keyword._compile_bloom_lib() is not None
+        assert len(list(cache.iterdir())) == 2
+
+    def test_batch_rejects_short_bitmap(self):
+        """A bitmap shorter than n_bits fails in Python, not inside the kernel."""
+        with pytest.raises(IndexError):
+            bloom_check_many(bytes(4), 1 << 30, 4, ["hello", "world"])
+        with pytest.raises(IndexError):
+            bloom_add_many(bytearray(4), 1 << 30, 4, ["hello", "world"])
+
+    def test_batch_rejects_zero_bits(self):
+        with pytest.raises(ZeroDivisionError):
+            bloom_check_many(bytes(4), 0, 4, ["hello"])
+        with pytest.raises(ZeroDivisionError):
+            bloom_add_many(bytearray(4), 0, 4, ["hello"])
+        with pytest.raises(ZeroDivisionError):
+            bloom_check(bytes(4), 0, 4, "hello")
+
 
 class TestSemanticBloom:
     def test_build_keyword_only(self):
@@ -70,6 +171,16 @@ class TestSemanticBloom:
         bloom = build_semantic_bloom(texts, n_bits=4096, n_hashes=4)
         assert not query_keyword(bloom, "zzzznothere12345")
 
+    def test_equality_compares_bitmaps(self):
+        bloom = build_semantic_bloom(["alpha beta"], n_bits=4096, n_hashes=4)
+        same = build_semantic_bloom(["alpha beta"], n_bits=4096, n_hashes=4)
+        other = build_semantic_bloom(["gamma delta"], n_bits=4096, n_hashes=4)
+        assert bloom == same
+        assert bloom != other
+        assert bloom != SemanticBloom.from_bytes(bloom.to_bytes(), 4096, 3)
+        assert bloom == SemanticBloom.from_bytes(bloom.to_bytes(), 4096, 4)
+        assert bloom != "not a bloom"
+
     def test_query_keywords_all(self):
         texts = ["alpha beta gamma delta"]
         bloom = build_semantic_bloom(texts, n_bits=4096, n_hashes=4)
@@ -120,6 +231,33 @@ class TestSemanticBloom:
         assert query_semantic(bloom, "specific")
         assert not query_semantic(bloom, "zzzznothere12345")
 
+    def test_bits_match_bytearray_bloom_and_roundtrip(self):
+        """The numpy bitmap holds the same bytes as a bytearray bloom."""
+        texts = ["User alice logged in", "disk quota exceeded on web-01"]
+        bloom = build_semantic_bloom(texts, n_bits=2048, n_hashes=4)
+        ref = bloom_make(2048)
+        for text in texts:
+            for tok in text.lower().split():
+                if len(tok) >= 2:
+                    bloom_add(ref, 2048, 4, tok)
+        assert bloom.to_bytes() == bytes(ref)
+
+        again = SemanticBloom.from_bytes(bloom.to_bytes(), 2048, 4)
+        assert again.to_bytes() == bloom.to_bytes()
+        assert query_keyword(again, "alice")
+        assert not query_keyword(again, "zzzznothere12345")
+
+    def test_keyword_build_matches_per_text_tokens(self):
+        """Tokenizing the joined texts gives the per-text token bits."""
+        from usc.bloom.semantic import _tokenize
+        texts = ["Alpha BETA", "gamma/Delta", "x", "", "end-of:LINE"]
+        bloom = build_semantic_bloom(texts, n_bits=2048, n_hashes=4)
+        ref = bloom_make(2048)
+        for text in texts:
+            bloom_add_many(ref, 2048, 4, _tokenize(text))
+        assert bloom.to_bytes() == bytes(ref)
+        assert not query_keyword(bloom, "betagamma/delta")
+
 
 class TestEmbedToBuckets:
     def test_returns_list_of_ints(self):
@@ -143,6 +281,18 @@ class TestEmbedToBuckets:
     def test_empty_vector(self):
         assert embed_to_buckets([], 16) == []
 
+    def test_numpy_path_matches_loop(self, monkeypatch):
+        """Vectorized bucketing equals the bit loop, incl. chunks wider than 32 dims."""
+        import random
+        import usc.bloom.semantic as semantic
+        rng = random.Random(7)
+        for dims, n_buckets in [(8, 16), (384, 64), (5000, 64), (100, 3)]:
+            vector = [rng.gauss(0, 1) for _ in range(dims)]
+            fast = embed_to_buckets(vector, n_buckets)
+            monkeypatch.setattr(semantic, "_HAS_NUMPY", False)
+            assert embed_to_buckets(vector, n_buckets) == fast
+            monkeypatch.setattr(semantic, "_HAS_NUMPY", True)
+
 
 class TestFalsePositiveRate:
     def test_low_fill_rate(self):
@@ -65,6 +65,33 @@ class TestContextCompactor:
             expanded = compactor.expand_prompt(result.text)
             assert expanded == prompt
 
+    def test_expand_store_refs_and_unknown(self):
+        """Store-backed refs expand once and are memoized; unknown refs stay."""
+        from usc.cogdedup.context_compactor import ContextCompactor
+        store = MemoryCogStore()
+        entry = store.store("stored chunk \u2713".encode())
+        compactor = ContextCompactor(store)
+        text = f"a «REF:{entry.chunk_id}» b «REF:999999» c «REF:{entry.chunk_id}»"
+        assert compactor.expand_response(text) == (
+            "a stored chunk \u2713 b «REF:999999» c stored chunk \u2713"
+        )
+        assert compactor.stats()["expansion_cache_size"] == 1
+        assert compactor.expand_response("no refs") == "no refs"
+
+    def test_kept_runs_decode_across_chunk_boundaries(self):
+        """Multi-byte text split by CDC comes back intact; short chunks skip lookup."""
+        from usc.cogdedup.context_compactor import ContextCompactor
+        store = MemoryCogStore()
+        compactor = ContextCompactor(store)
+
+        prompt = "".join(chr(0x4E00 + (i * 7919) % 5000) for i in range(20000))
+        result = compactor.compress_prompt(prompt)
+        assert result.chunks_total > 1
+        assert result.text == prompt
+
+        store.lookup_exact = lambda sha: pytest.fail("short chunk was looked up")
+        assert compactor.compress_prompt("short prompt").text == "short prompt"
+
     def test_stats_tracking(self):
         from usc.cogdedup.context_compactor import ContextCompactor
         store = MemoryCogStore()
@@ -102,6 +129,14 @@ class TestAnomalyDetector:
             a.severity == "low" for a in detector.alerts
         )
 
+    def test_zero_window_keeps_nothing(self):
+        from usc.cogdedup.anomaly import AnomalyDetector
+        detector = AnomalyDetector(window_size=0)
+        assert all(detector.observe(r) is None for r in (1.0, 50.0, 0.1))
+        assert detector.observe_many([1.0, 50.0, 0.1]) == [None, None, None]
+        assert detector.alerts == []
+        assert detector.drift_report().window_size == 0
+
     def test_alert_on_sudden_drop(self):
         """A sharp drop in ratio should trigger an alert."""
         from usc.cogdedup.anomaly import AnomalyDetector
@@ -151,6 +186,115 @@ class TestAnomalyDetector:
         detector.reset()
         assert detector.observation_count == 0
 
+    def test_running_stats_match_window(self):
+        """Welford state tracks the exact window mean/std as it slides."""
+        import math
+        import random
+        from usc.cogdedup.anomaly import AnomalyDetector
+        rng = random.Random(3)
+        detector = AnomalyDetector(window_size=7)
+        for i in range(200):
+            detector.observe(rng.uniform(1.0, 40.0) if i % 3 else 10.0)
+            hist = list(detector._history)
+            mean = sum(hist) / len(hist)
+            var = sum((x - mean) ** 2 for x in hist) / len(hist)
+            assert detector._mean == pytest.approx(mean, abs=1e-9)
+            assert detector._variance() == pytest.approx(var, abs=1e-9)
+            assert detector._first_sum == pytest.approx(sum(hist[:len(hist) // 2]), abs=1e-9)
+        report = detector.drift_report()
+        assert report.current_std == round(math.sqrt(var), 2)
+        half = len(hist) // 2
+        trend = sum(hist[half:]) / (len(hist) - half) - sum(hist[:half]) / half
+        assert report.trend == pytest.approx(round(trend, 2), abs=0.011)
+
+    def test_observe_many_matches_observe(self):
+        """The batch sweep raises the same alerts and ends in the same state."""
+        import random
+        from usc.cogdedup.anomaly import AnomalyDetector
+        rng = random.Random(11)
+        ratios = [rng.choice([10.0, 10.2, 9.9, 1.0, 80.0]) for _ in range(300)]
+        labels = [f"s-{i}" for i in range(len(ratios))]
+        one, batch = AnomalyDetector(window_size=9), AnomalyDetector(window_size=9)
+        expected = [one.observe(r, label=l) for r, l in zip(ratios, labels)]
+        got = batch.observe_many(ratios, labels)
+        assert len(got) == len(expected)
+        for e, g in zip(expected, got):
+            assert (e is None) == (g is None)
+            if e is not None:
+                assert (g.label, g.severity, g.z_score) == (e.label, e.severity, e.z_score)
+        assert len(batch.alerts) == len(one.alerts) > 0
+        assert batch.observation_count == one.observation_count
+        assert (batch._n, batch._mean, batch._M2, batch._first_sum) == (
+            one._n, one._mean, one._M2, one._first_sum)
+
+    def test_outlier_leaving_constant_window_keeps_std_floor(self):
+        """Rounding residue left by an evicted outlier is not read as variance."""
+        from usc.cogdedup.anomaly import AnomalyDetector
+        ratios = [3.7, 91.2, 0.4, 55.5, 12.25, 7.0] + [1.0] * 5 + [1.0000001]
+        one, batch = AnomalyDetector(window_size=5), AnomalyDetector(window_size=5)
+        assert [one.observe(r) for r in ratios] == [None] * len(ratios)
+        assert batch.observe_many(ratios) == [None] * len(ratios)
+        report = one.drift_report()
+        assert (report.current_std, report.is_drifting) == (0.0, False)
+
+    def test_alerts_match_direct_window_stats(self):
+        """Alerts and z-scores equal a direct mean/std over each window."""
+        import math
+        import random
+        from usc.cogdedup.anomaly import AnomalyDetector
+        rng = random.Random(5)
+        for _ in range(40):
+            window = rng.choice([5, 6, 10])
+            ratios = [rng.choice([1.0, 2.5, 1.0000001, rng.uniform(0, 100), 3.3e6, 1e-6])
+                      for _ in range(120)]
+            one, batch = AnomalyDetector(window_size=window), AnomalyDetector(window_size=window)
+            got = batch.observe_many(ratios)
+            hist = []
+            for r, g in zip(ratios, got):
+                e = one.observe(r)
+                if len(hist) >= 5:
+                    mean = sum(hist) / len(hist)
+                    var = sum((x - mean) ** 2 for x in hist) / len(hist)
+                    z = (r - mean) / (math.sqrt(var) if var > 0 else 0.001)
+                    alerted = z < -2.0 or z > 3.0
+                    assert (e is not None) == (g is not None) == alerted
+                    if alerted:
+                        assert e.z_score == pytest.approx(z, rel=1e-6)
+                        assert g.z_score == pytest.approx(z, rel=1e-6)
+                hist = (hist + [r])[-window:]
+
+    def test_concurrent_producers_keep_state_consistent(self):
+        """Threads feeding one detector leave the running stats exact."""
+        import sys
+        import threading
+        from usc.cogdedup.anomaly import AnomalyDetector
+        detector = AnomalyDetector(window_size=64)
+
+        def produce(seed):
+            for i in range(400):
+                if i % 2:
+                    detector.observe_many([seed + i * 0.01] * 5)
+                else:
+                    detector.observe(seed + i * 0.01)
+
+        old_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=produce, args=(s,)) for s in (1.0, 5.0, 9.0)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(old_interval)
+
+        assert detector.observation_count == 3 * (200 + 200 * 5)
+        hist = list(detector._history)
+        mean = sum(hist) / len(hist)
+        assert detector._n == len(hist) == 64
+        assert detector._mean == pytest.approx(mean, abs=1e-9)
+        assert detector._first_sum == pytest.approx(sum(hist[:32]), abs=1e-9)
+
 
 # ===================== #9: Federation =====================
 
@@ -225,6 +369,31 @@ class TestFederation:
         assert "shared" in stats
         assert "a" in stats["agents"]
 
+    def test_shared_similarity_miss_cache(self):
+        """Repeated shared misses are skipped until the shared tier grows."""
+        from usc.cogdedup.federation import CogstoreFederation
+        from usc.cogdedup.hasher import simhash64
+        federation = CogstoreFederation(promote_threshold=2)
+        store_a = federation.create_agent_store("agent-a")
+        store_b = federation.create_agent_store("agent-b")
+
+        shared = federation.shared_store
+        calls = []
+        real_lookup = shared.lookup_similar
+        shared.lookup_similar = lambda sh: calls.append(sh) or real_lookup(sh)
+
+        data = b"similarity probe for the shared tier " * 40
+        sh = simhash64(data)
+        assert store_b.lookup_similar(sh) is None
+        assert store_b.lookup_similar(sh) is None
+        assert len(calls) == 1
+
+        # Another agent promotes the chunk; B's cached miss must not hide it
+        for _ in range(3):
+            store_a.store(data)
+        assert store_b.lookup_similar(sh) is not None
+        assert len(calls) == 2
+
 
 # ===================== #10: Adversarial Robustness =====================
 
@@ -259,6 +428,72 @@ class TestIntegrity:
         assert stats["verified"] == 1
         assert stats["failed"] == 1
 
+    def test_batch_hashing_and_legacy_xxh64(self, monkeypatch):
+        """Batch APIs match per-item hashing; pre-XXH3 8-byte hashes still verify."""
+        import types
+        import zlib
+        from usc.cogdedup import integrity
+
+        class _XXH64:
+            def __init__(self, data):
+                self._h = zlib.crc32(data, 1)
+
+            def intdigest(self):
+                return self._h
+
+        fake = types.SimpleNamespace(
+            xxh3_64_intdigest=lambda data: zlib.crc32(data) | 1 << 40,
+            xxh64=_XXH64,
+        )
+        monkeypatch.setattr(integrity, "xxhash", fake, raising=False)
+        monkeypatch.setattr(integrity, "_HAS_XXHASH", True)
+
+        items = [b"alpha", b"beta", b""]
+        assert integrity.fast_hash_batch(items) == [integrity.fast_hash(x) for x in items]
+        hashes = integrity.fast_hash_bytes_batch(items)
+        assert hashes == [integrity.fast_hash_bytes(x) for x in items]
+        assert all(len(h) == 8 for h in hashes)
+
+        legacy = integrity._HASH64.pack(_XXH64(b"alpha").intdigest())
+        assert legacy != hashes[0]
+        assert integrity.verify_hash(b"alpha", legacy)
+        assert not integrity.verify_hash(b"beta", legacy)
+
+        verifier = integrity.IntegrityVerifier()
+        pairs = [(b"alpha", hashes[0]), (b"alpha", legacy), (b"beta", hashes[0])]
+        assert verifier.verify_many(pairs) == [True, True, False]
+        assert verifier.stats()["verified"] == 2
+        assert verifier.stats()["failed"] == 1
+
+    def test_crc32c_fallback_accepts_zlib_crc(self, monkeypatch):
+        """With CRC32C as the fallback, 4-byte zlib CRC32 hashes still verify."""
+        import zlib
+        from usc.cogdedup import integrity
+        monkeypatch.setattr(integrity, "_HAS_XXHASH", False)
+        monkeypatch.setattr(integrity, "_crc32", lambda data: zlib.crc32(data, 7))
+
+        data = b"fallback chain"
+        hb = integrity.fast_hash_bytes(data)
+        assert hb == integrity._HASH32.pack(zlib.crc32(data, 7))
+        assert integrity.fast_hash_batch([data]) == [integrity.fast_hash(data)]
+        assert integrity.verify_hash(data, hb)
+        assert integrity.verify_hash(data, integrity._HASH32.pack(zlib.crc32(data)))
+        assert not integrity.verify_hash(b"other", hb)
+
+    def test_crc32c_hash_verifies_without_google_crc32c(self, monkeypatch):
+        """A CRC32C digest written elsewhere verifies on a zlib-only host."""
+        from usc.cogdedup import integrity
+        monkeypatch.setattr(integrity, "_HAS_XXHASH", False)
+        monkeypatch.setattr(integrity, "_crc32", integrity._zlib_crc32)
+        monkeypatch.setattr(integrity, "_crc32c", integrity._crc32c_py)
+
+        assert integrity._crc32c_py(b"123456789") == 0xE3069283  # check value
+        data = b"written on a host with hardware CRC32C"
+        foreign = integrity._HASH32.pack(integrity._crc32c_py(data))
+        assert foreign != integrity.fast_hash_bytes(data)
+        assert integrity.verify_hash(data, foreign)
+        assert not integrity.verify_hash(b"other", foreign)
+
     def test_delta_expansion_check(self):
         from usc.cogdedup.integrity import IntegrityVerifier, SecurityPolicy
         policy = SecurityPolicy(max_delta_expansion=10.0)
@@ -308,6 +543,49 @@ class TestRecursiveCompressor:
         for orig, dec in zip(memories, decompressed):
             assert orig == dec
 
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_compress_memories_serializers(self, monkeypatch, use_orjson):
+        """Both JSON backends round-trip; the stdlib one keeps the old bytes."""
+        import json
+        from usc.cogdedup import recursive
+        if use_orjson and not recursive._HAS_ORJSON:
+            pytest.skip("orjson not installed")
+        monkeypatch.setattr(recursive, "_HAS_ORJSON", use_orjson)
+        compressor = recursive.RecursiveCompressor(MemoryCogStore())
+        memories = [
+            {"id": i, "text": f"naïve café {i} \u2603", "big": (1 << 70) + i, "tags": ["x"]}
+            for i in range(30)
+        ]
+        result = compressor.compress_memories(memories)
+        assert compressor.decompress_memories(result.blob) == memories
+        if not use_orjson:
+            expected = "\n".join(
+                json.dumps(m, separators=(",", ":"), sort_keys=True) for m in memories
+            ).encode("utf-8")
+            assert result.original_size == len(expected)
+            assert cogdedup_decode(result.blob, compressor._store) == expected
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_non_finite_floats_roundtrip(self, monkeypatch, use_orjson):
+        """NaN and ±inf survive, rather than coming back as None."""
+        import math
+        from usc.cogdedup import recursive
+        if use_orjson and not recursive._HAS_ORJSON:
+            pytest.skip("orjson not installed")
+        monkeypatch.setattr(recursive, "_HAS_ORJSON", use_orjson)
+        compressor = recursive.RecursiveCompressor(MemoryCogStore())
+        memories = [
+            {"score": float("nan"), "inf": float("inf"), "x": 1},
+            {"neg": float("-inf"), "none": None, "x": 2.5},
+            {"x": 3},
+        ]
+        result = compressor.compress_memories(memories)
+        first, second, third = compressor.decompress_memories(result.blob)
+        assert math.isnan(first["score"])
+        assert (first["inf"], first["x"]) == (math.inf, 1)
+        assert second == {"neg": -math.inf, "none": None, "x": 2.5}
+        assert third == {"x": 3}
+
     def test_compress_reasoning_bank_roundtrip(self):
         from usc.cogdedup.recursive import RecursiveCompressor
         store = MemoryCogStore()
@@ -420,6 +698,49 @@ class TestTemporalMotifTracker:
         stats = tracker.stats()
         assert stats["events_observed"] == 9
 
+    def test_ngram_counts_match_window_counter(self):
+        """Trie counting matches counting every window ending at each event."""
+        import random
+        from collections import Counter
+        from usc.cogdedup.temporal import TemporalMotifTracker
+
+        rng = random.Random(7)
+        base = [[rng.choice("abcdef") for _ in range(rng.randrange(2, 6))] for _ in range(5)]
+        events = [e for _ in range(60) for e in rng.choice(base)]
+        events += [rng.choice("abcdef") for _ in range(100)]
+
+        tracker = TemporalMotifTracker(min_pattern_len=2, max_pattern_len=6, min_occurrences=3)
+        counts: Counter = Counter()
+        expected_ids = {}
+        for idx, event in enumerate(events, 1):
+            got = tracker.observe(event)
+            longest = None
+            for n in range(2, min(7, idx + 1)):
+                pattern = tuple(events[idx - n:idx])
+                counts[pattern] += 1
+                if counts[pattern] >= 3:
+                    expected_ids.setdefault(pattern, (len(expected_ids), idx - n))
+                    longest = pattern
+            assert (got.pattern if got else None) == longest
+
+        motifs = {m.pattern: m for m in tracker.detected_motifs()}
+        assert {p: (m.motif_id, m.first_seen) for p, m in motifs.items()} == expected_ids
+        assert all(m.occurrences == counts[p] for p, m in motifs.items())
+        assert tracker.stats()["unique_ngrams"] == len(counts)
+
+    def test_motif_by_id_and_top_stats(self):
+        from usc.cogdedup.temporal import TemporalMotifTracker
+        tracker = TemporalMotifTracker(min_pattern_len=2, min_occurrences=2)
+        tracker.observe_batch(["a", "b", "c", "a", "b", "d", "a", "b", "c"] * 3)
+        motifs = tracker.detected_motifs()
+        assert all(tracker.get_motif_by_id(m.motif_id) is m for m in motifs)
+        assert tracker.get_motif_by_id(len(motifs)) is None
+        assert tracker.get_motif_by_id(-1) is None
+        stats = tracker.stats()
+        assert stats["motifs_detected"] == len(motifs)
+        assert (stats["top_motif_occurrences"], stats["top_motif_length"]) == (
+            motifs[0].occurrences, motifs[0].length)
+
 
 class TestTemporalEncoder:
     def test_encode_decode_roundtrip(self):
@@ -461,6 +782,49 @@ class TestTemporalEncoder:
         assert result.compressed_tokens == result.original_events
         assert result.savings_pct == 0.0
 
+    def test_greedy_longest_match_tokens(self):
+        """Tokens equal trying every motif longest-first at each position."""
+        import random
+        from usc.cogdedup.temporal import TemporalMotifTracker, TemporalEncoder
+        rng = random.Random(12)
+        names = [f"ev{i}" for i in range(6)]
+        blocks = [[rng.choice(names) for _ in range(rng.randrange(3, 7))] for _ in range(8)]
+        events = [e for _ in range(60) for e in rng.choice(blocks)]
+        events += [rng.choice(names) for _ in range(200)]
+        tracker = TemporalMotifTracker(min_pattern_len=3, min_occurrences=2)
+        tracker.observe_batch(events)
+
+        ordered = sorted(tracker.detected_motifs(), key=lambda m: m.length, reverse=True)
+        expected, i = [], 0
+        while i < len(events):
+            motif = next((m for m in ordered if tuple(events[i:i + m.length]) == m.pattern), None)
+            if motif is None:
+                expected.append(("literal", events[i]))
+                i += 1
+            else:
+                expected.append(("motif", motif.motif_id))
+                i += motif.length
+
+        encoder = TemporalEncoder(tracker)
+        result = encoder.encode(events)
+        assert result.tokens == expected
+        assert encoder.decode(result) == events
+
+    def test_motif_trie_tracks_new_motifs(self):
+        """The cached trie is rebuilt once a new motif is detected."""
+        from usc.cogdedup.temporal import TemporalMotifTracker, TemporalEncoder
+        tracker = TemporalMotifTracker(min_pattern_len=3, min_occurrences=2)
+        tracker.observe_batch(["a", "b", "c", "x", "a", "b", "c"])
+        encoder = TemporalEncoder(tracker)
+        events = ["p", "q", "r", "a", "b", "c"]
+        assert encoder.encode(events).compressed_tokens == 4
+        assert tracker.motif_trie() is tracker.motif_trie()
+
+        tracker.observe_batch(["p", "q", "r", "y", "p", "q", "r"])
+        result = encoder.encode(events)
+        assert result.compressed_tokens == 2
+        assert encoder.decode(result) == events
+
 
 # ===================== Integration Tests =====================
 
@@ -50,6 +50,20 @@ class TestCompressedVault:
         assert stats["document_count"] == 1
         assert stats["overall_ratio"] >= 1.0
 
+    def test_doc_index_backfill_and_delete(self):
+        """Documents stored before the index existed are found after reopen."""
+        data = b"indexed document body " * 100
+        h = self.vault.store_document(data, "a.txt")
+        self.vault._conn.close()
+        os.remove(os.path.join(self.tmpdir, "doc_index.db"))
+
+        reopened = CompressedVault(self.tmpdir)
+        assert reopened.get_document(h[:12])[0] == data
+        assert reopened.compression_stats()["document_count"] == 1
+
+        assert reopened.delete_document(h)
+        assert reopened.compression_stats()["document_count"] == 0
+
     def test_list_documents(self):
         data = b"test content " * 100
         self.vault.store_document(data, "file1.txt")
@@ -57,6 +71,12 @@ class TestCompressedVault:
         assert len(docs) == 1
         assert "compression_method" in docs[0]
 
+    def test_set_shared_dict_requires_zstd(self, monkeypatch):
+        from c3ae.usc_bridge import compressed_vault
+        monkeypatch.setattr(compressed_vault, "zstd", None)
+        with pytest.raises(RuntimeError, match="zstandard"):
+            self.vault.set_shared_dict(b"dict")
+
 
 class TestSmartCompress:
     def test_small_data_not_compressed(self):
@@ -76,6 +96,25 @@ class TestSmartCompress:
         decompressed = _decompress(compressed, method)
         assert decompressed == data
 
+    def test_candidate_pool_created_once_under_contention(self, monkeypatch):
+        import threading
+        from c3ae.usc_bridge import compressed_vault
+        monkeypatch.setattr(compressed_vault, "_pool", None)
+        barrier = threading.Barrier(8)
+        pools = []
+
+        def grab():
+            barrier.wait()
+            pools.append(compressed_vault._candidate_pool())
+
+        threads = [threading.Thread(target=grab) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len({id(p) for p in pools}) == 1
+        pools[0].shutdown()
+
 
 class TestC3CogStore:
     def setup_method(self):
@@ -125,6 +164,81 @@ class TestC3CogStore:
         assert found.data == b"persistent data"
         store2.close()
 
+    def test_hot_tier_lazy_load(self):
+        """Hot chunks reload on open; their data is fetched on first access."""
+        for _ in range(6):
+            entry = self.store.store(b"frequently used chunk")
+        self.store.close()
+
+        store2 = C3CogStore(self.db_path)
+        assert store2.stats()["tiers"]["hot"] == 1
+        assert store2._hot.by_id[entry.chunk_id].data is None
+        assert store2.get(entry.chunk_id).data == b"frequently used chunk"
+        assert store2.lookup_exact(entry.sha256).data == b"frequently used chunk"
+        store2.close()
+        self.store = C3CogStore(self.db_path)
+
+    def test_write_behind(self):
+        """Queued writes are visible immediately and persist after close."""
+        from usc.cogdedup.codec import cogdedup_encode, cogdedup_decode
+
+        self.store.store(b"existing chunk")
+        self.store.close()
+        self.store = C3CogStore(self.db_path, write_behind=True)
+
+        entry = self.store.store(b"queued chunk")
+        assert self.store.get(entry.chunk_id).data == b"queued chunk"
+        assert self.store.lookup_exact(entry.sha256).chunk_id == entry.chunk_id
+        assert self.store.store(b"queued chunk").chunk_id == entry.chunk_id
+
+        data = b"session log entry: 2025-01-15 INFO processing request\n" * 100
+        blob, _ = cogdedup_encode(data, self.store)
+        assert cogdedup_decode(blob, self.store) == data
+
+        self.store.flush()
+        assert self.store.stats()["unique_chunks"] >= 3
+        self.store.close()
+
+        self.store = C3CogStore(self.db_path)
+        found = self.store.lookup_exact(entry.sha256)
+        assert found.chunk_id == entry.chunk_id
+        assert found.ref_count == 2
+        assert cogdedup_decode(blob, self.store) == data
+
+    def test_write_behind_failure_keeps_pending_and_raises(self):
+        """A rolled-back batch leaves its chunks pending and fails later calls."""
+        self.store.close()
+        self.store = C3CogStore(self.db_path, write_behind=True)
+        self.store._conn.execute(
+            "CREATE TRIGGER reject_chunks BEFORE INSERT ON cogdedup_chunks "
+            "BEGIN SELECT RAISE(ABORT, 'disk full'); END"
+        )
+        self.store._conn.commit()
+
+        entry = self.store.store(b"never committed")
+        with pytest.raises(RuntimeError):
+            self.store.flush()
+        assert self.store._pending_id[entry.chunk_id] is entry
+        assert self.store._pending_sha[entry.sha256] is entry
+        with pytest.raises(RuntimeError):
+            self.store.get(entry.chunk_id)
+        with pytest.raises(RuntimeError):
+            self.store.lookup_exact(entry.sha256)
+        with pytest.raises(RuntimeError):
+            self.store.store(b"another chunk")
+
+    def test_write_behind_registers_chunks_in_queue_order(self):
+        self.store.close()
+        self.store = C3CogStore(self.db_path, write_behind=True)
+        a = self.store.store(b"memory chunk a")
+        b = self.store.store(b"memory chunk b")
+        self.store.register_data_chunks("mem-1", {a.chunk_id, b.chunk_id})
+        assert self.store.get_chunk_ids_for_data("mem-1") == {a.chunk_id, b.chunk_id}
+        self.store.close()
+
+        self.store = C3CogStore(self.db_path)
+        assert self.store.get_chunk_ids_for_data("mem-1") == {a.chunk_id, b.chunk_id}
+
     def test_cogdedup_roundtrip(self):
         """Full cognitive dedup encode/decode through C3 store."""
         from usc.cogdedup.codec import cogdedup_encode, cogdedup_decode
@@ -171,3 +285,109 @@ class TestC3CogStore:
         total_reuse = stats2["ref"] + stats2["delta"]
         assert total_reuse > 0 or len(blob2) <= len(blob1), \
             "cross-session encoding should reuse chunks"
+
+    def test_find_structurally_similar(self):
+        """Jaccard scores come out of one grouped query."""
+        shared = self.store.store(b"shared chunk")
+        only_a = self.store.store(b"only in a")
+        only_b = self.store.store(b"only in b")
+        self.store.register_data_chunks("mem-a", {shared.chunk_id, only_a.chunk_id})
+        self.store.register_data_chunks("mem-b", {shared.chunk_id, only_b.chunk_id})
+        self.store.register_data_chunks("mem-c", {shared.chunk_id, only_a.chunk_id})
+
+        matches = self.store.find_structurally_similar("mem-a", threshold=0.0)
+        assert matches[0] == ("mem-c", 1.0)
+        assert ("mem-b", pytest.approx(1 / 3)) in matches
+        for mem_id, score in matches:
+            assert score == pytest.approx(self.store.structural_similarity("mem-a", mem_id))
+
+    def test_shared_dict_vault_roundtrip(self):
+        """A dictionary trained from stored chunks round-trips through the vault."""
+        for i in range(64):
+            self.store.store(
+                f"[TOOL_CALL] web_search query='topic {i}' status=ok latency={i * 7}ms\n".encode() * 4
+            )
+        dict_bytes = self.store.train_shared_dict(dict_size=4096)
+        assert dict_bytes is not None
+        assert self.store.load_shared_dict() == dict_bytes
+
+        vault = CompressedVault(os.path.join(self.tmpdir, "vault"))
+        vault.set_shared_dict(dict_bytes)
+        data = b"[TOOL_CALL] web_search query='topic 99' status=ok latency=3ms\n" * 30
+        h = vault.store_document(data, "calls.log")
+        retrieved, meta = vault.get_document(h)
+        assert retrieved == data
+
+        # A fresh vault on the same directory picks the active dictionary back up
+        reopened = CompressedVault(os.path.join(self.tmpdir, "vault"))
+        assert reopened.get_document(h)[0] == data
+
+    def test_hot_tier_hit_returns_cached_entry(self):
+        """Once promoted, hits return the same entry with bumped counters."""
+        for _ in range(5):
+            entry = self.store.store(b"hot hit chunk")
+        assert entry.chunk_id in self.store._hot
+        first = self.store.lookup_exact(entry.sha256)
+        second = self.store.lookup_exact(entry.sha256)
+        assert second is first
+        assert second.ref_count == 7
+        assert second.data == b"hot hit chunk"
+        assert self.store.get(entry.chunk_id) is first
+
+    def test_hot_tier_cap_keeps_extra_chunks_warm(self, monkeypatch):
+        """Past HOT_MAX_CHUNKS, frequent chunks stay in the warm tier."""
+        from c3ae.usc_bridge import c3_cogstore
+        monkeypatch.setattr(c3_cogstore, "HOT_MAX_CHUNKS", 1)
+        for _ in range(6):
+            a = self.store.store(b"first hot chunk")
+            b = self.store.store(b"second hot chunk")
+        assert len(self.store._hot) == 1
+        assert a.chunk_id in self.store._hot
+        assert b.chunk_id not in self.store._hot
+        assert self.store.lookup_exact(b.sha256).data == b"second hot chunk"
+
+    def test_new_store_records_cdc_version(self):
+        from usc.cogdedup.codec import cogdedup_encode
+        from usc.cogdedup.hasher import _CDC_VERSION
+        stats = self.store.stats()
+        assert stats["cdc_version"] == _CDC_VERSION
+        assert stats["cdc_version_current"]
+        _, enc_stats = cogdedup_encode(b"versioned chunk data " * 50, self.store)
+        assert enc_stats["cdc_version"] == _CDC_VERSION
+
+        self.store.close()
+        self.store = C3CogStore(self.db_path)
+        assert self.store.cdc_version == _CDC_VERSION
+
+    def test_unversioned_store_with_chunks_reports_v1(self):
+        """Chunks stored before the version was recorded used the old boundaries."""
+        import sqlite3
+        self.store.store(b"chunk from an older release")
+        self.store.close()
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("DELETE FROM cogdedup_meta WHERE key = 'cdc_version'")
+        conn.close()
+
+        self.store = C3CogStore(self.db_path)
+        assert self.store.cdc_version == 1
+        assert not self.store.stats()["cdc_version_current"]
+
+
+class TestHotTier:
+    def test_add_indexes_by_sha_and_id(self):
+        from c3ae.usc_bridge.c3_cogstore import HotTier
+        from usc.cogdedup.store import ChunkEntry
+        hot = HotTier()
+        entries = [
+            ChunkEntry(chunk_id=10 + i, sha256=f"sha{i}", simhash=(1 << 63) | i,
+                       data=bytes([i]), ref_count=5)
+            for i in range(9)
+        ]
+        for e in entries:
+            hot.add(e)
+        assert len(hot) == 9
+        for e in entries:
+            assert e.chunk_id in hot
+            assert hot.by_sha[e.sha256] is e
+            assert hot.by_id[e.chunk_id] is e
@@ -209,6 +209,23 @@ class TestODC:
         blob, meta = odc_encode_packets(packets)
         assert len(blob) < raw_size
 
+    def test_large_stream_skips_dict(self):
+        """Framed streams above the training cap are stored plain and still round-trip."""
+        from usc.api.codec_odc import odc_encode_packets, odc_decode_to_packets, DICT_TRAIN_MAX_FRAMED
+        packets = [f"packet_{i}: data={i*17} ".encode() * 40 for i in range(200)]
+        assert sum(len(p) for p in packets) > DICT_TRAIN_MAX_FRAMED
+        blob, meta = odc_encode_packets(packets)
+        assert meta.dict_bytes == 0
+        assert odc_decode_to_packets(blob) == packets
+
+    def test_tuned_zstd_roundtrip(self, monkeypatch):
+        """USC_TUNE_ZSTD parameters (long window + LDM) still decode."""
+        import usc.api.codec_odc as odc
+        monkeypatch.setattr(odc, "TUNE_ZSTD", True)
+        packets = [f"packet_{i}: data={i*17} ".encode() * 40 for i in range(200)]
+        blob, meta = odc.odc_encode_packets(packets)
+        assert odc.odc_decode_to_packets(blob) == packets
+
     def test_single_packet(self):
         """ODC should handle a single packet."""
         from usc.api.codec_odc import odc_encode_packets, odc_decode_to_packets
@@ -377,6 +394,19 @@ class TestODC2:
 class TestH1M2Rowmask:
     """Tests for the row-oriented template/unknown encoding."""
 
+    def test_v1m_bundle_reuses_compressed_template(self):
+        """Bundles sharing a template bank reuse its compressed bytes."""
+        from usc.api import hdfs_template_codec_v1m_bundle as bundle
+        tpl = "\n".join(f"E{i},Receiving block <*> src: <*> type {i}" for i in range(50))
+        events = [(1, ["blk_1", "10.0.0.1"]), (2, ["blk_2", "10.0.0.2"])]
+        hits = bundle._compressed_template.cache_info().hits
+        blob1, _ = bundle.bundle_encode_and_compress_v1m(events, ["odd line"], tpl)
+        blob2, _ = bundle.bundle_encode_and_compress_v1m(events, [], tpl)
+        assert bundle._compressed_template.cache_info().hits == hits + 1
+        for blob in (blob1, blob2):
+            level, tpl_text, _payload = bundle.bundle_decode_header(blob)
+            assert tpl_text == tpl
+
     def test_all_templated_roundtrip(self):
         """All rows are templated events."""
         from usc.api.hdfs_template_codec_h1m2_rowmask import (
@@ -673,6 +703,19 @@ class TestVarint:
         for val in range(128):
             assert len(encode_uvarint(val)) == 1
 
+    def test_encode_into_appends_same_bytes(self):
+        """encode_uvarint_into appends exactly encode_uvarint's bytes."""
+        from usc.mem.varint import encode_uvarint, encode_uvarint_into
+        buf = bytearray(b"\xff")
+        values = [0, 127, 128, 300, 2**32 - 1, 2**63]
+        for val in values:
+            encode_uvarint_into(buf, val)
+        assert bytes(buf) == b"\xff" + b"".join(encode_uvarint(v) for v in values)
+        with pytest.raises(ValueError):
+            encode_uvarint_into(buf, -1)
+        with pytest.raises(ValueError):
+            encode_uvarint(-1)
+
 
 # ══════════════════════════════════════════════════════════════════════════
 # 9. EDGE CASES & ERROR HANDLING
@@ -728,6 +771,37 @@ class TestEdgeCases:
         decoded, conf = mem_decode(pkt)
         assert decoded == text
 
+    def test_decode_auto_streams_cold_fallbacks(self, tmp_path, monkeypatch):
+        """USZR / USBZ / USZD decode through the streaming router."""
+        import bz2
+        import zstandard as zstd
+        from usc.codec import decode_router
+        from usc.codec.decode_router import decode_auto
+
+        raw = ("2024-01-01 INFO caf\u00e9 \u2713 request done\r\n" * 5000).encode("utf-8") + b"\xff tail\n"
+        expected = raw.decode("utf-8", errors="replace")
+        samples = [f"sample {i} INFO request done {i * 7}".encode() for i in range(200)]
+        dict_bytes = zstd.train_dictionary(1024, samples).as_bytes()
+        cdict = zstd.ZstdCompressionDict(dict_bytes)
+        blobs = {
+            "cold-zstd": b"USZR" + zstd.ZstdCompressor().compress(raw),
+            "cold-bzip2": b"USBZ" + bz2.compress(raw),
+            "cold-zstd-dict": b"USZD" + struct.pack("<I", len(dict_bytes)) + dict_bytes
+            + zstd.ZstdCompressor(dict_data=cdict).compress(raw),
+        }
+        # Small buffers so multi-byte characters straddle read boundaries
+        monkeypatch.setattr(decode_router, "_STREAM_BUF", 4093)
+        for mode, blob in blobs.items():
+            src, out = tmp_path / f"{mode}.bin", tmp_path / f"{mode}.txt"
+            src.write_bytes(blob)
+            assert decode_auto(str(src), str(out)) == mode
+            assert out.read_bytes().decode("utf-8") == expected
+
+        bad = tmp_path / "bad.bin"
+        bad.write_bytes(b"NOPE" + raw[:10])
+        with pytest.raises(SystemExit):
+            decode_auto(str(bad), str(tmp_path / "bad.txt"))
+
 
 # ══════════════════════════════════════════════════════════════════════════
 # 10. COMPRESSION RATIO VERIFICATION
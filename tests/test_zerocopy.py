@@ -62,6 +62,16 @@ class TestLazyBlob:
         p2 = lazy.packet(0)
         assert p1 is p2  # should be same object (cached)
 
+    def test_packet_view_zero_copy(self):
+        blob, packets = _make_odc_blob()
+        lazy = LazyBlob(blob)
+        views = [lazy.packet_view(i) for i in range(len(packets))]
+        assert all(isinstance(v, memoryview) for v in views)
+        assert [bytes(v) for v in views] == packets
+        assert views[0].obj is views[-1].obj
+        with pytest.raises(IndexError):
+            lazy.packet_view(len(packets))
+
     def test_out_of_bounds_raises(self):
         blob, packets = _make_odc_blob()
         lazy = LazyBlob(blob)